@@ -0,0 +1,302 @@
+#pipeline: incremental parsing of the LLM's JSON action as it streams in (used by neura_api.get_ai_action)
+
+import re
+import json
+import codeop
+from typing import Any, Callable, Dict, List, Optional
+
+# --- Configuration ---
+MIN_SENTENCE_CHARS = 20  # Shorter pieces wait for the next sentence, so speech is not choppy
+# Lines that continue the statement above them even though they start at column 0
+CONTINUATION_PREFIXES = ("else", "elif", "except", "finally", ")", "]", "}", "#")
+# --- End Configuration ---
+
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s)|\n')
+_STRING_RUN = re.compile(r'[^"\\]+')
+_WHITESPACE = " \t\r\n"
+
+
+class ActionStreamParser:
+    """
+    Reads the model's JSON object a piece at a time, as the tokens arrive.
+    Top-level string values are decoded while they stream: on_text(key, piece)
+    gets each newly decoded piece, and on_value(key, value) gets every
+    top-level value once it is complete. Nested values are collected raw and
+    decoded when they end. Anything before the opening brace (a ```json
+    fence, a stray sentence) is skipped. The parser never raises: on input
+    that is not a JSON object it stops and sets `error`, and the caller's
+    json.loads of the full text decides.
+    """
+
+    def __init__(self, on_text: Optional[Callable[[str, str], None]] = None,
+                 on_value: Optional[Callable[[str, Any], None]] = None):
+        self.on_text = on_text
+        self.on_value = on_value
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self.error: Optional[str] = None
+        self._state = "start"  # start, key_or_end, key, colon, value, string, raw, comma_or_end, done, failed
+        self._key = ""
+        self._chars: List[str] = []  # Decoded text of the current string (key or value)
+        self._escape = ""  # Pending escape sequence, e.g. "\\u00"
+        self._high_surrogate: Optional[int] = None
+        self._raw: List[str] = []  # Text of the current non-string value
+        self._depth = 0
+        self._raw_in_string = False
+        self._raw_escape = False
+
+    def feed(self, text: str):
+        i, n = 0, len(text)
+        while i < n and self._state not in ("done", "failed"):
+            state = self._state
+            if state in ("string", "key"):
+                i = self._read_string(text, i)
+                continue
+            if state == "raw":
+                i = self._read_raw(text, i)
+                continue
+            char = text[i]
+            i += 1
+            if state == "start":
+                if char == "{":
+                    self._state = "key_or_end"
+            elif char in _WHITESPACE:
+                continue
+            elif state == "key_or_end":
+                if char == '"':
+                    self._state, self._chars = "key", []
+                elif char == "}" and not self.fields:
+                    self._finish()
+                else:
+                    self._fail(f"expected a key, got {char!r}")
+            elif state == "colon":
+                if char == ":":
+                    self._state = "value"
+                else:
+                    self._fail(f"expected ':', got {char!r}")
+            elif state == "value":
+                if char == '"':
+                    self._state, self._chars = "string", []
+                else:
+                    self._state, self._raw, self._depth = "raw", [], 0
+                    self._raw_in_string = self._raw_escape = False
+                    i -= 1  # The raw reader takes this character too
+            elif state == "comma_or_end":
+                if char == ",":
+                    self._state = "key_or_end"
+                elif char == "}":
+                    self._finish()
+                else:
+                    self._fail(f"expected ',' or '}}', got {char!r}")
+
+    def partial(self, key: str) -> str:
+        """The decoded text of string field `key` so far (complete or still streaming)."""
+        if key in self.fields:
+            value = self.fields[key]
+            return value if isinstance(value, str) else ""
+        if self._state == "string" and self._key == key:
+            return "".join(self._chars)
+        return ""
+
+    # --- States ---
+    def _read_string(self, text: str, i: int) -> int:
+        """Decodes string characters from text[i:]; returns where it stopped."""
+        start = len(self._chars)
+        n = len(text)
+        while i < n:
+            if self._escape:
+                i = self._read_escape(text, i)
+                continue
+            run = _STRING_RUN.match(text, i)
+            if run:
+                self._flush_surrogate()
+                self._chars.append(run.group())
+                i = run.end()
+                continue
+            char = text[i]
+            i += 1
+            if char == "\\":
+                self._escape = "\\"
+            else:  # The closing quote
+                self._flush_surrogate()
+                self._emit_text(start)
+                self._end_string()
+                return i
+        self._emit_text(start)
+        return i
+
+    def _read_escape(self, text: str, i: int) -> int:
+        escape = self._escape + text[i]
+        i += 1
+        if escape[1] != "u":
+            decoded = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r",
+                       "t": "\t"}.get(escape[1])
+            if decoded is None:
+                self._fail(f"invalid escape {escape!r}")
+                return len(text)
+            self._flush_surrogate()
+            self._chars.append(decoded)
+            self._escape = ""
+        elif len(escape) < 6:
+            self._escape = escape
+        else:
+            self._escape = ""
+            try:
+                code = int(escape[2:], 16)
+            except ValueError:
+                self._fail(f"invalid escape {escape!r}")
+                return len(text)
+            if self._high_surrogate is not None and 0xDC00 <= code < 0xE000:
+                pair = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+                self._high_surrogate = None
+                self._chars.append(chr(pair))
+            else:
+                self._flush_surrogate()
+                if 0xD800 <= code < 0xDC00:
+                    self._high_surrogate = code  # Wait for its low half
+                else:
+                    self._chars.append(chr(code))
+        return i
+
+    def _flush_surrogate(self):
+        if self._high_surrogate is not None:
+            self._chars.append(chr(self._high_surrogate))  # Unpaired, as json.loads leaves it
+            self._high_surrogate = None
+
+    def _emit_text(self, start: int):
+        if self._state == "string" and self.on_text and len(self._chars) > start:
+            self.on_text(self._key, "".join(self._chars[start:]))
+
+    def _end_string(self):
+        text = "".join(self._chars)
+        if self._state == "key":
+            self._key, self._state = text, "colon"
+        else:
+            self._set_value(text)
+
+    def _read_raw(self, text: str, i: int) -> int:
+        """Collects a number, literal, array or object; ends at the ',' or '}' that follows it."""
+        n = len(text)
+        start = i
+        while i < n:
+            char = text[i]
+            if self._raw_in_string:
+                if self._raw_escape:
+                    self._raw_escape = False
+                elif char == "\\":
+                    self._raw_escape = True
+                elif char == '"':
+                    self._raw_in_string = False
+            elif char == '"':
+                self._raw_in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}" and self._depth:
+                self._depth -= 1
+            elif char in ",}" and not self._depth:
+                self._raw.append(text[start:i])
+                try:
+                    value = json.loads("".join(self._raw))
+                except ValueError:
+                    self._fail(f"invalid value for {self._key!r}")
+                    return n
+                self._set_value(value)
+                return i  # comma_or_end reads the delimiter
+            i += 1
+        self._raw.append(text[start:i])
+        return i
+
+    def _set_value(self, value: Any):
+        self.fields[self._key] = value
+        self._state = "comma_or_end"
+        if self.on_value:
+            self.on_value(self._key, value)
+
+    def _finish(self):
+        self._state, self.done = "done", True
+
+    def _fail(self, message: str):
+        self._state, self.error = "failed", message
+    # --- End States ---
+
+
+class SentenceSplitter:
+    """Cuts streamed text into sentences of at least MIN_SENTENCE_CHARS, each as soon as it is complete."""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        sentences, start = [], 0
+        for end in _SENTENCE_END.finditer(self._buffer):
+            if end.end() - start >= self.min_chars:
+                sentence = self._buffer[start:end.end()].strip()
+                if sentence:
+                    sentences.append(sentence)
+                start = end.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def rest(self) -> str:
+        """Whatever has not been returned yet (call once the text is complete)."""
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest
+
+
+class CodeChecker:
+    """
+    Syntax-checks streamed Python code as it arrives. Each time a new
+    top-level statement starts, the code before it is compiled with codeop,
+    which tells incomplete code (an open bracket or string that later lines
+    may close) from code that is already wrong. `error` is set on the first
+    definite SyntaxError, so the caller can stop the stream early.
+    """
+
+    def __init__(self, filename: str = "<neura>"):
+        self.filename = filename
+        self.error: Optional[SyntaxError] = None
+        self._code = ""
+        self._scan = 0  # Where to look for the next newline
+
+    def feed(self, text: str) -> Optional[SyntaxError]:
+        self._code += text
+        while self.error is None:
+            newline = self._code.find("\n", self._scan)
+            # The first character of the following line tells whether a new statement starts there
+            if newline < 0 or newline + 1 >= len(self._code):
+                break
+            self._scan = newline + 1
+            if self._code[self._scan] not in _WHITESPACE and \
+                    not self._code.startswith(CONTINUATION_PREFIXES, self._scan) and \
+                    not _continues(self._code, newline):
+                self._check(self._code[:self._scan], final=False)
+        return self.error
+
+    def finish(self, code: str) -> Optional[SyntaxError]:
+        """Checks the complete code (as json.loads decoded it)."""
+        if self.error is None:
+            self._check(code, final=True)
+        return self.error
+
+    def _check(self, code: str, final: bool):
+        try:
+            if final:
+                compile(code, self.filename, "exec")
+            else:
+                codeop.compile_command(code, self.filename, "exec")
+        except SyntaxError as e:
+            self.error = e
+        except (ValueError, OverflowError):
+            pass  # e.g. null bytes; exec will report it
+
+
+def _continues(code: str, newline: int) -> bool:
+    """Whether the line ending at `newline` ends with a backslash continuation (an odd run of backslashes)."""
+    i = newline - 1 if newline and code[newline - 1] == "\r" else newline
+    backslashes = 0
+    while i > 0 and code[i - 1] == "\\":
+        backslashes += 1
+        i -= 1
+    return backslashes % 2 == 1
@@ -0,0 +1,191 @@
+#tooling: load test of the Neura HTTP API (neura_server.py) against a local fake LLM (run from the agents/ folder)
+#usage: python api_bench.py [--clients 1 4 16 64] [--seconds 10] [--llm-ms 200] [--workers 4] [--code-share 0.5]
+
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import contextlib
+import http.client
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+import neura_api
+from neura_server import NeuraAPIServer, encode_response, read_request
+
+
+class FakeLLM:
+    """
+    Answers OpenAI-style chat completion requests with a canned Neura action
+    after `latency_ms` (+-25% jitter): a "talk" reply, or with probability
+    `code_share` a short "execute_python" script. `actions`, if given, are
+    answered in turn instead. With `tokens_per_s` the reply is generated at
+    that rate (about 4 characters per token) after the latency: a request with
+    "stream": true gets it as server-sent events while it is generated, any
+    other request gets it once complete, as a real endpoint would. With
+    probability `error_share` a request is refused with a 429 or 503 and
+    "Retry-After: 0" instead, like an overloaded endpoint.
+    """
+
+    def __init__(self, latency_ms: float, code_share: float = 0.5, tokens_per_s: float = 0.0,
+                 actions: Optional[List[dict]] = None, error_share: float = 0.0):
+        self.latency_ms = latency_ms
+        self.code_share = code_share
+        self.tokens_per_s = tokens_per_s
+        self.actions = actions
+        self.error_share = error_share
+        self.calls = 0
+        self.errors = 0
+        self.connections = 0  # TCP connections accepted (fewer than calls when clients keep them alive)
+        self.aborted = 0  # Streams the client closed before the end
+
+    def next_action(self) -> dict:
+        if self.actions:
+            return self.actions[self.calls % len(self.actions)]
+        if random.random() < self.code_share:
+            return {"action": "execute_python", "code_to_run": "total = sum(range(1000))\nprint(total)"}
+        return {"action": "talk", "response_text": "Paris is the capital of France."}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                content = json.dumps(self.next_action())
+                self.calls += 1
+                await asyncio.sleep(self.latency_ms / 1000 * random.uniform(0.75, 1.25))
+                keep_alive = request[2].get("connection", "").lower() != "close"
+                if random.random() < self.error_share:
+                    self.errors += 1
+                    writer.write(encode_response(random.choice((429, 503)), {"error": {"message": "overloaded"}},
+                                                 headers={"Retry-After": "0"}, keep_alive=keep_alive))
+                    await writer.drain()
+                elif json.loads(request[3] or b"{}").get("stream"):
+                    await self._stream(writer, content)
+                else:
+                    if self.tokens_per_s:
+                        await asyncio.sleep(len(content) / 4 / self.tokens_per_s)
+                    payload = {"choices": [{"message": {"role": "assistant", "content": content}}]}
+                    writer.write(encode_response(200, payload, keep_alive=keep_alive))
+                    await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            self.aborted += 1
+        finally:
+            writer.close()
+
+    async def _stream(self, writer: asyncio.StreamWriter, content: str):
+        """Sends `content` 4 characters (one token) at a time as chunked server-sent events."""
+        def chunk(data: bytes) -> bytes:
+            return b"%x\r\n%s\r\n" % (len(data), data)
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        start = time.perf_counter()
+        for n, offset in enumerate(range(0, len(content), 4)):
+            if self.tokens_per_s:
+                # Sleep in 10ms steps at most, like a server flushing a few tokens at a time
+                due = start + n / self.tokens_per_s
+                if due - time.perf_counter() > 0.01:
+                    await writer.drain()
+                    await asyncio.sleep(due - time.perf_counter())
+            event = {"choices": [{"index": 0, "delta": {"content": content[offset:offset + 4]}}]}
+            writer.write(chunk(b"data: " + json.dumps(event).encode() + b"\n\n"))
+        writer.write(chunk(b"data: [DONE]\n\n") + chunk(b""))
+        await writer.drain()
+
+
+def _start_servers(args) -> Tuple[asyncio.AbstractEventLoop, NeuraAPIServer, int]:
+    """Runs the fake LLM and the API server on one event loop in a background thread."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    async def main():
+        llm = await asyncio.start_server(FakeLLM(args.llm_ms, args.code_share).handle, "127.0.0.1", 0)
+        state['llm_port'] = llm.sockets[0].getsockname()[1]
+        api = NeuraAPIServer("127.0.0.1", 0, workers=args.workers, max_queued=args.max_queued)
+        await api.start()
+        state['api'] = api
+        ready.set()
+
+    threading.Thread(target=loop.run_forever, name="api-bench-loop", daemon=True).start()
+    asyncio.run_coroutine_threadsafe(main(), loop)
+    ready.wait()
+    return loop, state['api'], state['llm_port']
+
+
+def _client(port: int, deadline: float, results: List[Tuple[float, int]]):
+    """One frontend window: POSTs prompts back to back over a keep-alive connection until `deadline`."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    body = json.dumps({"prompt": "what is the capital of France"})
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/api/prompt", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader("Connection", "").lower() == "close":
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            status = 0
+            conn.close()
+        results.append(((time.perf_counter() - start) * 1000, status))
+        if status == 503:
+            time.sleep(0.05)  # Back off a little when the queue is full, like a polite client
+    conn.close()
+
+
+def load_report(args):
+    """Prints requests/sec and latency percentiles per number of concurrent clients."""
+    neura_api.FIREWORK_API_KEY = "fake"
+    loop, api, llm_port = _start_servers(args)
+    neura_api.FIREWORK_API_URL = f"http://127.0.0.1:{llm_port}/v1/chat/completions"
+    print(f"[BENCH] API on port {api.port} with {args.workers} job workers, queue {args.max_queued}; "
+          f"fake LLM {args.llm_ms:.0f} ms, {args.code_share:.0%} code actions; {args.seconds:.0f}s per level")
+
+    rows = []
+    for clients in args.clients:
+        results: List[Tuple[float, int]] = []
+        deadline = time.perf_counter() + args.seconds
+        threads = [threading.Thread(target=_client, args=(api.port, deadline, results)) for _ in range(clients)]
+        start = time.perf_counter()
+        with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):  # Per-request agent logs
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        ok = [ms for ms, status in results if status == 200]
+        statuses: Dict[int, int] = {}
+        for _, status in results:
+            if status != 200:
+                statuses[status] = statuses.get(status, 0) + 1
+        rows.append((clients, len(ok) / elapsed, ok, statuses))
+
+    print(f"{'clients':>8}{'ok req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}  rejected/failed")
+    for clients, rate, ok, statuses in rows:
+        percentiles = [np.percentile(ok, p) for p in (50, 99)] + [max(ok)] if ok else [float('nan')] * 3
+        failures = ", ".join(f"{status or 'conn'}: {count}" for status, count in sorted(statuses.items())) or "-"
+        print(f"{clients:>8}{rate:>10.1f}" + "".join(f"{value:>9.1f}" for value in percentiles) + f"  {failures}")
+
+    asyncio.run_coroutine_threadsafe(api.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the Neura API against a fake LLM")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="concurrent clients per run")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each run")
+    parser.add_argument("--llm-ms", type=float, default=200.0, help="fake LLM response time")
+    parser.add_argument("--code-share", type=float, default=0.5, help="share of execute_python actions")
+    parser.add_argument("--workers", type=int, default=4, help="API job workers")
+    parser.add_argument("--max-queued", type=int, default=32, help="API job queue bound")
+    load_report(parser.parse_args())
@@ -0,0 +1,97 @@
+#pipeline: streaming text chunker, so whole files (not just their first 250 characters) get indexed
+
+import mmap
+import codecs
+from typing import Dict, Iterator, List, Union
+
+# --- Configuration ---
+CHUNK_CHARS = 1000  # Characters per chunk (MiniLM sees ~256 tokens, roughly this much English text)
+CHUNK_OVERLAP = 200  # Characters shared by neighbouring chunks, so no sentence is cut off from its context
+MAX_CHUNKS_PER_FILE = 512  # Hard cap per file; bounds memory and vectors for huge files
+READ_BLOCK = 1 << 16  # Bytes decoded per step when streaming a file
+# --------------------
+
+Chunk = Dict[str, Union[str, int]]  # {'text': str, 'start': int, 'end': int} (character offsets)
+
+
+def _chunk_stream(blocks: Iterator[str], chunk_chars: int, overlap: int, max_chunks: int) -> Iterator[Chunk]:
+    """Turns a stream of decoded text blocks into overlapping chunks without holding the whole text."""
+    step = max(1, chunk_chars - overlap)
+    pending = ''  # Decoded text not yet fully covered by a chunk
+    offset = 0  # Character offset of pending[0] in the document
+    last_end = 0
+    emitted = 0
+
+    def emit(piece: str):
+        nonlocal last_end, emitted
+        end = offset + len(piece)
+        if end <= last_end:
+            return None  # Tail already covered by the previous chunk's overlap
+        last_end = end
+        if not piece.strip():
+            return None
+        emitted += 1
+        return {'text': piece, 'start': offset, 'end': end}
+
+    for block in blocks:
+        pending += block
+        while len(pending) >= chunk_chars:
+            chunk = emit(pending[:chunk_chars])
+            if chunk:
+                yield chunk
+                if emitted >= max_chunks:
+                    return
+            pending = pending[step:]
+            offset += step
+
+    if pending:
+        chunk = emit(pending)
+        if chunk:
+            yield chunk
+
+
+def chunk_text(text: str, chunk_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP,
+               max_chunks: int = MAX_CHUNKS_PER_FILE) -> List[Chunk]:
+    """Splits an in-memory string into overlapping chunks."""
+    return list(_chunk_stream(iter([text]), chunk_chars, overlap, max_chunks))
+
+
+def _read_blocks(path: str) -> Iterator[str]:
+    """Decodes a UTF-8 file block by block, via mmap where the OS allows it."""
+    decoder = codecs.getincrementaldecoder('utf-8')('strict')
+    with open(path, 'rb') as f:
+        try:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            view = None  # Empty or special files cannot be mapped; fall back to read()
+
+        try:
+            pos = 0
+            while True:
+                if view is not None:
+                    raw = view[pos:pos + READ_BLOCK]
+                    pos += len(raw)
+                else:
+                    raw = f.read(READ_BLOCK)
+                if not raw:
+                    break
+                yield decoder.decode(raw)
+            yield decoder.decode(b'', final=True)
+        finally:
+            if view is not None:
+                view.close()
+
+
+def iter_file_chunks(path: str, chunk_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP,
+                     max_chunks: int = MAX_CHUNKS_PER_FILE) -> Iterator[Chunk]:
+    """
+    Streams overlapping chunks of a text file. Memory stays bounded by the chunk
+    size plus one read block, whatever the file size. Raises UnicodeDecodeError
+    for binary / non-UTF-8 files.
+    """
+    return _chunk_stream(_read_blocks(path), chunk_chars, overlap, max_chunks)
+
+
+def read_file_chunks(path: str, max_chunks: int = MAX_CHUNKS_PER_FILE) -> List[Chunk]:
+    """All chunks of a file (at most `max_chunks`), ready to pass to add_documents."""
+    return list(iter_file_chunks(path, max_chunks=max_chunks))
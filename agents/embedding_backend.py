@@ -0,0 +1,234 @@
+#pipeline: embedding backends behind MemoryCore: PyTorch sentence-transformers, ONNX Runtime (int8) and a hash embedder
+
+import os
+import math
+import time
+import hashlib
+import functools
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from lexical_index import term_counts
+
+# --- Configuration ---
+EMBEDDING_BACKEND = os.environ.get("NEURA_EMBEDDING_BACKEND", "torch")  # "torch", "onnx" or "hash"
+MODEL_NAME = 'all-MiniLM-L6-v2'  # A fast, small embedding model
+MODEL_REPO = f"sentence-transformers/{MODEL_NAME}"  # Hugging Face repo the ONNX backend downloads from
+ONNX_MODEL_FILE = "onnx/model_quint8_avx2.onnx"  # int8 export in MODEL_REPO; "onnx/model.onnx" for float32
+ONNX_MAX_TOKENS = 256  # Same truncation as the sentence-transformers model
+HASH_DIMENSION = 384  # Hash embedder size (matches MODEL_NAME, so index layouts benchmark alike)
+# --------------------
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype('float32')
+
+
+class EmbeddingBackend:
+    """
+    Turns texts into unit-length float32 vectors. Backends load their model on
+    first use. `space` names the vector space: vectors are only comparable
+    within one space, so MemoryCore records it in the store and refuses to mix
+    spaces. With start_pool(), large encode() calls are split across worker
+    processes.
+    """
+    name = ""
+
+    def __init__(self, threads: Optional[int] = None):
+        self.threads = threads  # Intra-op threads; None leaves the runtime's default
+        self.timings: Dict[str, float] = {}
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_workers = 0
+
+    @property
+    def space(self) -> str:
+        raise NotImplementedError
+
+    @property
+    def dimension(self) -> int:
+        self.load()
+        return self._dimension
+
+    def load(self):
+        """Imports and loads the model once; import and load times go to `timings`."""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """(len(texts), dimension) unit vectors; more than one batch is spread over the pool if it runs."""
+        texts = list(texts)
+        if self._pool is not None and len(texts) > batch_size:
+            share = max(batch_size, math.ceil(len(texts) / self._pool_workers))
+            parts = [texts[n:n + share] for n in range(0, len(texts), share)]
+            futures = [self._pool.submit(_pool_encode, part, batch_size) for part in parts]
+            return np.concatenate([future.result() for future in futures])
+        self.load()
+        if not texts:
+            return np.empty((0, self._dimension), dtype='float32')
+        return self._encode(texts, batch_size)
+
+    # --- Process pool (bulk ingestion) ---
+    def start_pool(self, workers: int):
+        """Starts `workers` encoder processes, each with its own copy of this backend. No-op if running."""
+        if self._pool is not None or workers < 2:
+            return
+        threads = max(1, (os.cpu_count() or workers) // workers)
+        self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_pool_init, initargs=(self.name, threads))
+        self._pool_workers = workers
+        print(f"[MEMORY] Started {workers} '{self.name}' embedding processes.")
+
+    def stop_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+            self._pool_workers = 0
+    # --- End Process pool ---
+
+
+class TorchBackend(EmbeddingBackend):
+    """MODEL_NAME through sentence-transformers on PyTorch (the original path)."""
+    name = "torch"
+
+    @property
+    def space(self) -> str:
+        return MODEL_NAME
+
+    def _load(self):
+        start = time.perf_counter()
+        from sentence_transformers import SentenceTransformer
+        imported = time.perf_counter()
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+        print(f"[MEMORY] Initializing Embedding Model: {MODEL_NAME}")
+        self._model = SentenceTransformer(MODEL_NAME)
+        self._dimension = self._model.get_sentence_embedding_dimension()
+        self.timings['model_import'] = imported - start
+        self.timings['model_load'] = time.perf_counter() - imported
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return np.asarray(self._model.encode(texts, batch_size=batch_size), dtype='float32')
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    MODEL_NAME as an ONNX export run by ONNX Runtime, with the Hugging Face
+    tokenizer, mean pooling and normalisation done here. No PyTorch import.
+    The default export is int8-quantized. Its vectors are close to, but not
+    the same as, the float32 model's, so it counts as its own space.
+    """
+    name = "onnx"
+
+    @property
+    def space(self) -> str:
+        if ONNX_MODEL_FILE == "onnx/model.onnx":
+            return MODEL_NAME  # Same weights and precision as the PyTorch model
+        return f"{MODEL_NAME}+{os.path.splitext(os.path.basename(ONNX_MODEL_FILE))[0]}"
+
+    def _load(self):
+        start = time.perf_counter()
+        import onnxruntime
+        from tokenizers import Tokenizer
+        from huggingface_hub import hf_hub_download
+        imported = time.perf_counter()
+        print(f"[MEMORY] Initializing Embedding Model: {MODEL_REPO}/{ONNX_MODEL_FILE} (ONNX Runtime)")
+        self._tokenizer = Tokenizer.from_file(hf_hub_download(MODEL_REPO, "tokenizer.json"))
+        self._tokenizer.enable_truncation(ONNX_MAX_TOKENS)
+        self._tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        self._session = onnxruntime.InferenceSession(hf_hub_download(MODEL_REPO, ONNX_MODEL_FILE), options,
+                                                     providers=["CPUExecutionProvider"])
+        self._inputs = {node.name for node in self._session.get_inputs()}
+        self._dimension = int(self._session.get_outputs()[0].shape[-1])
+        self.timings['model_import'] = imported - start
+        self.timings['model_load'] = time.perf_counter() - imported
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        vectors = np.empty((len(texts), self._dimension), dtype='float32')
+        # Similar lengths share a batch, so little compute goes into padding
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            encodings = self._tokenizer.encode_batch([texts[row] for row in rows])
+            input_ids = np.array([e.ids for e in encodings], dtype='int64')
+            mask = np.array([e.attention_mask for e in encodings], dtype='int64')
+            feed = {'input_ids': input_ids, 'attention_mask': mask, 'token_type_ids': np.zeros_like(input_ids)}
+            hidden = self._session.run(None, {name: value for name, value in feed.items() if name in self._inputs})[0]
+            weights = mask[:, :, None].astype('float32')
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            vectors[rows] = _unit_rows(pooled)
+        return vectors
+
+
+class HashBackend(EmbeddingBackend):
+    """
+    Deterministic feature hashing of the lexical tokens: no model weights and
+    no randomness, so tests and benchmarks run anywhere and repeat exactly.
+    Texts sharing words land near each other; there is no semantics beyond that.
+    """
+    name = "hash"
+
+    @property
+    def space(self) -> str:
+        return f"hash-{HASH_DIMENSION}"
+
+    def _load(self):
+        self._dimension = HASH_DIMENSION
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1 << 16)
+    def _bucket(token: str) -> Tuple[int, float]:
+        digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+        return digest % HASH_DIMENSION, 1.0 if digest >> 63 else -1.0
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        vectors = np.zeros((len(texts), HASH_DIMENSION), dtype='float32')
+        for row, text in enumerate(texts):
+            # Token-free text still gets a fixed, non-zero vector
+            counts = term_counts(text) or {"": 1}
+            buckets, signs = zip(*map(self._bucket, counts))
+            weights = np.log(np.fromiter(counts.values(), dtype='float32', count=len(counts))) + 1.0
+            np.add.at(vectors[row], np.array(buckets), np.array(signs, dtype='float32') * weights)
+        return _unit_rows(vectors)
+
+
+BACKENDS = {backend.name: backend for backend in (TorchBackend, OnnxBackend, HashBackend)}
+
+
+def make_backend(name: str = EMBEDDING_BACKEND, threads: Optional[int] = None) -> EmbeddingBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}' (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name](threads)
+
+
+# Set in each pool worker by _pool_init
+_worker_backend: Optional[EmbeddingBackend] = None
+
+
+def _pool_init(name: str, threads: int):
+    global _worker_backend
+    _worker_backend = make_backend(name, threads)
+    _worker_backend.load()
+
+
+def _pool_encode(texts: List[str], batch_size: int) -> np.ndarray:
+    return _worker_backend.encode(texts, batch_size)
@@ -0,0 +1,101 @@
+#pipeline: persistent LRU cache of text embeddings, so unchanged text is never re-encoded
+
+import os
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# --- Configuration Constants ---
+EMBED_CACHE_FILE = "neura_embed_cache.npz"
+EMBED_CACHE_SIZE = 20000  # Max cached vectors (~30 MB at 384 float32 dims)
+# -------------------------------
+
+
+class EmbeddingCache:
+    """
+    Maps hash(model name + exact encoded text) -> vector with LRU eviction.
+    Keying on the model name means switching models never serves stale vectors.
+    """
+
+    def __init__(self, model_name: str, path: str = EMBED_CACHE_FILE, max_entries: int = EMBED_CACHE_SIZE):
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode('utf-8', 'replace')).hexdigest()
+
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Returns the cached vector for each text, or None on a miss."""
+        found = []
+        with self._lock:
+            for text in texts:
+                k = self.key(text)
+                vector = self._entries.get(k)
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(k)
+                    self.hits += 1
+                found.append(vector)
+        return found
+
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                k = self.key(text)
+                self._entries[k] = np.array(vector, dtype='float32')
+                self._entries.move_to_end(k)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                if str(data['model']) != self.model_name:
+                    return
+                for k, vector in zip(data['keys'], data['vectors']):
+                    self._entries[str(k)] = vector
+        except Exception as e:
+            print(f"[MEMORY] Ignoring unreadable embedding cache {self.path}: {e}")
+            self._entries.clear()
+
+
+    def save(self):
+        """Writes the cache (in LRU order) atomically; no-op if nothing changed."""
+        with self._lock:
+            if not self._dirty or not self._entries:
+                return
+            keys = np.array(list(self._entries.keys()))
+            vectors = np.stack(list(self._entries.values()))
+            self._dirty = False
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, model=np.array(self.model_name), keys=keys, vectors=vectors)
+        os.replace(tmp_path, self.path)
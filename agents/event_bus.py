@@ -0,0 +1,180 @@
+#pipeline: lifecycle events (speech, LLM, tools, shell output, indexing, memory stats) for the frontend's live stream
+#usage: event_bus.publish("tool.start", tool="semantic_file_search"); neura_server.py streams them at GET /api/events
+
+import os
+import json
+import time
+import queue
+import threading
+import contextlib
+import urllib.request
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# --- Configuration ---
+EVENT_HISTORY = 512  # Recent events kept for streams that reconnect (SSE Last-Event-ID)
+# Latest event of these types is kept regardless of age, so a new stream starts from the current state
+STICKY_TYPES = {"memory.stats", "index.metrics", "index.crawl"}
+# Processes other than the API server (file watcher, memory server) forward their events here
+FORWARD_URL = os.environ.get(
+    "NEURA_EVENTS_URL", f"http://127.0.0.1:{os.environ.get('NEURA_API_PORT', '5001')}/api/events")
+API_TOKEN = os.environ.get("NEURA_API_TOKEN", "")  # Sent as X-Neura-Token when the API server requires it
+FORWARD_QUEUE = 1024  # Events waiting to be forwarded; beyond this new ones are dropped
+FORWARD_BATCH = 64  # Events per POST
+FORWARD_RETRY = 5.0  # Seconds to drop events after the API server could not be reached
+MAX_LINE_CHARS = 2000  # Output lines are cut to this length
+# --- End Configuration ---
+
+
+class EventBus:
+    """
+    In-process publish/subscribe. publish() may be called from any thread and
+    never blocks on subscribers: they are called inline, so they must only
+    hand the event off (e.g. loop.call_soon_threadsafe or a queue). Events are
+    dicts with an increasing `id`, a dotted `type`, a `time` and the job id of
+    the publishing thread, if any.
+    """
+
+    def __init__(self, history: int = EVENT_HISTORY):
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+
+    def publish(self, kind: str, /, **data) -> Dict[str, Any]:
+        event = dict(data, type=kind, time=time.time())
+        job_id = current_job()
+        if job_id is not None and "job_id" not in event:
+            event["job_id"] = job_id
+        with self._lock:
+            event["id"] = self._next_id
+            self._next_id += 1
+            self._history.append(event)
+            if kind in STICKY_TYPES:
+                self._latest[kind] = event
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[EVENTS] Subscriber failed: {type(e).__name__}: {e}")
+        return event
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def replay(self, last_id: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Events after `last_id` that are still in the history (or, for None, the
+        latest event of each STICKY_TYPES type), and the id of the newest event.
+        """
+        with self._lock:
+            if last_id is None:
+                events = sorted(self._latest.values(), key=lambda event: event["id"])
+            else:
+                events = [event for event in self._history if event["id"] > last_id]
+            return events, self._next_id - 1
+
+
+BUS = EventBus()
+_job = threading.local()
+
+
+def publish(kind: str, /, **data) -> Dict[str, Any]:
+    return BUS.publish(kind, **data)
+
+
+def current_job() -> Optional[str]:
+    return getattr(_job, "id", None)
+
+
+@contextlib.contextmanager
+def job_context(job_id: Optional[str]):
+    """Tags events published by this thread with `job_id` (worker threads re-enter it for their job)."""
+    previous = current_job()
+    _job.id = job_id
+    try:
+        yield
+    finally:
+        _job.id = previous
+
+
+def clip(line: str) -> str:
+    return line if len(line) <= MAX_LINE_CHARS else line[:MAX_LINE_CHARS] + "..."
+
+
+class EventForwarder:
+    """
+    Sends this process's events to the API server (POST /api/events) from a
+    background thread, in batches. Best effort: while the server is down
+    events are dropped, and publishers never wait on the network.
+    """
+
+    def __init__(self, source: str, url: str = FORWARD_URL):
+        self.source = source
+        self.url = url
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=FORWARD_QUEUE)
+        self._offline_until = 0.0
+        self._opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))  # Local traffic only
+        self._headers = {"Content-Type": "application/json"}
+        if API_TOKEN:
+            self._headers["X-Neura-Token"] = API_TOKEN
+        self._thread = threading.Thread(target=self._run, name="neura-event-forwarder", daemon=True)
+
+    def start(self):
+        BUS.subscribe(self._enqueue)
+        self._thread.start()
+
+    def _enqueue(self, event: Dict[str, Any]):
+        if time.monotonic() < self._offline_until:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < FORWARD_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = [{k: v for k, v in event.items() if k != "id"} for event in batch]
+            try:
+                # Payload values that are not JSON (paths, numpy numbers, exceptions) go as str, as on the stream
+                body = json.dumps({"source": self.source, "events": events}, default=str).encode()
+            except (TypeError, ValueError) as e:
+                # E.g. a circular payload; drop this batch, not the forwarder thread
+                self.dropped += len(batch)
+                print(f"[EVENTS] Dropped {len(batch)} unencodable events: {type(e).__name__}: {e}")
+                continue
+            request = urllib.request.Request(self.url, method="POST", data=body, headers=self._headers)
+            try:
+                self._opener.open(request, timeout=2.0).close()
+            except OSError:
+                # The API server is not running (or restarting); try again later
+                self.dropped += len(batch)
+                self._offline_until = time.monotonic() + FORWARD_RETRY
+
+
+_forwarder: Optional[EventForwarder] = None
+
+
+def forward_to_api(source: str) -> EventForwarder:
+    """Starts forwarding this process's events to the API server (once per process)."""
+    global _forwarder
+    if _forwarder is None:
+        _forwarder = EventForwarder(source)
+        _forwarder.start()
+    return _forwarder
@@ -5,10 +5,14 @@
 import time
 import os
 import logging
+import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 # --- FIXED IMPORTS ---
-from memory_core import MemoryCore, MEMORY_FILE, METADATA_FILE
+import event_bus
+from memory_client import MemoryClient
+from indexing_queue import IndexingQueue, IndexingWorkerPool, UPSERT, DELETE
+from workspace_crawl import initial_crawl, make_ignore_matcher
 # ---------------------
 
 # Set up logging for the daemon
@@ -17,78 +21,120 @@ logging.basicConfig(level=logging.INFO,
                     datefmt='%Y-%m-%d %H:%M:%S')
 
 # --- Configuration ---
-# WATCH_PATH: Watch the directory where the agent scripts are running
-WATCH_PATH = os.path.expanduser((os.path.abspath(__file__))) 
+# WATCH_ROOTS: Directories watched recursively. Defaults to the folder the agent
+# scripts live in; override with NEURA_WATCH_ROOTS (os.pathsep-separated, ~ allowed)
+WATCH_ROOTS = [
+    os.path.abspath(os.path.expanduser(root))
+    for root in os.environ.get("NEURA_WATCH_ROOTS", os.path.dirname(os.path.abspath(__file__))).split(os.pathsep)
+    if root
+]
 
-# IGNORED_FILES: Ignore internal files to prevent infinite loops/corruption
-IGNORED_FILES = [MEMORY_FILE, METADATA_FILE, '.env', 'venv'] 
+# IGNORE_PATTERNS: Globs matched against the basename or the full path. Internal
+# files are ignored to prevent infinite loops/corruption; the rest is noise.
+IGNORE_PATTERNS = [
+    'neura_memory*', 'neura_metadata*', 'neura_embed_cache*', 'neura_lexical*', '.env', 'venv', '.venv',
+    '.git', 'node_modules', '__pycache__', '.DS_Store', '*.pyc', '*.tmp', '*.swp', '*~',
+]
+
+# INITIAL_CRAWL: Index files that already exist under WATCH_ROOTS at startup
+INITIAL_CRAWL = os.environ.get("NEURA_INITIAL_CRAWL", "1") == "1"
+
+# METRICS_INTERVAL: Seconds between queue depth / latency log lines
+METRICS_INTERVAL = 30
+
+# EVENT_INTERVAL: Seconds between index.metrics events for the frontend (sent only when they changed)
+EVENT_INTERVAL = 1
 # --- End Configuration ---
 
 
 class NeuraFileHandler(FileSystemEventHandler):
     """
     Custom handler to process file system events and update Neura's memory.
+    Events are only queued here; the observer thread never reads or embeds files.
     """
-    def __init__(self, memory_instance):
-        self.memory = memory_instance
+    def __init__(self, indexing_queue, is_ignored):
+        self.queue = indexing_queue
+        self.is_ignored = is_ignored
     
-    def _process_file(self, event):
-        """Helper to handle create/modify events."""
-        src_path = event.src_path
-        
-        # 1. Ignore directories and internal files
-        if event.is_directory or any(f in os.path.basename(src_path) for f in IGNORED_FILES):
-            return
-
-        # 2. Get file content snippet for indexing
-        try:
-            with open(src_path, 'r') as f:
-                content_snippet = f.read(250)
-            
-            summary = f"Content Snippet: '{content_snippet.strip()}...'"
-            
-            # 3. Add/Update memory
-            # Uses the add_document function which handles vector creation and saving
-            self.memory.add_document(src_path, summary)
-            logging.info(f"Indexed/Updated: {os.path.basename(src_path)}")
-            
-        except UnicodeDecodeError:
-            logging.warning(f"Skipped indexing binary file: {os.path.basename(src_path)}")
-        except Exception as e:
-            logging.error(f"Error processing {src_path}: {e}")
+    def _is_ignored(self, event, path):
+        """Directories and ignored files are never indexed."""
+        if event.is_directory or self.is_ignored(path):
+            return True
+        # Anything inside an ignored directory (e.g. .git/objects/...) is ignored too
+        parts = os.path.abspath(path).split(os.sep)
+        return any(self.is_ignored(part) for part in parts[:-1] if part)
+
+    def _enqueue(self, event, path, action):
+        if not self._is_ignored(event, path):
+            self.queue.put(os.path.abspath(path), action)
 
     # --- Event Hooks ---
     def on_created(self, event):
-        self._process_file(event)
+        self._enqueue(event, event.src_path, UPSERT)
 
     def on_modified(self, event):
-        self._process_file(event)
+        self._enqueue(event, event.src_path, UPSERT)
 
     def on_deleted(self, event):
-        # NOTE: For simplicity, we only log deletions in the prototype.
-        logging.info(f"Detected deletion: {os.path.basename(event.src_path)}")
+        # Drop the vector so dead paths stop showing up in search results
+        self._enqueue(event, event.src_path, DELETE)
+
+    def on_moved(self, event):
+        # A rename is a delete of the old path plus a create of the new one
+        self._enqueue(event, event.src_path, DELETE)
+        self._enqueue(event, event.dest_path, UPSERT)
     # --- End Event Hooks ---
 
 
 if __name__ == "__main__":
-    # Initialize the global MemoryCore instance for the daemon
-    neura_memory_instance = MemoryCore() 
+    # Connect to the shared memory server (started on demand) instead of
+    # loading a second copy of the model and index in this process
+    neura_memory_instance = MemoryClient() 
+
+    # Indexing progress goes to the frontend's event stream through the API server, if it runs
+    event_bus.forward_to_api("file_watcher")
+
+    # Observer -> coalescing queue -> worker pool -> memory
+    indexing_queue = IndexingQueue()
+    workers = IndexingWorkerPool(neura_memory_instance, indexing_queue)
+    workers.start()
     
-    event_handler = NeuraFileHandler(neura_memory_instance)
+    is_ignored = make_ignore_matcher(IGNORE_PATTERNS)
+    event_handler = NeuraFileHandler(indexing_queue, is_ignored)
     observer = Observer()
     
-    # Start watching the configured path
-    observer.schedule(event_handler, WATCH_PATH, recursive=False)
+    # Start watching the configured roots (recursively)
+    for root in WATCH_ROOTS:
+        observer.schedule(event_handler, root, recursive=True)
     observer.start()
 
-    print(f"\n[NEURA DAEMON] Starting File Watch on: {WATCH_PATH}")
+    print(f"\n[NEURA DAEMON] Starting File Watch on: {', '.join(WATCH_ROOTS)}")
     print("Press Ctrl+C to stop the daemon.")
 
+    # Catch up on files that changed while the daemon was not running. The
+    # observer is already live, so nothing is missed while the crawl runs.
+    if INITIAL_CRAWL:
+        threading.Thread(
+            target=initial_crawl, args=(neura_memory_instance, WATCH_ROOTS, is_ignored),
+            name="neura-initial-crawl", daemon=True,
+        ).start()
+
     try:
+        last_report = time.monotonic()
+        last_metrics = None
         while True:
-            time.sleep(1)
+            time.sleep(EVENT_INTERVAL)
+            metrics = workers.metrics()
+            if metrics != last_metrics:
+                last_metrics = metrics
+                event_bus.publish("index.metrics", **metrics)
+            if time.monotonic() - last_report >= METRICS_INTERVAL:
+                last_report = time.monotonic()
+                logging.info(f"Indexing metrics: {workers.metrics()}")
     except KeyboardInterrupt:
         observer.stop()
         
     observer.join()
+    workers.stop()
+    logging.info(f"Final indexing metrics: {workers.metrics()}")
     print("[NEURA DAEMON] Shut down.")
\ No newline at end of file
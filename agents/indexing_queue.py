@@ -0,0 +1,239 @@
+#pipeline: debounced, coalescing queue between the file watcher and Neura's memory
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import event_bus
+from chunker import read_file_chunks
+
+# --- Configuration ---
+DEBOUNCE_SECONDS = 0.75  # A path must be quiet this long before it is indexed
+MAX_PENDING = 10000  # Distinct pending paths before put() blocks (backpressure)
+PUT_TIMEOUT = 5.0  # Longest the observer thread waits on a full queue before dropping an event
+WORKER_COUNT = 2  # Threads draining the queue
+WORKER_BATCH_SIZE = 64  # Paths handed to MemoryCore per add_documents call
+# --- End Configuration ---
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+def read_chunks(path: str, binary: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Returns the chunks indexed for a file (whole file, streamed), or None if it
+    cannot be read as text. Paths that failed to decode are appended to `binary`.
+    """
+    try:
+        return read_file_chunks(path)
+    except UnicodeDecodeError:
+        logging.warning(f"Skipped indexing binary file: {os.path.basename(path)}")
+        if binary is not None:
+            binary.append(path)
+        return None
+    except OSError as e:
+        logging.error(f"Error reading {path}: {e}")
+        return None
+
+
+def read_document(path: str, binary: Optional[List[str]] = None
+                  ) -> Optional[Tuple[str, List[Dict[str, Any]], Dict[str, Any]]]:
+    """(path, chunks, {'mtime', 'size'}) ready for add_documents, or None if unreadable (see read_chunks)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    chunks = read_chunks(path, binary)
+    if chunks is None:
+        return None
+    return (path, chunks, {'mtime': st.st_mtime, 'size': st.st_size})
+
+
+class IndexingQueue:
+    """
+    Pending work keyed by path. Repeated events for a path collapse into one
+    entry (the latest action wins) and restart its debounce timer, so an editor
+    save that fires several events costs one read and one embed. A path handed
+    out by take_batch stays in flight until done() is called for it; newer
+    events for it wait until then, so two workers never index the same path
+    at once and the latest action is always applied last.
+    """
+
+    def __init__(self, debounce: float = DEBOUNCE_SECONDS, max_pending: int = MAX_PENDING):
+        self.debounce = debounce
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()  # path -> (action, first, last)
+        self._in_flight = set()  # Paths taken by a worker and not yet done()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Metrics
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def put(self, path: str, action: str) -> bool:
+        """Queues an action for a path. Blocks (bounded) while the queue is full."""
+        now = time.monotonic()
+        with self._cond:
+            self.received += 1
+            if path in self._pending:
+                _, first_seen, _ = self._pending.pop(path)
+                self._pending[path] = (action, first_seen, now)
+                self.coalesced += 1
+                self._cond.notify()
+                return True
+
+            deadline = now + PUT_TIMEOUT
+            while len(self._pending) >= self.max_pending and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.dropped += 1
+                    logging.warning(f"Indexing queue full; dropped event for {os.path.basename(path)}")
+                    return False
+                self._cond.wait(remaining)
+
+            self._pending[path] = (action, now, now)
+            self._cond.notify()
+            return True
+
+    def take_batch(self, max_items: int) -> List[Tuple[str, str, float]]:
+        """
+        Waits until at least one path has been quiet for the debounce window and
+        is not in flight, and returns up to `max_items` of them as (path, action,
+        first_seen). They are in flight until done(). Returns [] once the queue
+        is closed and empty.
+        """
+        with self._cond:
+            while True:
+                # Entries are kept in order of their latest event, so the quiet
+                # ones form a prefix of the dict
+                now = time.monotonic()
+                batch = []
+                oldest = None  # Latest event of the first entry still in its debounce window
+                for path, (action, first_seen, last_seen) in self._pending.items():
+                    if len(batch) >= max_items:
+                        break
+                    if now - last_seen < self.debounce and not self._closed:
+                        oldest = last_seen
+                        break
+                    if path not in self._in_flight:  # Else it waits for done()
+                        batch.append((path, action, first_seen))
+                if batch:
+                    for path, _, _ in batch:
+                        del self._pending[path]
+                        self._in_flight.add(path)
+                    self._cond.notify_all()  # Wake producers blocked on a full queue
+                    return batch
+                if self._closed and not self._pending:
+                    return []
+
+                # Sleep until the oldest entry's debounce window ends, new work arrives
+                # or a path in flight is done
+                timeout = None if oldest is None else max(self.debounce - (now - oldest), 0.01)
+                self._cond.wait(timeout)
+
+    def done(self, batch: List[Tuple[str, str, float]]):
+        """Releases the paths of a batch from take_batch once it has been applied (or has failed)."""
+        with self._cond:
+            for path, _, _ in batch:
+                self._in_flight.discard(path)
+            self._cond.notify_all()
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class IndexingWorkerPool:
+    """Bounded pool of threads that drain an IndexingQueue into Neura's memory in batches."""
+
+    def __init__(self, memory, queue: IndexingQueue, workers: int = WORKER_COUNT,
+                 batch_size: int = WORKER_BATCH_SIZE):
+        self.memory = memory
+        self.queue = queue
+        self.batch_size = batch_size
+        self._threads = [
+            threading.Thread(target=self._run, name=f"neura-indexer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        self._stats_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.latencies: List[float] = []  # Seconds from first event to indexed (recent window)
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Lets the workers finish what is queued, then stops them."""
+        self.queue.close()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = self.queue.take_batch(self.batch_size)
+            if not batch:
+                return
+            try:
+                self._process(batch)
+            except Exception as e:
+                with self._stats_lock:
+                    self.failed += len(batch)
+                logging.error(f"Error indexing batch of {len(batch)} files: {e}")
+            finally:
+                self.queue.done(batch)
+
+    def _process(self, batch: List[Tuple[str, str, float]]):
+        upserts, removed, written = [], 0, 0
+        for path, action, _ in batch:
+            if action == DELETE:
+                if self.memory.remove_document(path):
+                    removed += 1
+                    logging.info(f"Removed from memory: {os.path.basename(path)}")
+            elif os.path.isfile(path):
+                document = read_document(path)
+                if document is not None:
+                    upserts.append(document)
+
+        if upserts:
+            # One encode and one persist for the whole batch; unchanged files are skipped
+            written = self.memory.add_documents(upserts, replace=True)
+            if written:
+                logging.info(f"Indexed/Updated {written} of {len(upserts)} changed files.")
+
+        now = time.monotonic()
+        with self._stats_lock:
+            self.processed += len(batch)
+            self.latencies.extend(now - first_seen for _, _, first_seen in batch)
+            del self.latencies[:-1000]
+        event_bus.publish("index.batch", paths=len(batch), indexed=written, removed=removed,
+                          files=[os.path.basename(path) for path, _, _ in batch[:10]],
+                          queue_depth=self.queue.depth())
+
+    def metrics(self) -> Dict[str, float]:
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+            processed, failed = self.processed, self.failed
+        p50 = latencies[len(latencies) // 2] if latencies else 0.0
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+        return {
+            'queue_depth': self.queue.depth(),
+            'received': self.queue.received,
+            'coalesced': self.queue.coalesced,
+            'dropped': self.queue.dropped,
+            'processed': processed,
+            'failed': failed,
+            'latency_p50_s': p50,
+            'latency_p99_s': p99,
+        }
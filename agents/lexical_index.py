@@ -0,0 +1,117 @@
+#pipeline: BM25 inverted index kept next to the FAISS index, for exact-token queries (filenames, error codes, identifiers)
+
+import os
+import re
+import json
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from memory_wal import fsync_dir
+
+# --- Configuration ---
+LEXICAL_FILE = "neura_lexical.json"
+BM25_K1 = 1.2  # Term-frequency saturation
+BM25_B = 0.75  # Document-length normalisation
+# --------------------
+
+_TOKEN = re.compile(r"[A-Za-z0-9_]+")
+_CAMEL = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased word tokens. Identifiers are kept whole and also split into
+    their parts, so 'memory_core' and 'semanticSearch' match 'core' and 'search'.
+    """
+    tokens = []
+    for word in _TOKEN.findall(text):
+        tokens.append(word.lower())
+        parts = [p.lower() for piece in word.split('_') for p in _CAMEL.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def term_counts(text: str) -> Dict[str, int]:
+    """Term frequencies of a text, as stored per document."""
+    return dict(Counter(tokenize(text)))
+
+
+class LexicalIndex:
+    """
+    In-memory inverted index over document ids (FAISS vector ids), scored with
+    BM25. Each document's term counts are the source of truth; postings and
+    lengths are derived from them.
+    """
+
+    def __init__(self):
+        self.doc_terms: Dict[int, Dict[str, int]] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_len: Dict[int, int] = {}
+        self.total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, doc_id: int, terms: Dict[str, int]):
+        """Indexes a document's term counts, replacing any previous version of it."""
+        self.remove(doc_id)
+        self.doc_terms[doc_id] = terms
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+        self.doc_len[doc_id] = length
+        self.total_len += length
+
+    def remove(self, doc_id: int):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id, 0)
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score of every document containing at least one query term."""
+        n = len(self.doc_terms)
+        if not n:
+            return {}
+        avg_len = self.total_len / n or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1.0 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        return scores
+
+    def snapshot(self) -> Dict[int, Dict[str, int]]:
+        """Copy of the per-document term counts (they are replaced, never mutated, so a shallow copy is enough)."""
+        return dict(self.doc_terms)
+
+    @staticmethod
+    def write(path: str, doc_terms: Dict[int, Dict[str, int]]):
+        """Atomically writes term counts to `path` (temp file, fsync, rename)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({str(doc_id): terms for doc_id, terms in doc_terms.items()}, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        fsync_dir(path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        index = cls()
+        with open(path, 'r') as f:
+            for doc_id, terms in json.load(f).items():
+                index.add(int(doc_id), terms)
+        return index
@@ -0,0 +1,174 @@
+#tooling: LLM call benchmarks against a local mock chat-completions endpoint (run from the agents/ folder)
+#usage: python llm_bench.py stream [--llm-ms 300] [--tokens-per-s 100] [--runs 5]
+#       python llm_bench.py client [--threads 16] [--calls 25] [--llm-ms 50] [--error-share 0.1]
+
+import os
+import time
+import asyncio
+import argparse
+import threading
+import contextlib
+import requests
+import numpy as np
+from typing import Dict, List, Optional
+
+import event_bus
+import neura_api
+import llm_client
+from api_bench import FakeLLM
+
+_SENTENCES = ["The capital of France is Paris, on the Seine in the north of the country.",
+              "It has been the capital for most of the last thousand years.",
+              "About two million people live in the city itself, and over twelve million in the region.",
+              "It is known for the Louvre, the Eiffel Tower and Notre-Dame.",
+              "Would you like me to find flights or hotels there?"]
+_CODE = "import os\n\nprint('Creating project structure...')\n" + "".join(
+    f"os.makedirs('my-website/section_{n}', exist_ok=True)\nprint('Created section {n}')\n" for n in range(30))
+_BROKEN = _CODE.replace("print('Creating project structure...')", "print('Creating project structure...'))")
+
+SCENARIOS = {
+    "talk": {"action": "talk", "response_text": " ".join(_SENTENCES)},
+    "code": {"action": "execute_python", "code_to_run": _CODE},
+    "broken code": {"action": "execute_python", "code_to_run": _BROKEN},
+}
+
+
+def _start_llm(llm: FakeLLM) -> int:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="llm-bench-loop", daemon=True).start()
+
+    async def start():
+        server = await asyncio.start_server(llm.handle, "127.0.0.1", 0)
+        return server.sockets[0].getsockname()[1]
+    return asyncio.run_coroutine_threadsafe(start(), loop).result()
+
+
+def _timed_call(stream: bool) -> Dict[str, Optional[float]]:
+    """One get_ai_action call; milliseconds to first token, first spoken sentence and the finished action."""
+    marks: Dict[str, Optional[float]] = {"first token": None, "first sentence": None}
+    start = time.perf_counter()
+
+    def on_event(event):
+        if event["type"] == "llm.first_token" and marks["first token"] is None:
+            marks["first token"] = (time.perf_counter() - start) * 1000
+
+    def on_sentence(sentence):
+        if marks["first sentence"] is None:
+            marks["first sentence"] = (time.perf_counter() - start) * 1000
+
+    event_bus.BUS.subscribe(on_event)
+    try:
+        action = neura_api.get_ai_action("bench", on_sentence=on_sentence, stream=stream)
+    finally:
+        event_bus.BUS.unsubscribe(on_event)
+    marks["action ready"] = (time.perf_counter() - start) * 1000
+    if action.get("action") == "talk" and not action.get("spoken"):
+        marks["first sentence"] = marks["action ready"]  # Speech can only start now
+    if not stream:
+        marks["first token"] = marks["action ready"]
+    if action.get("action") != "talk":
+        marks["first sentence"] = None
+    return marks
+
+
+def stream_report(args):
+    """Prints median latencies of blocking and streamed calls for each scenario."""
+    neura_api.FIREWORK_API_KEY = "fake"
+    columns = ["first token", "first sentence", "action ready"]
+    print(f"[BENCH] Mock LLM: {args.llm_ms:.0f} ms to first token, {args.tokens_per_s:.0f} tokens/s; "
+          f"median of {args.runs} runs")
+    print(f"{'scenario':<14}{'mode':<11}" + "".join(f"{column + ' ms':>18}" for column in columns))
+    for name, action in SCENARIOS.items():
+        llm = FakeLLM(args.llm_ms, tokens_per_s=args.tokens_per_s, actions=[action])
+        neura_api.FIREWORK_API_URL = f"http://127.0.0.1:{_start_llm(llm)}/v1/chat/completions"
+        for mode, stream in (("blocking", False), ("streamed", True)):
+            runs: List[Dict[str, Optional[float]]] = []
+            with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):  # Raw response logs
+                for _ in range(args.runs):
+                    runs.append(_timed_call(stream))
+            cells = []
+            for column in columns:
+                values = [run[column] for run in runs if run[column] is not None]
+                cells.append(f"{np.median(values):>18.0f}" if values else f"{'-':>18}")
+            print(f"{name:<14}{mode:<11}" + "".join(cells))
+
+
+def _bare_call(url: str, payload: dict) -> int:
+    """The call as neura_api made it before llm_client: a new connection, no retries."""
+    response = requests.post(url, json=payload, timeout=30.0)
+    response.raise_for_status()
+    response.json()
+    return 1
+
+
+def _client_call(client: llm_client.HTTPLLMClient, url: str, payload: dict) -> int:
+    with client.post(url, payload, deadline=30.0) as response:
+        response.json()
+    return 1
+
+
+def client_report(args):
+    """Prints success rate, connections opened and latency of bare requests.post vs. llm_client under load."""
+    payload = {"messages": [{"role": "user", "content": "bench"}]}
+    print(f"[BENCH] Mock LLM: {args.llm_ms:.0f} ms, {args.error_share:.0%} answered 429/503; "
+          f"{args.threads} threads x {args.calls} calls")
+    print(f"{'client':<14}{'ok':>6}{'failed':>8}{'retries':>9}{'connections':>13}{'p50 ms':>9}{'p99 ms':>9}")
+    histograms = None
+    for name in ("requests.post", "llm_client"):
+        llm = FakeLLM(args.llm_ms, error_share=args.error_share)
+        url = f"http://127.0.0.1:{_start_llm(llm)}/v1/chat/completions"
+        client = llm_client.HTTPLLMClient("bench", max_concurrent=args.threads)
+        latencies: List[float] = []
+        failed = [0]
+
+        def worker():
+            for _ in range(args.calls):
+                start = time.perf_counter()
+                try:
+                    if name == "llm_client":
+                        _client_call(client, url, payload)
+                    else:
+                        _bare_call(url, payload)
+                except (requests.RequestException, llm_client.LLMError):
+                    failed[0] += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):  # [LLM] retry lines
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        retries = client.counters["retries"] if name == "llm_client" else 0
+        percentiles = [np.percentile(latencies, p) for p in (50, 99)] if latencies else [float("nan")] * 2
+        print(f"{name:<14}{len(latencies):>6}{failed[0]:>8}{retries:>9}{llm.connections:>13}"
+              + "".join(f"{value:>9.1f}" for value in percentiles))
+        if name == "llm_client":
+            histograms = client.stats()
+    for label, key in (("time to first byte", "ttfb"), ("whole call", "latency")):
+        histogram = histograms[key]
+        buckets = ", ".join(f"{bound} ms: {count}" for bound, count in histogram["buckets"].items())
+        print(f"[BENCH] llm_client {label}: p50 {histogram['p50_ms']:.0f} ms, p90 {histogram['p90_ms']:.0f} ms, "
+              f"p99 {histogram['p99_ms']:.0f} ms ({buckets})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM call benchmarks against a mock endpoint")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    stream = sub.add_parser("stream", help="blocking vs. streamed neura_api.get_ai_action")
+    stream.add_argument("--llm-ms", type=float, default=300.0, help="mock time to first token")
+    stream.add_argument("--tokens-per-s", type=float, default=100.0, help="mock generation speed")
+    stream.add_argument("--runs", type=int, default=5, help="calls per scenario and mode")
+    stream.set_defaults(func=stream_report)
+
+    client = sub.add_parser("client", help="bare requests.post vs. the pooled, retrying llm_client under load")
+    client.add_argument("--threads", type=int, default=16, help="concurrent callers")
+    client.add_argument("--calls", type=int, default=25, help="calls per thread")
+    client.add_argument("--llm-ms", type=float, default=50.0, help="mock response time")
+    client.add_argument("--error-share", type=float, default=0.1, help="share of requests answered 429/503")
+    client.set_defaults(func=client_report)
+
+    args = parser.parse_args()
+    args.func(args)
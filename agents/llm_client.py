@@ -0,0 +1,322 @@
+#pipeline: shared LLM clients for neura_api (Fireworks, HTTP) and main_orchestrator (Gemini SDK): pooled keep-alive
+#          connections, bounded retries with jittered backoff, per-call deadlines, concurrency limits and latency histograms
+
+import os
+import time
+import random
+import bisect
+import threading
+import contextlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Configuration ---
+MAX_CONCURRENT = int(os.environ.get("NEURA_LLM_CONCURRENCY", "8"))  # Requests in flight per client; others wait
+POOL_SIZE = MAX_CONCURRENT  # Keep-alive connections kept open per host
+MAX_ATTEMPTS = 4  # First try plus retries
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5  # Seconds; attempt n waits uniform(0, BACKOFF_BASE * 2**n) ("full jitter")
+BACKOFF_MAX = 8.0
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0  # Longest wait for the next bytes of a response
+DEADLINE = 120.0  # Default limit for a whole call: waiting for a slot, every attempt and the backoff
+HISTOGRAM_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+# --- End Configuration ---
+
+T = TypeVar("T")
+
+try:
+    import httpx  # Transport of the google-genai SDK
+    _TRANSPORT_ERRORS = (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError,
+                         httpx.TransportError)
+except ImportError:
+    _TRANSPORT_ERRORS = (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)
+
+
+class LLMError(RuntimeError):
+    """Raised when a call fails for good (after its retries) or breaks its deadline."""
+
+
+class LLMDeadlineExceeded(LLMError):
+    pass
+
+
+class LatencyHistogram:
+    """Counts of observed latencies per bucket (upper bounds in ms, plus overflow), like a Prometheus histogram."""
+
+    def __init__(self, buckets_ms: Sequence[float] = HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+            self.total += 1
+            self.sum_ms += ms
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimated q-th percentile in ms (linear within its bucket); None before the first sample."""
+        with self._lock:
+            counts, total = list(self.counts), self.total
+        if not total:
+            return None
+        rank, seen = q / 100 * total, 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                low = self.buckets_ms[i - 1] if i else 0.0
+                high = self.buckets_ms[i] if i < len(self.buckets_ms) else self.buckets_ms[-1]
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.buckets_ms[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts, total, sum_ms = list(self.counts), self.total, self.sum_ms
+        labels = [f"<={bound:g}" for bound in self.buckets_ms] + [f">{self.buckets_ms[-1]:g}"]
+        return {"count": total, "mean_ms": sum_ms / total if total else None,
+                "p50_ms": self.percentile(50), "p90_ms": self.percentile(90), "p99_ms": self.percentile(99),
+                "buckets": {label: count for label, count in zip(labels, counts) if count}}
+
+
+class LLMClient:
+    """
+    Runs calls to one LLM service with a shared policy: at most `max_concurrent`
+    in flight (the rest wait for a slot), failures on 429/5xx and transport
+    errors retried up to MAX_ATTEMPTS with jittered exponential backoff (or the
+    server's Retry-After), and a deadline for the whole call. Time to first
+    byte and total latency go to histograms (see stats()).
+    """
+
+    def __init__(self, name: str, max_concurrent: int = MAX_CONCURRENT, max_attempts: int = MAX_ATTEMPTS):
+        self.name = name
+        self.max_attempts = max_attempts
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self.max_concurrent = max_concurrent
+        self.ttfb = LatencyHistogram()
+        self.latency = LatencyHistogram()
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0,
+                         "in_flight": 0}
+
+    def call(self, fn: Callable[[], T], deadline: Optional[float] = DEADLINE) -> T:
+        """
+        Runs a unary SDK call (e.g. generate_content) under this client's policy.
+        SDK calls cannot be interrupted, so the deadline is only enforced
+        between attempts; time to first byte is the whole call here.
+        """
+        with self._call(deadline) as attempt:
+            for _ in attempt:
+                start = time.perf_counter()
+                with self._slot(attempt):
+                    try:
+                        result = fn()
+                    except Exception as e:
+                        attempt.fail(e, getattr(e, "code", None) or getattr(e, "status_code", None))
+                        continue
+                self.ttfb.observe(time.perf_counter() - start)
+                return result
+        raise AssertionError("unreachable")  # _Attempts raises once it runs out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters, max_concurrent=self.max_concurrent,
+                    ttfb=self.ttfb.snapshot(), latency=self.latency.snapshot())
+
+    # --- Policy ---
+    @contextlib.contextmanager
+    def _call(self, deadline: Optional[float]) -> Iterator["_Attempts"]:
+        self._count("calls")
+        attempts = _Attempts(self, None if deadline is None else time.monotonic() + deadline)
+        start = time.perf_counter()
+        try:
+            yield attempts
+        except LLMDeadlineExceeded:
+            self._count("deadline_exceeded")
+            self._count("failures")
+            raise
+        except Exception:
+            self._count("failures")
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def _slot(self, attempt: "_Attempts"):
+        if not self._slots.acquire(timeout=attempt.remaining()):
+            raise LLMDeadlineExceeded(f"{self.name}: deadline passed waiting for one of "
+                                      f"{self.max_concurrent} request slots")
+        self._count("attempts")
+        self._count("in_flight")
+        try:
+            yield
+        finally:
+            self._count("in_flight", -1)
+            self._slots.release()
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+    # --- End Policy ---
+
+
+class _Attempts:
+    """
+    Iterator over the attempts of one call. fail() records why an attempt
+    failed and picks the backoff; the next iteration sleeps it, after the
+    caller has given its request slot back, so waiting calls do not hold
+    slots that new requests could use.
+    """
+
+    def __init__(self, client: LLMClient, deadline: Optional[float]):
+        self.client = client
+        self.deadline = deadline
+        self.number = 0
+        self.error: Optional[BaseException] = None
+        self.backoff = 0.0  # Seconds to wait before the next attempt
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> int:
+        if self.number >= self.client.max_attempts:
+            raise LLMError(f"{self.client.name}: failed after {self.number} attempts: {self.error}") \
+                from self.error
+        if self.remaining() == 0:
+            raise LLMDeadlineExceeded(f"{self.client.name}: deadline passed after {self.number} attempts "
+                                      f"(last error: {self.error})")
+        if self.backoff:
+            time.sleep(self.backoff)
+            self.backoff = 0.0
+        self.number += 1
+        return self.number
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (0 once passed); None without a deadline."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def fail(self, error: BaseException, status: Optional[int] = None, retry_after: Optional[float] = None):
+        """Re-raises errors that are not worth retrying; otherwise sets the backoff before the next attempt."""
+        if status not in RETRY_STATUSES and not isinstance(error, _TRANSPORT_ERRORS):
+            raise error
+        self.error = error
+        if self.number >= self.client.max_attempts:
+            return
+        delay = retry_after if retry_after is not None else \
+            random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.number - 1)))
+        remaining = self.remaining()
+        if remaining is not None and delay >= remaining:
+            raise LLMDeadlineExceeded(f"{self.client.name}: no time left to retry before the deadline "
+                                      f"(last error: {error})") from error
+        self.client._count("retries")
+        print(f"[LLM] {self.client.name}: attempt {self.number} failed ({error}); retrying in {delay:.2f}s.")
+        self.backoff = delay
+
+
+class LLMResponse:
+    """A response whose headers have arrived; the body is read through json() or iter_lines()."""
+
+    def __init__(self, response: requests.Response, deadline: Optional[float], client: "HTTPLLMClient"):
+        self.response = response
+        self.deadline = deadline
+        self.client = client
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    def json(self) -> Any:
+        return self.response.json()
+
+    def iter_lines(self) -> Iterator[bytes]:
+        """Lines of a streamed body as they arrive; raises LLMDeadlineExceeded once the deadline passes."""
+        for line in self.response.iter_lines(chunk_size=None):
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                self.client._count("deadline_exceeded")
+                raise LLMDeadlineExceeded(f"{self.client.name}: deadline passed while streaming the response")
+            yield line
+
+
+class HTTPLLMClient(LLMClient):
+    """
+    LLMClient for JSON-over-HTTP APIs (OpenAI-style chat completions). One
+    requests.Session keeps up to POOL_SIZE keep-alive connections per host,
+    so calls after the first skip the TCP and TLS handshakes.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = MAX_CONCURRENT, max_attempts: int = MAX_ATTEMPTS,
+                 pool_size: int = POOL_SIZE):
+        super().__init__(name, max_concurrent, max_attempts)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @contextlib.contextmanager
+    def post(self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None,
+             deadline: Optional[float] = DEADLINE) -> Iterator[LLMResponse]:
+        """
+        POSTs `payload` as JSON and yields the response as soon as its headers
+        arrive, with a 2xx status (other 4xx raise requests.HTTPError at once,
+        429/5xx raise LLMError once retries are used up). The request slot is
+        held until the block exits; a stream left unread is closed.
+        """
+        with self._call(deadline) as attempt:
+            for _ in attempt:
+                start = time.perf_counter()
+                with self._slot(attempt):
+                    remaining = attempt.remaining()
+                    timeout = (CONNECT_TIMEOUT, READ_TIMEOUT) if remaining is None else \
+                        (min(CONNECT_TIMEOUT, remaining), min(READ_TIMEOUT, max(remaining, 0.001)))
+                    try:
+                        response = self.session.post(url, json=payload, headers=headers, timeout=timeout,
+                                                     stream=True)
+                    except Exception as e:
+                        attempt.fail(e)
+                        continue
+                    self.ttfb.observe(time.perf_counter() - start)
+                    with response:
+                        try:
+                            response.raise_for_status()
+                        except requests.HTTPError as e:
+                            response.content  # Read the error body so the connection can be reused
+                            attempt.fail(e, response.status_code, _retry_after(response))
+                            continue
+                        yield LLMResponse(response, attempt.deadline, self)
+                        return
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds from a Retry-After header (the delta-seconds form), capped at BACKOFF_MAX."""
+    value = response.headers.get("Retry-After", "")
+    try:
+        return min(max(float(value), 0.0), BACKOFF_MAX)
+    except ValueError:
+        return None
+
+
+# --- Shared clients ---
+FIREWORKS = HTTPLLMClient("fireworks")
+GEMINI = LLMClient("gemini")
+_gemini_sdk = None
+_gemini_lock = threading.Lock()
+
+
+def gemini_client():
+    """The process-wide google-genai client, created on first use and reused (with its connections) after."""
+    global _gemini_sdk
+    if _gemini_sdk is None:
+        with _gemini_lock:
+            if _gemini_sdk is None:
+                from google import genai
+                _gemini_sdk = genai.Client()
+    return _gemini_sdk
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {client.name: client.stats() for client in (FIREWORKS, GEMINI)}
+# --- End Shared clients ---
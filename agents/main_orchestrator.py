@@ -3,17 +3,33 @@
 #purpose: to create new files or edit 
 
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
-from typing import List, Dict, Any 
+from typing import List, Dict, Any, Optional
 
+import event_bus
+import llm_client
 # Import the necessary tools and the memory instance
-from tools import execute_shell_command, semantic_file_search, NEURA_MEMORY 
+from tools import execute_shell_command, semantic_file_search, semantic_file_search_many, NEURA_MEMORY 
 
 # Load API key from .env file
 load_dotenv()
 
+# --- Configuration ---
+TOOL_WORKERS = 8  # Tool calls of one turn run concurrently on at most this many threads
+DEFAULT_TOOL_TIMEOUT = 30.0  # Seconds a tool call may take before the model is told it timed out
+TOOL_TIMEOUTS = {"execute_shell_command": 15.0}  # Per-tool overrides (the shell tool also kills at 10s)
+# Side-effecting tools run one after another in the order the model listed them (still alongside the
+# searches), so "mkdir x" followed by "touch x/y" in one turn keeps working
+SEQUENTIAL_TOOLS = {"execute_shell_command"}
+# --- End Configuration ---
+
+TOOLS = {tool.__name__: tool for tool in (execute_shell_command, semantic_file_search, semantic_file_search_many)}
+_TOOL_POOL = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="neura-tool")
+
 # --- Helper Function for Robust Function Call Extraction ---
 def get_function_calls(response: types.GenerateContentResponse) -> List[types.FunctionCall]:
     """Safely extracts all function calls from the model's response."""
@@ -34,24 +50,109 @@ def get_function_calls(response: types.GenerateContentResponse) -> List[types.Fu
 # --- End of Helper Function ---
 
 
+# --- Tool Execution ---
+def run_tool(name: str, args: Dict[str, Any], after=None, job_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs one tool and returns a dict for the function response (list results
+    are wrapped, errors are reported instead of raised). `after` is a future
+    this call waits for first (see SEQUENTIAL_TOOLS). Start and finish are
+    published as tool.start / tool.finish events tagged with `job_id`.
+    """
+    if after is not None:
+        try:
+            after.result()
+        except Exception:
+            pass  # A failed predecessor does not stop the next command
+    with event_bus.job_context(job_id):
+        event_bus.publish("tool.start", tool=name, args=args)
+        start = time.perf_counter()
+        result = _call_tool(name, args)
+        event_bus.publish("tool.finish", tool=name, success=result.get("success"),
+                          seconds=time.perf_counter() - start,
+                          **({"error": result["error"]} if "error" in result else {}))
+    return result
+
+
+def _call_tool(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    tool = TOOLS.get(name)
+    if tool is None:
+        return {"success": False, "error": f"Unknown tool: {name}"}
+    try:
+        result = tool(**args)
+    except Exception as e:
+        return {"success": False, "error": f"{type(e).__name__}: {e}"}
+    return result if isinstance(result, dict) else {"success": True, "results": result}
+
+
+def run_tool_calls(function_calls: List[types.FunctionCall]) -> List[types.Part]:
+    """
+    Runs every tool call of a turn concurrently and returns their function
+    responses in call order, ready to go back to the model in one message.
+    Each call gets TOOL_TIMEOUTS[name] seconds from the start of the turn
+    (plus those of the sequential calls queued before it); a call that runs
+    out is reported to the model as timed out and left to finish in the
+    background, since threads cannot be killed.
+    """
+    start = time.perf_counter()
+    job_id = event_bus.current_job()  # Pool threads publish on behalf of the calling job
+    futures, deadlines = [], []
+    previous, chain_deadline = None, start
+    for call in function_calls:
+        name, args = call.name, dict(call.args or {})
+        timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+        print(f"[NEURA] Thinking: Calling tool '{name}' with args: {args}")
+        if name in SEQUENTIAL_TOOLS:
+            future = _TOOL_POOL.submit(run_tool, name, args, previous, job_id)
+            previous = future
+            chain_deadline += timeout
+            deadlines.append(chain_deadline)
+        else:
+            future = _TOOL_POOL.submit(run_tool, name, args, None, job_id)
+            deadlines.append(start + timeout)
+        futures.append(future)
+
+    parts = []
+    for call, future, deadline in zip(function_calls, futures, deadlines):
+        try:
+            result = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except FutureTimeout:
+            future.cancel()  # Only helps if it never started
+            result = {"success": False, "error": f"Timed out after {deadline - start:.0f}s"}
+            event_bus.publish("tool.timeout", tool=call.name, seconds=deadline - start)
+        print(f"[NEURA] Execution Result ({call.name}): Success={result.get('success', 'N/A')}")
+        parts.append(types.Part(function_response=types.FunctionResponse(id=call.id, name=call.name,
+                                                                         response=result)))
+    if len(function_calls) > 1:
+        print(f"[NEURA] Ran {len(function_calls)} tool calls in {time.perf_counter() - start:.2f}s.")
+    return parts
+# --- End Tool Execution ---
+
+
 # 1. System Role Prompt (The Neura OS Identity)
 SYSTEM_ROLE = (
     "You are **Neura**, the central intelligence kernel of an autonomous macOS/Linux OS. "
     "Your core mission is to manage files, system resources, and answer user questions based on system memory. "
     "You have two tools: `execute_shell_command` for real-time system actions (like creating a file) "
-    "and `semantic_file_search` for accessing long-term file knowledge. "
+    "and `semantic_file_search` for accessing long-term file knowledge "
+    "(use `semantic_file_search_many` to run several related lookups at once; pass mode=\"lexical\" "
+    "when looking for an exact filename, identifier or error code instead of grepping with the shell, "
+    "and use the path_prefix / extensions / modified_after filters to scope a search rather than searching twice). "
     
     "**RULE 1:** If the user asks a question about past actions or file content, you MUST use `semantic_file_search` first. "
     "**RULE 2:** If the user requests a system change (create, delete, list), use `execute_shell_command`. "
     "**RULE 3:** You MUST only output a final response to the user once the task is fully completed or verified. Be concise."
 )
 
-def run_neura_agent(user_prompt: str):
-    # Initialize Gemini Client
-    client = genai.Client()
+def run_neura_agent(user_prompt: str, cancel: Optional[threading.Event] = None) -> str:
+    """
+    Runs the tool loop until the model answers; returns its final text. Once
+    `cancel` is set, no further model call or tool runs.
+    """
+    # Shared Gemini client (built once per process, connections kept open)
+    client = llm_client.gemini_client()
     
     # Define the list of tools the AI can use 
-    tools_list = [execute_shell_command, semantic_file_search]
+    tools_list = list(TOOLS.values())
     
     messages = [
         types.Content(role="user", parts=[types.Part(text=user_prompt)])
@@ -59,57 +160,49 @@ def run_neura_agent(user_prompt: str):
     
     print(f"\n[NEURA] User Goal: {user_prompt}")
     
-    # Set the system role and tools
+    # Set the system role and tools. Automatic function calling stays off: the SDK would
+    # otherwise run the tools itself, one by one inside generate_content (and inside the
+    # retry below), so run_tool_calls below must be the only place tools run
     config = types.GenerateContentConfig(
         system_instruction=SYSTEM_ROLE,
-        tools=tools_list
+        tools=tools_list,
+        automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
     )
 
     while True:
+        if cancel is not None and cancel.is_set():
+            print("[NEURA] Cancelled.")
+            return "Cancelled."
+
         # 1. Call the model with the current history and tool definitions
-        response = client.models.generate_content(
+        event_bus.publish("llm.request", model='gemini-2.5-flash')
+        start = time.perf_counter()
+        # Retries on 429/5xx with backoff and shares llm_client's concurrency limit. Only ever wrap the
+        # model request itself here: a retry repeats everything inside the lambda, so tools (side
+        # effects) must run outside it, which is why automatic function calling is off above
+        response = llm_client.GEMINI.call(lambda: client.models.generate_content(
             model='gemini-2.5-flash',
             contents=messages,
             config=config
-        )
+        ))
 
         # 2. Extract tool calls and prepare for next iteration
         function_calls = get_function_calls(response) 
+        event_bus.publish("llm.response", tool_calls=len(function_calls), seconds=time.perf_counter() - start)
         messages.append(response.candidates[0].content) 
 
         if function_calls:
             # --- ACTION REQUESTED ---
-            function_call = function_calls[0]
-            function_name = function_call.name
-            args = dict(function_call.args)
-            
-            print(f"[NEURA] Thinking: Calling tool '{function_name}' with args: {args}")
+            # Every call of the turn runs (concurrently); all results go back in one message
+            parts = run_tool_calls(function_calls)
 
-            # Execute the actual Python function based on the requested name
-            if function_name == "execute_shell_command":
-                tool_result = execute_shell_command(**args)
-            elif function_name == "semantic_file_search":
-                tool_result = semantic_file_search(**args)
-            else:
-                tool_result = {"success": False, "error": f"Unknown tool: {function_name}"}
-
-            print(f"[NEURA] Execution Result: Success={tool_result.get('success', 'N/A')}")
-            
-            # 3. Send the tool result back to the model for the next turn
-            messages.append(
-                types.Content(
-                    role="tool",
-                    parts=[types.Part.from_function_response(
-                        name=function_name,
-                        response=tool_result
-                    )]
-                )
-            )
+            # 3. Send the tool results back to the model for the next turn (as the SDK does, in a user turn)
+            messages.append(types.Content(role="user", parts=parts))
 
         # If no function call, the model has given the final text response
         else:
             print(f"\n[NEURA] Final Response: {response.text}")
-            break
+            return response.text
 
 if __name__ == "__main__":
     # --- CRITICAL PRE-INDEXING STEP ---
@@ -0,0 +1,444 @@
+#tooling: offline benchmarks for Neura's memory store (run from the agents/ folder)
+#usage: python memory_bench.py ann [--k 10] [--queries 200] [--synthetic 100000]
+#       python memory_bench.py storage [--k 10] [--queries 200] [--synthetic 100000]
+#       python memory_bench.py startup [--procs 4] [--queries 50] [--synthetic 200000]
+#       python memory_bench.py stress [--searchers 4] [--seed-docs 2000] [--docs 2000] [--batch 32] [--backend hash]
+#       python memory_bench.py embed [--texts 2000] [--workers 4] [--backends torch onnx hash]
+
+import os
+import argparse
+import contextlib
+import shutil
+import tempfile
+import threading
+import time
+import multiprocessing
+import faiss
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from memory_core import (MEMORY_FILE, INGEST_BATCH_SIZE, MemoryCore, build_ann_index, embedding_text, export_vectors,
+                         read_index_mmap, search_params, STORAGE_TRAIN_MIN)
+from embedding_backend import BACKENDS, MODEL_NAME, make_backend
+from rw_lock import ReadWriteLock
+
+
+def load_vectors(synthetic: Optional[int], dimension: int = 384) -> np.ndarray:
+    """Returns the vectors stored in MEMORY_FILE, or a synthetic unit-norm set."""
+    if synthetic:
+        # Clustered data: real embeddings are far from uniformly distributed
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((256, dimension)).astype('float32')
+        vectors = centers[rng.integers(0, len(centers), synthetic)]
+        vectors = vectors + 0.4 * rng.standard_normal(vectors.shape).astype('float32')
+    else:
+        _, vectors = export_vectors(faiss.read_index(MEMORY_FILE))
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(vectors: np.ndarray, count: int) -> np.ndarray:
+    """Perturbed copies of stored vectors, so queries look like real near-duplicates."""
+    rng = np.random.default_rng(1)
+    picks = vectors[rng.choice(len(vectors), min(count, len(vectors)), replace=False)]
+    queries = picks + 0.05 * rng.standard_normal(picks.shape).astype('float32')
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def timed_search(index, queries: np.ndarray, k: int, params=None) -> Tuple[np.ndarray, List[float]]:
+    """Runs one query at a time (the agent's access pattern) and records latency."""
+    ids = np.empty((len(queries), k), dtype='int64')
+    latencies = []
+    for row in range(len(queries)):
+        start = time.perf_counter()
+        _, I = index.search(queries[row:row + 1], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids[row] = I[0]
+    return ids, latencies
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / (len(truth) * k)
+
+
+def ann_report(args):
+    """Prints recall@k and latency of each ANN mode against the exact flat index."""
+    vectors = load_vectors(args.synthetic)
+    queries = make_queries(vectors, args.queries)
+    dimension = vectors.shape[1]
+    print(f"[BENCH] {len(vectors)} vectors, dim {dimension}, {len(queries)} queries, k={args.k}")
+
+    flat = build_ann_index("flat", dimension, vectors)
+    truth, flat_lat = timed_search(flat, queries, args.k)
+
+    rows = [("flat (exact)", 1.0, flat_lat, 0.0)]
+    configs = [("ivf_flat", {"nprobe": p}) for p in (4, 16, 64)]
+    configs += [("ivf_pq", {"nprobe": p}) for p in (16, 64)]
+    configs += [("hnsw", {"ef_search": ef}) for ef in (32, 64, 128)]
+
+    built = {}
+    for kind, knobs in configs:
+        if kind not in built:
+            start = time.perf_counter()
+            try:
+                built[kind] = (build_ann_index(kind, dimension, vectors), time.perf_counter() - start)
+            except ValueError as e:
+                print(f"[BENCH] Skipping {kind}: {e}")
+                built[kind] = (None, 0.0)
+        index, build_s = built[kind]
+        if index is None:
+            continue
+        found, lat = timed_search(index, queries, args.k, search_params(index, **knobs))
+        label = f"{kind} " + ", ".join(f"{key}={val}" for key, val in knobs.items())
+        rows.append((label, recall_at_k(truth, found), lat, build_s))
+
+    print(f"{'index':<28}{'recall@' + str(args.k):>10}{'avg ms':>10}{'p99 ms':>10}{'build s':>10}")
+    for label, recall, lat, build_s in rows:
+        print(f"{label:<28}{recall:>10.3f}{np.mean(lat):>10.3f}{np.percentile(lat, 99):>10.3f}{build_s:>10.1f}")
+
+
+def storage_report(args):
+    """Prints index footprint, recall@k and latency per vector storage mode against float32 flat."""
+    vectors = load_vectors(args.synthetic)
+    queries = make_queries(vectors, args.queries)
+    dimension = vectors.shape[1]
+    print(f"[BENCH] {len(vectors)} vectors, dim {dimension}, {len(queries)} queries, k={args.k}")
+
+    configs = [
+        ("flat", "float32", None),
+        ("flat", "fp16", None),
+        ("flat", "sq8", None),
+        ("flat", "sq8", "fp16"),
+        ("flat", "pq", None),
+        ("flat", "pq", "fp16"),
+        ("flat", "pq", "float32"),
+        ("ivf_flat", "sq8", None),
+        ("ivf_pq", "pq", "fp16"),
+        ("hnsw", "sq8", None),
+    ]
+
+    truth = None
+    baseline_bytes = None
+    rows = []
+    for kind, storage, rerank in configs:
+        if len(vectors) < STORAGE_TRAIN_MIN.get(storage, 0):
+            print(f"[BENCH] Skipping {kind}/{storage}: needs {STORAGE_TRAIN_MIN[storage]} vectors to train")
+            continue
+        start = time.perf_counter()
+        try:
+            index = build_ann_index(kind, dimension, vectors, storage=storage, rerank=rerank)
+        except ValueError as e:
+            print(f"[BENCH] Skipping {kind}/{storage}: {e}")
+            continue
+        build_s = time.perf_counter() - start
+
+        # Serialized size is what read_index loads into each process
+        footprint = len(faiss.serialize_index(index))
+        found, lat = timed_search(index, queries, args.k, search_params(index))
+        if truth is None:
+            truth, baseline_bytes = found, footprint  # The first config is the exact float32 flat index
+        rows.append((f"{kind}/{storage}" + (f"+{rerank}" if rerank else ""), footprint,
+                     recall_at_k(truth, found), lat, build_s))
+
+    print(f"{'index/storage':<24}{'MB':>9}{'B/vec':>8}{'x smaller':>11}"
+          f"{'recall@' + str(args.k):>10}{'avg ms':>9}{'p99 ms':>9}{'build s':>9}")
+    for label, footprint, recall, lat, build_s in rows:
+        print(f"{label:<24}{footprint / 2**20:>9.1f}{footprint / len(vectors):>8.0f}"
+              f"{baseline_bytes / footprint:>11.1f}{recall:>10.3f}{np.mean(lat):>9.3f}"
+              f"{np.percentile(lat, 99):>9.3f}{build_s:>9.1f}")
+
+
+def _memory_kb() -> Dict[str, int]:
+    """Rss / Pss / private kB of this process (Linux /proc; empty elsewhere)."""
+    found = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    found[name] = int(value.split()[0])
+    except OSError:
+        pass
+    return found
+
+
+def _startup_probe(path: str, mode: str, queries: np.ndarray, results, measure):
+    """
+    One search-only process: loads the index and runs the queries, then reports
+    its memory once every probe holds the index (so shared pages are split).
+    """
+    before = _memory_kb()
+    start = time.perf_counter()
+    index = read_index_mmap(path) if mode == "mmap" else faiss.read_index(path)
+    load_ms = (time.perf_counter() - start) * 1000
+    _, lat = timed_search(index, queries, 10, search_params(index))
+    results.put((load_ms, float(np.mean(lat))))
+    measure.wait()
+    after = _memory_kb()
+    private = sum(after.get(name, 0) - before.get(name, 0) for name in ("Private_Clean", "Private_Dirty"))
+    results.put((after.get("Rss", 0) - before.get("Rss", 0), after.get("Pss", 0) - before.get("Pss", 0), private))
+
+
+def startup_report(args):
+    """
+    Prints load time and memory per process for a normal (copy) load vs. a
+    memory-mapped read-only load, with `--procs` search-only processes holding
+    the index at the same time. Pss splits shared pages between the processes
+    that map them, so it shows what each process really costs.
+    """
+    tmp = None
+    path = MEMORY_FILE
+    if args.synthetic:
+        vectors = load_vectors(args.synthetic)
+        tmp = tempfile.NamedTemporaryFile(suffix=".faiss", delete=False)
+        tmp.close()
+        path = tmp.name
+        faiss.write_index(build_ann_index(args.kind, vectors.shape[1], vectors), path)
+    else:
+        vectors = load_vectors(None)
+    queries = make_queries(vectors, args.queries)
+    print(f"[BENCH] {path}: {os.path.getsize(path) / 2**20:.1f} MB on disk, {args.procs} processes, "
+          f"{len(queries)} queries each")
+
+    ctx = multiprocessing.get_context("spawn")  # Fresh interpreters, like separate agent processes
+    print(f"{'load':<8}{'load ms':>10}{'search ms':>11}{'RSS MB':>9}{'PSS MB':>9}{'private MB':>12}")
+    try:
+        for mode in ("copy", "mmap"):
+            results, measure = ctx.Queue(), ctx.Event()
+            probes = [ctx.Process(target=_startup_probe, args=(path, mode, queries, results, measure))
+                      for _ in range(args.procs)]
+            for probe in probes:
+                probe.start()
+            load_ms, search_ms = np.mean([results.get() for _ in probes], axis=0)
+            measure.set()
+            rss, pss, private = np.mean([results.get() for _ in probes], axis=0)
+            for probe in probes:
+                probe.join()
+            print(f"{mode:<8}{load_ms:>10.1f}{search_ms:>11.3f}{rss / 1024:>9.1f}{pss / 1024:>9.1f}"
+                  f"{private / 1024:>12.1f}")
+    finally:
+        if tmp is not None:
+            os.remove(path)
+
+
+def synthetic_documents(count: int, first: int = 0, seed: int = 0) -> List[Tuple[str, str, Dict[str, int]]]:
+    """(path, text, stats) documents made of words from a fixed pseudo-vocabulary."""
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"term{n}" for n in range(2000)]
+    documents = []
+    for n in range(first, first + count):
+        words = rng.choice(vocabulary, int(rng.integers(40, 200)))
+        documents.append((os.path.abspath(f"stress_doc_{n}.txt"), " ".join(words),
+                          {"mtime": 1.7e9 + n, "size": int(len(words) * 8)}))
+    return documents
+
+
+def _stress_phase(memory: MemoryCore, queries: List[str], args, documents, coarse: Optional[ReadWriteLock]):
+    """
+    Runs `args.searchers` search threads, alongside one ingest thread when
+    `documents` are given (stopping when it finishes, else after the same
+    number of searches per thread as `args.idle_searches`). `coarse` wraps
+    every call in one RPC-wide lock, as memory_server.py used to.
+    """
+    latencies: List[List[float]] = [[] for _ in range(args.searchers)]
+    errors = []
+    done = threading.Event()
+    ingest_s = [0.0]
+
+    def search(slot: int):
+        rng = np.random.default_rng(slot)
+        while not done.is_set():
+            query = queries[int(rng.integers(len(queries)))]
+            start = time.perf_counter()
+            try:
+                if coarse is not None:
+                    with coarse.read_locked():
+                        memory.semantic_search(query, k=args.k, mode=args.mode)
+                else:
+                    memory.semantic_search(query, k=args.k, mode=args.mode)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            latencies[slot].append((time.perf_counter() - start) * 1000)
+            if documents is None and len(latencies[slot]) >= args.idle_searches:
+                return
+
+    def ingest():
+        start = time.perf_counter()
+        try:
+            for n in range(0, len(documents), args.batch):
+                batch = documents[n:n + args.batch]
+                if coarse is not None:
+                    with coarse.write_locked():
+                        memory.add_documents(batch)
+                else:
+                    memory.add_documents(batch)
+                if (n // args.batch + 1) % args.checkpoint_every == 0:
+                    if coarse is not None:
+                        with coarse.write_locked():
+                            memory.checkpoint()
+                    else:
+                        memory.checkpoint()
+        finally:
+            ingest_s[0] = time.perf_counter() - start
+            done.set()
+
+    threads = [threading.Thread(target=search, args=(slot,)) for slot in range(args.searchers)]
+    if documents is not None:
+        threads.append(threading.Thread(target=ingest))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [ms for slot in latencies for ms in slot], errors, ingest_s[0]
+
+
+def stress_report(args):
+    """
+    Prints search latency (p50/p99/max) with concurrent searchers while the
+    same MemoryCore ingests and checkpoints in the background, against an
+    idle baseline and against one RPC-wide readers-writer lock. Runs on a
+    throwaway store in a temporary directory; queries are embedded up front,
+    so latencies measure the index, not the model.
+    """
+    home = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="neura-stress-")
+    os.chdir(workdir)
+    try:
+        memory = MemoryCore(backend=args.backend)
+        seed = synthetic_documents(args.seed_docs)
+        start = time.perf_counter()
+        memory.add_documents(seed)
+        memory.checkpoint()
+        print(f"[BENCH] Seeded {len(seed)} documents in {time.perf_counter() - start:.1f}s "
+              f"({memory.index_layout()}, {memory.index.ntotal} vectors)")
+        queries = [" ".join(text.split()[:6]) for _, text, _ in seed[:args.queries]]
+        memory.semantic_search_many(queries, k=args.k)  # Warm the query cache
+
+        phases = [("idle", None, None),
+                  ("ingest", synthetic_documents(args.docs, args.seed_docs, seed=1), None),
+                  ("ingest, rpc lock", synthetic_documents(args.docs, args.seed_docs + args.docs, seed=2),
+                   ReadWriteLock())]
+        rows = []
+        for label, documents, coarse in phases:
+            print(f"[BENCH] Phase: {label}...")
+            with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):  # Per-call [MEMORY] logs
+                lat, errors, ingest_s = _stress_phase(memory, queries, args, documents, coarse)
+            rows.append((label, lat, errors, len(documents) / ingest_s if documents else None))
+            for error in sorted(set(errors))[:3]:
+                print(f"[BENCH] {label}: {error}")
+
+        print(f"{'phase':<20}{'searches':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}{'ingest docs/s':>15}")
+        for label, lat, errors, rate in rows:
+            print(f"{label:<20}{len(lat):>10}{np.percentile(lat, 50):>9.2f}{np.percentile(lat, 99):>9.2f}"
+                  f"{max(lat):>9.2f}{len(errors):>8}{(f'{rate:.0f}' if rate else '-'):>15}")
+        memory.close()
+        failed = sum(len(errors) for _, _, errors, _ in rows)
+        if failed:
+            raise SystemExit(f"[BENCH] {failed} searches failed under load (tests/test_memory_concurrency.py checks results)")
+    finally:
+        os.chdir(home)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def embed_report(args):
+    """
+    Prints load time, in-process and pooled encode throughput, and agreement
+    with the first listed backend that runs MODEL_NAME (mean cosine over the
+    same texts) for each embedding backend. Backends load one after another in this process, so a
+    later one may find shared libraries already imported.
+    """
+    texts = [embedding_text(path, text) for path, text, _ in synthetic_documents(args.texts)]
+    print(f"[BENCH] {len(texts)} texts, batch {INGEST_BATCH_SIZE}, pool of {args.workers} processes")
+    reference = None
+    rows = []
+    for name in args.backends:
+        backend = make_backend(name)
+        start = time.perf_counter()
+        try:
+            backend.load()
+        except ImportError as e:
+            print(f"[BENCH] Skipping {name}: {e}")
+            continue
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectors = backend.encode(texts, INGEST_BATCH_SIZE)
+        rate = len(texts) / (time.perf_counter() - start)
+
+        pooled = None
+        if args.workers > 1:
+            backend.start_pool(args.workers)
+            try:
+                backend.encode(texts[:args.workers * INGEST_BATCH_SIZE], INGEST_BATCH_SIZE)  # Workers load their model
+                start = time.perf_counter()
+                backend.encode(texts, INGEST_BATCH_SIZE)
+                pooled = len(texts) / (time.perf_counter() - start)
+            finally:
+                backend.stop_pool()
+
+        # Only backends running the same model are expected to agree
+        same_model = backend.space.startswith(MODEL_NAME)
+        if reference is None and same_model:
+            reference = vectors
+        agreement = None
+        if same_model and vectors.shape == reference.shape:
+            agreement = float(np.mean(np.sum(vectors * reference, axis=1)))
+        rows.append((f"{name} ({backend.space})", load_s, rate, pooled, agreement))
+
+    print(f"{'backend':<44}{'load s':>8}{'texts/s':>10}{'pool texts/s':>14}{'cos vs ref':>14}")
+    for label, load_s, rate, pooled, agreement in rows:
+        print(f"{label:<44}{load_s:>8.2f}{rate:>10.0f}{(f'{pooled:.0f}' if pooled else '-'):>14}"
+              f"{(f'{agreement:.4f}' if agreement is not None else '-'):>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Neura memory store benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ann = sub.add_parser("ann", help="recall@k vs. latency of ANN modes against the flat index")
+    ann.add_argument("--k", type=int, default=10)
+    ann.add_argument("--queries", type=int, default=200)
+    ann.add_argument("--synthetic", type=int, default=None,
+                     help="benchmark N random vectors instead of neura_memory.faiss")
+    ann.set_defaults(func=ann_report)
+
+    storage = sub.add_parser("storage", help="footprint vs. recall of compressed vector storage modes")
+    storage.add_argument("--k", type=int, default=10)
+    storage.add_argument("--queries", type=int, default=200)
+    storage.add_argument("--synthetic", type=int, default=None,
+                         help="benchmark N random vectors instead of neura_memory.faiss")
+    storage.set_defaults(func=storage_report)
+
+    startup = sub.add_parser("startup", help="load time and per-process memory: copied vs. memory-mapped index")
+    startup.add_argument("--procs", type=int, default=4)
+    startup.add_argument("--queries", type=int, default=50)
+    startup.add_argument("--kind", default="flat", help="index kind built for --synthetic")
+    startup.add_argument("--synthetic", type=int, default=None,
+                         help="benchmark N random vectors instead of neura_memory.faiss")
+    startup.set_defaults(func=startup_report)
+
+    stress = sub.add_parser("stress", help="search p50/p99 while the same MemoryCore ingests concurrently")
+    stress.add_argument("--searchers", type=int, default=4, help="concurrent search threads")
+    stress.add_argument("--seed-docs", type=int, default=2000, help="documents indexed before measuring")
+    stress.add_argument("--docs", type=int, default=2000, help="documents ingested during each ingest phase")
+    stress.add_argument("--batch", type=int, default=32, help="documents per add_documents call")
+    stress.add_argument("--checkpoint-every", type=int, default=10, help="checkpoint after this many batches")
+    stress.add_argument("--idle-searches", type=int, default=500, help="searches per thread in the idle phase")
+    stress.add_argument("--queries", type=int, default=200)
+    stress.add_argument("--k", type=int, default=5)
+    stress.add_argument("--mode", default="hybrid", choices=("vector", "lexical", "hybrid"))
+    stress.add_argument("--backend", default="hash", choices=sorted(BACKENDS),
+                        help="embedding backend (default: the weight-free hash embedder)")
+    stress.set_defaults(func=stress_report)
+
+    embed = sub.add_parser("embed", help="load time, throughput and agreement of the embedding backends")
+    embed.add_argument("--texts", type=int, default=2000)
+    embed.add_argument("--workers", type=int, default=4, help="processes in the pooled run (1 skips it)")
+    embed.add_argument("--backends", nargs="+", default=["torch", "onnx", "hash"], choices=sorted(BACKENDS))
+    embed.set_defaults(func=embed_report)
+
+    args = parser.parse_args()
+    args.func(args)
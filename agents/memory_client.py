@@ -0,0 +1,175 @@
+#pipeline: thin client for memory_server.py; same method names as MemoryCore
+
+import os
+import sys
+import json
+import time
+import socket
+import itertools
+import threading
+import subprocess
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from memory_server import USE_UNIX_SOCKET, server_address
+
+# --- Configuration ---
+SPAWN_TIMEOUT = 15.0  # Seconds to wait for an auto-started server to accept connections
+CALL_TIMEOUT = 300.0  # First calls may wait for the model to load
+SERVER_LOG = "neura_memory_server.log"
+# --- End Configuration ---
+
+
+class MemoryServerError(RuntimeError):
+    """Raised when the memory server reports a failed call."""
+
+
+class MemoryClient:
+    """
+    Talks to the shared memory server, starting it in the background if nobody
+    has yet. Each thread keeps its own connection, so callers can search
+    concurrently while the server serializes writes.
+    """
+
+    def __init__(self, autostart: bool = True):
+        self.autostart = autostart
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._spawn_lock = threading.Lock()
+
+    # --- MemoryCore-compatible API ---
+    def add_document(self, file_path: str, content_summary):
+        self.add_documents([(file_path, content_summary)])
+
+    def add_documents(self, documents: Iterable[Tuple], batch_size: Optional[int] = None,
+                      replace: bool = False) -> int:
+        params = {"documents": [[os.path.abspath(doc[0])] + list(doc[1:]) for doc in documents],
+                  "replace": replace}
+        if batch_size:
+            params["batch_size"] = batch_size
+        return self._call("add_documents", params)
+
+    def update_document(self, file_path: str, content_summary) -> bool:
+        return self._call("update_document", {"file_path": os.path.abspath(file_path),
+                                              "content_summary": content_summary})
+
+    def remove_document(self, file_path: str) -> bool:
+        return self._call("remove_document", {"file_path": os.path.abspath(file_path)})
+
+    def is_indexed(self, file_path: str) -> bool:
+        return self._call("is_indexed", {"file_path": os.path.abspath(file_path)})
+
+    def get_vector_id(self, file_path: str) -> Optional[int]:
+        return self._call("get_vector_id", {"file_path": os.path.abspath(file_path)})
+
+    def get_vector_ids(self, file_path: str) -> List[int]:
+        return self._call("get_vector_ids", {"file_path": os.path.abspath(file_path)})
+
+    def semantic_search(self, query: str, k: int = 3, **knobs) -> List[dict]:
+        return self._call("semantic_search", dict(knobs, query=query, k=k))
+
+    def semantic_search_many(self, queries: List[str], k: int = 3, **knobs) -> List[List[dict]]:
+        return self._call("semantic_search_many", dict(knobs, queries=list(queries), k=k))
+
+    def changed_files(self, entries: Iterable[Tuple[str, float, int]]) -> List[str]:
+        return self._call("changed_files", {"entries": [list(entry) for entry in entries]})
+
+    def mark_unreadable(self, entries: Iterable[Tuple[str, float, int]]):
+        return self._call("mark_unreadable", {"entries": [[os.path.abspath(entry[0])] + list(entry[1:])
+                                                          for entry in entries]})
+
+    def pre_index_files(self):
+        # Relative names are resolved in the server's working directory
+        return self._call("pre_index_files", {})
+
+    def checkpoint(self):
+        return self._call("checkpoint", {})
+
+    def stats(self) -> Dict[str, Any]:
+        return self._call("stats", {})
+    # --- End MemoryCore-compatible API ---
+
+
+    def _call(self, method: str, params: Dict[str, Any]) -> Any:
+        request = {"id": next(self._ids), "method": method, "params": params}
+        payload = json.dumps(request).encode("utf-8") + b"\n"
+
+        # One retry covers a server restart between calls
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.write(payload)
+                conn.flush()
+                line = conn.readline()
+                if not line:
+                    raise ConnectionError("memory server closed the connection")
+                break
+            except (OSError, ConnectionError):
+                self._drop_connection()
+                if attempt:
+                    raise
+
+        response = json.loads(line)
+        if "error" in response:
+            raise MemoryServerError(f"{method}: {response['error']}")
+        return response.get("result")
+
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = self._connect()
+            sock.settimeout(CALL_TIMEOUT)
+            self._local.sock = sock
+            self._local.conn = conn = sock.makefile("rwb")
+        return conn
+
+
+    def _drop_connection(self):
+        for name in ("conn", "sock"):
+            obj = getattr(self._local, name, None)
+            if obj is not None:
+                try:
+                    obj.close()
+                except OSError:
+                    pass
+                setattr(self._local, name, None)
+
+
+    def _open_socket(self) -> socket.socket:
+        family = socket.AF_UNIX if USE_UNIX_SOCKET else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(server_address())
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+
+    def _connect(self) -> socket.socket:
+        try:
+            return self._open_socket()
+        except OSError:
+            if not self.autostart:
+                raise
+
+        with self._spawn_lock:
+            try:
+                return self._open_socket()
+            except OSError:
+                pass
+            print("[MEMORY] No memory server running; starting one in the background...")
+            with open(SERVER_LOG, "ab") as log:
+                subprocess.Popen(
+                    [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_server.py")],
+                    stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+                )
+
+            deadline = time.monotonic() + SPAWN_TIMEOUT
+            while True:
+                try:
+                    return self._open_socket()
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise ConnectionError(f"memory server did not start; see {SERVER_LOG}")
+                    time.sleep(0.1)
@@ -0,0 +1,314 @@
+#tooling: offline compaction of Neura's memory store (run from the agents/ folder while the memory server is stopped)
+#usage: python memory_compact.py [--dry-run] [--reembed] [--keep-missing] [--keep-copies] [--workers 4]
+#                                [--kind ivf_flat] [--storage sq8] [--rerank fp16]
+
+import os
+import sys
+import argparse
+import numpy as np
+import faiss
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from memory_core import (MemoryCore, MEMORY_FILE, METADATA_FILE, CHUNK_OVERFETCH, EMBEDDING_SPACE_KEY,
+                         INGEST_BATCH_SIZE, SPAN_PREVIEW_CHARS, STORAGE_TRAIN_MIN, build_ann_index, embedding_text,
+                         export_vectors, index_kind, index_rerank, index_storage, search_params)
+from memory_wal import WAL_FILE, fsync_dir, swap_in
+from memory_bench import timed_search
+from memory_server import is_server_alive
+from metadata_store import MetadataStore
+from lexical_index import LexicalIndex, LEXICAL_FILE, term_counts
+from indexing_queue import read_document
+
+# --- Configuration ---
+READ_WORKERS = 16  # Threads re-reading files that have to be re-embedded
+LATENCY_QUERIES = 200  # Stored vectors replayed as queries for the before/after latency figures
+STAGED_SUFFIX = ".compact"  # The new store is written next to the live one, then swapped in
+# --- End Configuration ---
+
+Document = Dict[str, Any]  # {'path', 'rows': [(vec_id, row), ...] in chunk order}
+
+
+def normalize_path(path: str) -> str:
+    """Dedupe key: one file reached through symlinks, '..' or a different case counts once."""
+    return os.path.normcase(os.path.realpath(path))
+
+
+def _newest(documents: List[Document]) -> Document:
+    """
+    The version worth keeping: an existing file first, then its canonical path
+    (not a symlink to it), then the latest mtime, then the latest write.
+    """
+    def rank(doc: Document):
+        first = doc['rows'][0][1]
+        canonical = doc['path'] == os.path.realpath(doc['path'])
+        return (doc['exists'], canonical, first.get('mtime') or 0.0, max(vec_id for vec_id, _ in doc['rows']))
+    return max(documents, key=rank)
+
+
+def plan_compaction(memory: MemoryCore, keep_missing: bool, keep_copies: bool,
+                    reembed: bool) -> Tuple[List[Document], Dict[str, int]]:
+    """
+    Groups the stored rows into documents and decides what survives: one
+    document per normalized path, files that still exist (unless
+    `keep_missing`), and one document per content hash (unless `keep_copies`).
+    Marks documents to re-embed: changed on disk, indexed before chunking
+    (no stats), stored lossily (compressed codes without a float32 copy), or
+    everything with `reembed` or when the store holds another embedding
+    backend's vectors (missing files are then dropped, kept or not).
+    """
+    by_path: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for vec_id, row in memory.store.iter_entries():
+        by_path.setdefault(row['path'], []).append((vec_id, row))
+
+    counts = {'duplicate_paths': 0, 'missing': 0, 'duplicate_content': 0, 'reembed': 0}
+    by_key: Dict[str, List[Document]] = {}
+    for path, rows in by_path.items():
+        rows.sort(key=lambda item: (item[1].get('chunk', 0), item[0]))
+        doc = {'path': path, 'rows': rows, 'exists': os.path.isfile(path)}
+        by_key.setdefault(normalize_path(path), []).append(doc)
+
+    documents = []
+    for versions in by_key.values():
+        counts['duplicate_paths'] += len(versions) - 1
+        doc = _newest(versions)
+        if not doc['exists'] and not keep_missing:
+            counts['missing'] += 1
+            continue
+        documents.append(doc)
+
+    if not keep_copies:
+        empty_hash = MemoryCore.content_hash('')
+        by_hash: Dict[str, List[Document]] = {}
+        unique = []
+        for doc in documents:
+            doc_hash = doc['rows'][0][1]['doc_hash']
+            if doc_hash == empty_hash:
+                unique.append(doc)  # Empty files are not copies of each other in any useful sense
+            else:
+                by_hash.setdefault(doc_hash, []).append(doc)
+        for copies in by_hash.values():
+            counts['duplicate_content'] += len(copies) - 1
+            unique.append(_newest(copies))
+        documents = sorted(unique, key=lambda doc: doc['rows'][0][0])
+
+    exact = index_storage(memory.index) == "float32" or index_rerank(memory.index) == "float32"
+    foreign = memory.embedding_space != memory.embedder.space
+    kept = []
+    for doc in documents:
+        first = doc['rows'][0][1]
+        doc['reembed'] = False
+        if doc['exists']:
+            try:
+                st = os.stat(doc['path'])
+                changed = first.get('mtime') != st.st_mtime or first.get('size') != st.st_size
+            except OSError:
+                changed = True
+            doc['reembed'] = reembed or foreign or changed or not exact
+        elif foreign:
+            counts['missing'] += 1  # Its vectors are in the old space and cannot be redone
+            continue
+        counts['reembed'] += doc['reembed']
+        kept.append(doc)
+    return kept, counts
+
+
+def embed_texts(memory: MemoryCore, texts: List[str], workers: int) -> np.ndarray:
+    """
+    Embeds texts through the embedding cache; misses are encoded by `workers`
+    embedding processes (EmbeddingBackend.start_pool) when there are enough of
+    them to be worth the start-up.
+    """
+    cached = memory.embed_cache.get_many(texts)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+    vectors = np.empty((len(texts), memory.embedder.dimension), dtype='float32')
+    if missing:
+        batch = [texts[i] for i in missing]
+        if workers > 1 and len(batch) > workers * INGEST_BATCH_SIZE:
+            memory.embedder.start_pool(workers)
+        try:
+            fresh = memory.embedder.encode(batch, batch_size=INGEST_BATCH_SIZE)
+        finally:
+            memory.embedder.stop_pool()
+        memory.embed_cache.put_many(batch, fresh)
+        vectors[missing] = fresh
+    for i, vector in enumerate(cached):
+        if vector is not None:
+            vectors[i] = vector
+    return vectors
+
+
+def collect_vectors(memory: MemoryCore, documents: List[Document], stored_ids: np.ndarray,
+                    stored_vectors: np.ndarray, workers: int):
+    """
+    Produces (ids, vectors, metadata rows, lexical terms) for the surviving
+    documents. Kept documents reuse their stored vectors (from export_vectors);
+    re-embedded ones are re-read in parallel and keep their chunks' ids (new
+    chunks get fresh ids). A document whose file can no longer be read as text
+    is dropped.
+    """
+    position = {int(vec_id): row for row, vec_id in enumerate(stored_ids)}
+    next_id = max(int(stored_ids.max(initial=-1)), memory.store.max_id()) + 1
+
+    to_read = [doc['path'] for doc in documents if doc['reembed']]
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        fresh_docs = {path: doc for path, doc in zip(to_read, pool.map(read_document, to_read))}
+
+    ids, rows, terms, texts = [], [], {}, []
+    stored_rows, stored_positions = [], []  # Output rows filled from stored vectors, and where from
+    for doc in documents:
+        path = doc['path']
+        if not doc['reembed']:
+            for vec_id, row in doc['rows']:
+                if vec_id not in position:
+                    continue  # Row without a vector; nothing to keep
+                stored_rows.append(len(ids))
+                stored_positions.append(position[vec_id])
+                ids.append(vec_id)
+                rows.append((vec_id, row))
+                terms[vec_id] = memory.lexical.doc_terms.get(vec_id) or term_counts(f"{path} {row['summary']}")
+            continue
+
+        fresh = fresh_docs.get(path)
+        if fresh is None:
+            continue
+        _, chunks, file_stats = fresh
+        chunks = chunks or [{'text': '', 'start': 0, 'end': 0}]
+        doc_hash = MemoryCore.content_hash('\0'.join(chunk['text'] for chunk in chunks))
+        old_ids = [vec_id for vec_id, _ in doc['rows']]
+        for n, chunk in enumerate(chunks):
+            if n < len(old_ids):
+                vec_id = old_ids[n]
+            else:
+                vec_id, next_id = next_id, next_id + 1
+            ids.append(vec_id)
+            rows.append((vec_id, dict(file_stats, path=path, summary=chunk['text'][:SPAN_PREVIEW_CHARS], chunk=n,
+                                      start=chunk['start'], end=chunk['end'], doc_hash=doc_hash)))
+            terms[vec_id] = term_counts(f"{path} {chunk['text']}")
+            texts.append(embedding_text(path, chunk['text']))
+
+    # A new embedding backend may also change the dimension (then nothing is reused)
+    vectors = np.empty((len(ids), memory.embedder.dimension if texts else memory.dimension), dtype='float32')
+    vectors[stored_rows] = stored_vectors[stored_positions]
+    if texts:
+        fresh_rows = np.setdiff1d(np.arange(len(ids)), stored_rows)  # In document order, like texts
+        vectors[fresh_rows] = embed_texts(memory, texts, workers)
+    return np.asarray(ids, dtype='int64'), vectors, rows, terms
+
+
+def store_stats(index, store: MetadataStore, queries: np.ndarray) -> Dict[str, float]:
+    """Size of the store and search latency (single queries, the agent's access pattern)."""
+    disk = 0
+    for path in (MEMORY_FILE, LEXICAL_FILE, METADATA_FILE, METADATA_FILE + "-wal", WAL_FILE, WAL_FILE + ".old"):
+        if os.path.exists(path):
+            disk += os.path.getsize(path)
+    latencies = [0.0]
+    if index.ntotal and len(queries):
+        _, latencies = timed_search(index, queries, 3 * CHUNK_OVERFETCH, search_params(index))
+    return {'documents': store.count_paths(), 'chunks': store.count(), 'vectors': index.ntotal,
+            'disk_mb': disk / 2**20, 'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99))}
+
+
+def build_staged_store(memory: MemoryCore, ids: np.ndarray, vectors: np.ndarray,
+                       rows: List[Tuple[int, Dict[str, Any]]], terms: Dict[int, Dict[str, int]],
+                       kind: str, storage: str, rerank: Optional[str]) -> List[Tuple[str, str]]:
+    """Writes the new index, lexical index and metadata database beside the live files; returns (staged, live) pairs."""
+    if not len(vectors):
+        kind, storage = "flat", "float32"
+    if kind == "ivf_pq" and len(vectors) < STORAGE_TRAIN_MIN["pq"]:
+        kind = "ivf_flat"  # Too few vectors to train product quantizers
+    if len(vectors) < STORAGE_TRAIN_MIN.get(storage, 0):
+        storage = "float32"
+    index = build_ann_index(kind, vectors.shape[1], vectors, ids, storage=storage, rerank=rerank)
+
+    staged_index, staged_lexical, staged_db = (path + STAGED_SUFFIX for path in (MEMORY_FILE, LEXICAL_FILE,
+                                                                                  METADATA_FILE))
+    with open(staged_index, 'wb') as f:
+        f.write(faiss.serialize_index(index).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    LexicalIndex.write(staged_lexical, terms)
+
+    for path in (staged_db, staged_db + "-wal", staged_db + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)  # Left over from an interrupted run
+    store = MetadataStore(staged_db)
+    store.set_info(EMBEDDING_SPACE_KEY, memory.embedder.space)  # Every kept vector is in it now
+    store.apply(rows)
+    store.sync()
+    store.close()  # Last connection: SQLite folds and deletes its -wal, so only the .db file moves
+    fsync_dir(staged_db)
+    return [(staged_index, MEMORY_FILE), (staged_lexical, LEXICAL_FILE), (staged_db, METADATA_FILE)]
+
+
+def _print_stats(before: Dict[str, float], after: Optional[Dict[str, float]]):
+    print(f"{'':<8}{'documents':>10}{'chunks':>9}{'vectors':>9}{'disk MB':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for label, stats in (("before", before), ("after", after)):
+        if stats is not None:
+            print(f"{label:<8}{stats['documents']:>10}{stats['chunks']:>9}{stats['vectors']:>9}"
+                  f"{stats['disk_mb']:>9.2f}{stats['p50_ms']:>9.3f}{stats['p99_ms']:>9.3f}")
+
+
+def compact(args) -> int:
+    if is_server_alive() and not args.force:
+        print("[COMPACT] The memory server is running; stop it first (it owns the store), or pass --force.")
+        return 1
+
+    # Replays any write-ahead log, so the compaction starts from the latest state. It may hold another
+    # embedding backend's vectors: this is how a store moves to the configured backend.
+    memory = MemoryCore(check_embeddings=False)
+    memory._ensure_loaded()
+    if memory.embedding_space != memory.embedder.space:
+        print(f"[COMPACT] The store holds '{memory.embedding_space}' vectors; re-embedding everything as "
+              f"'{memory.embedder.space}' ({memory.embedder.name} backend).")
+    documents, counts = plan_compaction(memory, args.keep_missing, args.keep_copies, args.reembed)
+    print(f"[COMPACT] Dropping {counts['duplicate_paths']} duplicate paths, {counts['missing']} missing files and "
+          f"{counts['duplicate_content']} duplicate copies; re-embedding {counts['reembed']} of {len(documents)} "
+          f"documents.")
+
+    # Stored vectors double as latency queries, so before and after are measured alike
+    stored_ids, stored_vectors = export_vectors(memory.index)
+    picks = np.random.default_rng(0).choice(len(stored_vectors), min(LATENCY_QUERIES, len(stored_vectors)),
+                                            replace=False)
+    queries = stored_vectors[picks]
+    before = store_stats(memory.index, memory.store, queries)
+    if args.dry_run:
+        _print_stats(before, None)
+        memory.close()
+        return 0
+
+    ids, vectors, rows, terms = collect_vectors(memory, documents, stored_ids, stored_vectors, args.workers)
+
+    kind = args.kind or index_kind(memory.index)
+    storage = args.storage or index_storage(memory.index)
+    rerank = index_rerank(memory.index) if args.rerank is None else (args.rerank if args.rerank != "none" else None)
+    staged = build_staged_store(memory, ids, vectors, rows, terms, kind, storage, rerank)
+
+    # Checkpoint and release the live store, then swap all files in as one step. The old logs
+    # describe the old store, so they go too (the -wal/-shm before the new database arrives).
+    memory.close()
+    swap_in(staged, removes=[WAL_FILE, WAL_FILE + ".old", METADATA_FILE + "-wal", METADATA_FILE + "-shm"])
+
+    if vectors.shape[1] != queries.shape[1]:
+        queries = vectors[picks[picks < len(vectors)]]  # Old-space queries do not fit the new index
+    store = MetadataStore(METADATA_FILE)
+    after = store_stats(faiss.read_index(MEMORY_FILE), store, queries)
+    store.close()
+    print(f"[COMPACT] Swapped in the compacted store ({len(ids)} vectors).")
+    _print_stats(before, after)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline compaction and rebuild of Neura's memory store")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan and current stats, change nothing")
+    parser.add_argument("--reembed", action="store_true", help="re-embed every document whose file exists")
+    parser.add_argument("--keep-missing", action="store_true", help="keep documents whose files no longer exist")
+    parser.add_argument("--keep-copies", action="store_true", help="keep documents with identical content")
+    parser.add_argument("--workers", type=int, default=1, help="embedding processes for re-embedding")
+    parser.add_argument("--kind", default=None, help="index kind to build (default: the current one)")
+    parser.add_argument("--storage", default=None, help="vector storage to build (default: the current one)")
+    parser.add_argument("--rerank", default=None, help='re-rank copy: "float32", "fp16" or "none" (default: current)')
+    parser.add_argument("--force", action="store_true", help="run even though a memory server answers")
+    sys.exit(compact(parser.parse_args()))
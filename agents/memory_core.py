@@ -1,136 +1,1307 @@
 # /Users/astrodingra/Downloads/neura-os/agents/memory_core.py
 
+import time
+_MODULE_START = time.perf_counter()
+
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import os
-from typing import List, Dict, Any
+import atexit
+import heapq
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from memory_wal import MemoryWAL, WAL_FILE, fsync_dir, finish_swap
+from embedding_cache import EmbeddingCache
+from chunker import chunk_text, read_file_chunks
+from lexical_index import LexicalIndex, LEXICAL_FILE, term_counts
+from metadata_store import MetadataStore, METADATA_DB, LEGACY_METADATA_FILE
+from rw_lock import ReadWriteLock
+from embedding_backend import EMBEDDING_BACKEND, MODEL_NAME, EmbeddingBackend, make_backend
 
 # --- Configuration Constants (Defined OUTSIDE the class) ---
 MEMORY_FILE = "neura_memory.faiss"
-METADATA_FILE = "neura_metadata.txt"
-MODEL_NAME = 'all-MiniLM-L6-v2'  # A fast, small embedding model
+METADATA_FILE = METADATA_DB  # SQLite; an older neura_metadata.txt is migrated into it on first load
+INGEST_BATCH_SIZE = 64  # Documents per encode pass / index save in add_documents
+ENCODE_WORKERS = 1  # Embedding processes for bulk ingestion; >1 starts a pool on the first multi-batch encode
+EMBEDDING_SPACE_KEY = "embedding_space"  # store_info entry naming the vector space of the stored vectors
+PERSISTENCE_MODE = "wal"  # "wal": append-only log + background checkpoints, "snapshot": full rewrite per batch
+CHECKPOINT_INTERVAL = 60.0  # Seconds between background checkpoints (WAL mode)
+CHECKPOINT_MAX_RECORDS = 500  # Force an early checkpoint once the log holds this many batches
+
+# Approximate nearest neighbour (ANN) settings
+INDEX_TYPE = "ivf_flat"  # Target index once the store is large: "flat", "ivf_flat", "ivf_pq" or "hnsw"
+ANN_UPGRADE_THRESHOLD = 50000  # Vectors at which a flat index is migrated to INDEX_TYPE
+ANN_TRAIN_SAMPLE = 20000  # Stored vectors sampled to train IVF quantizers
+ANN_NLIST = None  # IVF cells; None picks ~4*sqrt(N)
+ANN_PQ_M = 48  # PQ sub-quantizers (must divide the embedding dimension)
+HNSW_M = 32  # HNSW graph degree
+DEFAULT_NPROBE = 16  # IVF cells visited per query
+DEFAULT_EF_SEARCH = 64  # HNSW candidate list size per query
+
+# Compressed vector storage (see `python memory_bench.py storage` for footprint vs. recall)
+VECTOR_STORAGE = "float32"  # Vector codes: "float32", "fp16", "sq8" (int8 scalar quantizer) or "pq"
+RERANK_STORAGE = None  # Extra copy used to re-score compressed hits: None, "float32" (exact) or "fp16"
+RERANK_FACTOR = 4  # Compressed candidates re-scored per requested hit
+STORAGE_TRAIN_MIN = {"sq8": 1000, "pq": 10000}  # Vectors needed before a trained storage mode is applied
+QUERY_CACHE_SIZE = 256  # Recent query vectors kept in memory by semantic_search_many
+MAX_DEAD_FRACTION = 0.2  # Rebuild once this share of vectors is stale (indexes that cannot delete in place)
+SPAN_PREVIEW_CHARS = 300  # Characters of each chunk kept in metadata and returned as the matching span
+CHUNK_OVERFETCH = 4  # Chunk hits fetched per requested file, so k distinct files survive folding
+SEARCH_MODE = "vector"  # Default semantic_search mode: "vector", "lexical" (BM25, no model) or "hybrid"
+HYBRID_CANDIDATES = 5  # Files taken from each ranking per requested result before fusing
+RRF_K = 60  # Reciprocal-rank-fusion damping; larger values flatten the rank bonus
+FILTER_CACHE_SIZE = 32  # Recent search filters kept resolved to id selectors (until metadata changes)
 # -----------------------------------------------------------
 
+
+def embedding_text(abs_path: str, text: str) -> str:
+    """What gets embedded for one chunk (the path gives the model context the text may lack)."""
+    return f"Path: {abs_path}. Content Summary: {text}"
+
+
+_SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+
+
+def build_ann_index(kind: str, dimension: int, vectors: np.ndarray, ids: Optional[np.ndarray] = None,
+                    nlist: Optional[int] = None, pq_m: Optional[int] = None,
+                    hnsw_m: Optional[int] = None, train_sample: Optional[int] = None,
+                    storage: str = "float32", rerank: Optional[str] = None):
+    """
+    Builds an id-mapped inner-product index of the given kind and fills it with
+    `vectors` under `ids` (default: row numbers). `storage` picks how vectors are
+    coded ("float32", "fp16", "sq8" or "pq"; ivf_pq is always PQ), and `rerank`
+    ("float32" or "fp16") keeps a finer second copy that re-scores the top
+    compressed candidates. Trained parts (IVF quantizers, sq8, PQ) are trained on
+    a random sample of the vectors. Plain IVF carries ids natively; everything
+    else is wrapped in IndexIDMap2. Unset knobs fall back to the ANN_* / HNSW_M
+    constants.
+    """
+    nlist = nlist or ANN_NLIST
+    pq_m = pq_m or ANN_PQ_M
+    hnsw_m = hnsw_m or HNSW_M
+    train_sample = train_sample or ANN_TRAIN_SAMPLE
+    n = len(vectors)
+    if ids is None:
+        ids = np.arange(n, dtype='int64')
+    if kind == "ivf_pq":
+        storage = "pq"
+    if storage not in ("float32", "fp16", "sq8", "pq"):
+        raise ValueError(f"Unknown vector storage: {storage}")
+    if storage == "pq" and dimension % pq_m:
+        raise ValueError(f"PQ sub-quantizers ({pq_m}) must divide the dimension ({dimension}).")
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if kind == "flat":
+        if storage == "float32":
+            index = faiss.IndexFlatIP(dimension)
+        elif storage == "pq":
+            index = faiss.IndexPQ(dimension, pq_m, 8, metric)
+        else:
+            index = faiss.IndexScalarQuantizer(dimension, _SQ_TYPES[storage], metric)
+    elif kind == "hnsw":
+        if storage == "float32":
+            index = faiss.IndexHNSWFlat(dimension, hnsw_m, metric)
+        elif storage == "pq":
+            index = faiss.IndexHNSWPQ(dimension, pq_m, hnsw_m, 8, metric)
+        else:
+            index = faiss.IndexHNSWSQ(dimension, _SQ_TYPES[storage], hnsw_m, metric)
+    elif kind in ("ivf_flat", "ivf_pq"):
+        if nlist is None:
+            nlist = int(4 * np.sqrt(max(n, 1)))
+        nlist = max(1, min(nlist, n // 39 or 1))  # FAISS wants ~39 training points per cell
+        quantizer = faiss.IndexFlatIP(dimension)
+        if storage == "float32":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+        elif storage == "pq":
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8, metric)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, _SQ_TYPES[storage], metric)
+    else:
+        raise ValueError(f"Unknown index type: {kind}")
+
+    if rerank and storage != "float32":
+        if rerank == "float32":
+            refine = faiss.IndexFlatIP(dimension)
+        elif rerank == "fp16":
+            refine = faiss.IndexScalarQuantizer(dimension, _SQ_TYPES["fp16"], metric)
+        else:
+            raise ValueError(f"Unknown re-rank storage: {rerank}")
+        index = faiss.IndexRefine(index, refine)
+
+    if not isinstance(index, faiss.IndexIVF):
+        index = faiss.IndexIDMap2(index)
+
+    if not index.is_trained:
+        if not n:
+            raise ValueError(f"'{kind}' with '{storage}' storage needs vectors to train on.")
+        sample = vectors
+        if n > train_sample:
+            sample = vectors[np.random.default_rng(0).choice(n, train_sample, replace=False)]
+        index.train(np.ascontiguousarray(sample, dtype='float32'))
+
+    if n:
+        index.add_with_ids(np.ascontiguousarray(vectors, dtype='float32'), np.asarray(ids, dtype='int64'))
+    return index
+
+
+def _inner_index(index):
+    """Unwraps an IndexIDMap/IndexIDMap2 to the index that does the actual search."""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def _base_index(index):
+    """Unwraps id mapping and re-ranking down to the index that produces candidates."""
+    inner = _inner_index(index)
+    if isinstance(inner, faiss.IndexRefine):
+        return faiss.downcast_index(inner.base_index)
+    return inner
+
+
+def index_kind(index) -> str:
+    """Maps a (possibly id-mapped) FAISS index back to its INDEX_TYPE name."""
+    inner = _base_index(index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def index_storage(index) -> str:
+    """Maps an index back to its VECTOR_STORAGE name ("float32", "fp16", "sq8" or "pq")."""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base = faiss.downcast_index(base.storage)
+    if isinstance(base, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(base, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "fp16" if base.sq.qtype == _SQ_TYPES["fp16"] else "sq8"
+    return "float32"
+
+
+def index_rerank(index) -> Optional[str]:
+    """The RERANK_STORAGE of an index: None, "float32" or "fp16"."""
+    inner = _inner_index(index)
+    if not isinstance(inner, faiss.IndexRefine):
+        return None
+    return "float32" if isinstance(faiss.downcast_index(inner.refine_index), faiss.IndexFlat) else "fp16"
+
+
+def is_id_mapped(index) -> bool:
+    """True if the index stores explicit vector ids (needed for update/delete)."""
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexIVF))
+
+
+def vector_ids(index) -> np.ndarray:
+    """Ids of every vector stored in `index`, in storage order (no vectors are reconstructed)."""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.vector_to_array(index.id_map).astype('int64')
+    if isinstance(index, faiss.IndexIVF):
+        invlists = index.invlists
+        return np.concatenate([
+            faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+            for l in range(index.nlist)
+        ] or [np.empty(0, dtype='int64')]).astype('int64')
+    # Legacy un-mapped index: ids are insertion positions
+    return np.arange(index.ntotal, dtype='int64')
+
+
+def export_vectors(index):
+    """
+    Returns (ids, vectors) for everything stored in `index`. If an id occurs
+    more than once (HNSW cannot delete in place), only its newest vector is kept.
+    """
+    ids = vector_ids(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        vectors = _inner_index(index).reconstruct_n(0, index.ntotal)
+    elif isinstance(index, faiss.IndexIVF):
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        vectors = index.reconstruct_batch(ids) if len(ids) else np.empty((0, index.d), dtype='float32')
+    else:
+        vectors = index.reconstruct_n(0, index.ntotal)
+
+    # Keep the last occurrence of each id (later adds are newer)
+    _, last = np.unique(ids[::-1], return_index=True)
+    keep = np.sort(len(ids) - 1 - last)
+    return ids[keep], vectors[keep]
+
+
+def read_index_mmap(path: str):
+    """
+    Opens an index file read-only with its vector data memory-mapped instead of
+    copied onto the heap, so loading is near-constant time and processes that
+    map the same file share its pages through the OS page cache. A top-level
+    IVF index maps its inverted lists (IO_FLAG_MMAP); every other layout maps
+    its flat/SQ/PQ codes in place (IO_FLAG_MMAP_IFC). The result must never be
+    written to: FAISS aborts the process on mutating a mapped array.
+    """
+    with open(path, 'rb') as f:
+        fourcc = f.read(4)
+    mapped = faiss.IO_FLAG_MMAP if fourcc.startswith(b"Iw") else faiss.IO_FLAG_MMAP_IFC  # "Iw..": IndexIVF*
+    try:
+        return faiss.read_index(path, mapped | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # Layout this FAISS build cannot map: plain read, still never written to
+        return faiss.read_index(path, faiss.IO_FLAG_READ_ONLY)
+
+
+def id_selector(ids: np.ndarray):
+    """FAISS selector admitting only the given vector ids: a bitmap with one bit per id up to the largest."""
+    bits = np.zeros(int(ids.max(initial=-1)) + 1, dtype=bool)
+    bits[ids] = True
+    packed = np.packbits(bits, bitorder='little')
+    selector = faiss.IDSelectorBitmap(len(packed), faiss.swig_ptr(packed))
+    selector.referenced_objects = [packed]  # The selector only points at the bitmap
+    return selector
+
+
+def supports_selector(index) -> bool:
+    """False for layouts whose FAISS search rejects an id selector (flat PQ codes); see subset_search."""
+    return not isinstance(_base_index(index), faiss.IndexPQ)
+
+
+def subset_search(index, queries: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact inner-product search over the vectors of `ids` only, for layouts that
+    cannot take a selector. Decodes just the selected vectors (from the re-rank
+    copy if there is one). Returns (scores, ids) like index.search.
+    """
+    stored = vector_ids(index)
+    rows = np.flatnonzero(np.isin(stored, ids))
+    inner = _inner_index(index)
+    source = faiss.downcast_index(inner.refine_index) if isinstance(inner, faiss.IndexRefine) else inner
+    vectors = source.reconstruct_batch(rows) if len(rows) else np.empty((0, index.d), dtype='float32')
+    scores = queries @ vectors.T
+    top = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(scores, top, axis=1), stored[rows][top]
+
+
+def search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None, selector=None):
+    """
+    Returns per-query FAISS search parameters for IVF/HNSW indexes (None for
+    flat without a selector), wrapped with the RERANK_FACTOR for indexes that
+    re-rank. `selector` (see id_selector) restricts the search to its ids.
+    """
+    base = _base_index(index)
+    params = None
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(nprobe=nprobe or DEFAULT_NPROBE)
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or DEFAULT_EF_SEARCH)
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    refine = isinstance(_inner_index(index), faiss.IndexRefine)
+    if selector is not None:
+        # IndexRefine does not pass a selector on to its candidate index, so that
+        # index gets one over its own row numbers (what IndexIDMap2 does for the rest)
+        params.sel = faiss.IDSelectorTranslated(index.id_map, selector) if refine else selector
+        params.referenced_objects = [selector, params.sel]
+    if refine:
+        wrapped = faiss.IndexRefineSearchParameters(k_factor=RERANK_FACTOR, base_index_params=params)
+        wrapped.referenced_objects = [params]
+        return wrapped
+    return params
+
+
 class MemoryCore:
     """Manages the Vector Database (FAISS) and file knowledge persistence."""
     
-    def __init__(self):
-        print(f"[MEMORY] Initializing Embedding Model: {MODEL_NAME}")
-        self.model = SentenceTransformer(MODEL_NAME)
-        self.dimension = self.model.get_sentence_embedding_dimension()
-        
+    def __init__(self, persistence: str = PERSISTENCE_MODE, warm_up: bool = False, read_only: bool = False,
+                 backend: str = EMBEDDING_BACKEND, check_embeddings: bool = True):
+        # Nothing heavy happens here: the model and the store load on first use,
+        # so importing tools.py stays instant for requests that never touch memory.
+        # read_only=True is for search-only processes: the index is memory-mapped
+        # (see read_index_mmap), nothing is written, and searches follow the
+        # snapshots checkpointed by the writing process.
+        # `backend` picks the embedding backend (see embedding_backend.py). A store
+        # holding another backend's vectors refuses to load unless
+        # check_embeddings=False (memory_compact.py, which re-embeds it).
+        self.persistence = persistence
+        self.read_only = read_only
+        self.check_embeddings = check_embeddings
+        self.timings: Dict[str, float] = {'import': _IMPORT_SECONDS}
+
+        self.embedder: EmbeddingBackend = make_backend(backend)
+        self._store_loaded = False
+        self._store_lock = threading.Lock()
+
+        # Concurrency: _lock serializes writers (and the checkpoint's snapshot)
+        # for a whole write, including its log append. Searches never take it;
+        # they hold _rw for reading, which a writer takes exclusively only while
+        # it changes the in-memory index and lexical postings. Embedding, disk
+        # writes and index rebuilds run outside _rw, so searches do not stall.
+        self._lock = threading.RLock()
+        self._rw = ReadWriteLock()
+        self._checkpoint_lock = threading.Lock()
+        self.wal: Optional[MemoryWAL] = None
+
+        # Recent query vectors, checked before the embedding cache and the model
+        self.query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_lock = threading.Lock()
+        # Resolved search filters: (filters, metadata version) -> (ids, selector)
+        self._filter_cache: "OrderedDict[Tuple, Tuple[np.ndarray, Any]]" = OrderedDict()
+
+        if warm_up:
+            self.warm_up()
+
+
+    # --- Lazy Loading ---
+    def _ensure_loaded(self):
+        """Loads the index, metadata and write-ahead log the first time they are needed."""
+        if self._store_loaded:
+            return
+        with self._store_lock:
+            if not self._store_loaded:
+                self._load_store()
+                self._store_loaded = True
+
+
+    def _load_store(self):
+        if self.read_only:
+            self._load_read_only()
+            return
+
+        if finish_swap():
+            print("[MEMORY] Completed an interrupted store swap (memory_compact.py).")
+
+        start = time.perf_counter()
+        self._migrated: List[str] = []  # In-memory upgrades of an older store, saved once loaded
         # Load or create FAISS index and metadata
         self.index = self._load_or_create_index()
-        self.metadata: Dict[int, Dict[str, Any]] = {} 
-        self._load_metadata()
+        self.dimension = self.index.d
+        self.embed_cache = EmbeddingCache(self.embedder.space)
+        self.timings['index_load'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # Per-vector metadata lives in SQLite and is read on demand, not held in RAM
+        self.store = MetadataStore(METADATA_FILE)
+        migrated = self.store.migrate_legacy(LEGACY_METADATA_FILE, self.content_hash)
+        if migrated:
+            print(f"[MEMORY] Migrated {migrated} metadata entries from {LEGACY_METADATA_FILE}.")
+        self._check_embedding_space()
+        self._load_lexical()
+        self.next_id = 0
+        self.dead_vectors = 0
+        self.timings['metadata_load'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if self.persistence == "wal":
+            self._start_wal()
+        self._reconcile_store()
+        self.timings['wal_replay'] = time.perf_counter() - start
+        if self._migrated:
+            # Otherwise nothing saves them until the first write, and they run again on every start
+            self._save_index()
+            self.store.sync()
+            print(f"[MEMORY] Saved migrated store ({', '.join(self._migrated)}).")
+        atexit.register(self.close)
+
+
+    def _load_read_only(self):
+        """
+        Maps the last checkpointed snapshot. The write-ahead log is not replayed
+        (that would mutate the mapped index), so writes become visible here once
+        the writer checkpoints them; rows newer than the snapshot are harmless,
+        since search only returns rows whose vector is in the index.
+        """
+        if not os.path.exists(MEMORY_FILE):
+            raise FileNotFoundError(f"No {MEMORY_FILE} to open read-only; start a writing MemoryCore first.")
+        start = time.perf_counter()
+        self._snapshot_stamp = self._read_snapshot_stamp()
+        print(f"[MEMORY] Mapping index from {MEMORY_FILE} (read-only)...")
+        self.index = read_index_mmap(MEMORY_FILE)
+        self.dimension = self.index.d
+        self.embed_cache = EmbeddingCache(self.embedder.space)
+        self.timings['index_load'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.store = MetadataStore(METADATA_FILE, read_only=True)
+        self._check_embedding_space()
+        self._load_lexical()
+        self.next_id = 0
+        self.dead_vectors = 0
+        self.timings['metadata_load'] = time.perf_counter() - start
+
+
+    @staticmethod
+    def _read_snapshot_stamp() -> Tuple:
+        """
+        Identity of the snapshot files on disk; checkpoints replace them, which
+        changes it. The metadata database only counts by inode (its own
+        checkpoints touch it constantly; memory_compact.py replaces it).
+        """
+        stamp = []
+        for path in (MEMORY_FILE, LEXICAL_FILE, METADATA_FILE):
+            try:
+                st = os.stat(path)
+                stamp.append(st.st_ino if path == METADATA_FILE else (st.st_ino, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+
+    def _maybe_remap(self):
+        """Read-only mode: switches to a newer snapshot once the writer has checkpointed one."""
+        stamp = self._read_snapshot_stamp()
+        if stamp == self._snapshot_stamp or stamp[0] is None:
+            return
+        with self._store_lock:
+            if stamp == self._snapshot_stamp:
+                return
+            # The old mapping stays valid (the replaced file lives on until unmapped),
+            # so searches already running on it finish undisturbed
+            index = read_index_mmap(MEMORY_FILE)
+            lexical = LexicalIndex.load(LEXICAL_FILE) if stamp[1] is not None else self.lexical
+            store = self.store
+            if stamp[2] is not None and stamp[2] != self._snapshot_stamp[2]:
+                # Swapped in by memory_compact.py (the old connection closes once unreferenced)
+                store = MetadataStore(METADATA_FILE, read_only=True)
+                stored = self._stored_space(store, index)
+                if self.check_embeddings and stored not in (None, self.embedder.space):
+                    raise RuntimeError(self._space_mismatch(stored))
+            with self._rw.write_locked():
+                self.index, self.lexical, self.store = index, lexical, store
+            with self._query_lock:
+                self._filter_cache.clear()  # Resolved against the previous snapshot
+            self._snapshot_stamp = stamp
+        print(f"[MEMORY] Re-mapped index after a checkpoint ({index.ntotal} vectors).")
+
+
+    @staticmethod
+    def _stored_space(store: MetadataStore, index) -> Optional[str]:
+        """Embedding space recorded for a store; None while it is still empty."""
+        recorded = store.get_info(EMBEDDING_SPACE_KEY)
+        if recorded is None and index.ntotal:
+            return MODEL_NAME  # Written before backends were pluggable: always the PyTorch model
+        return recorded
+
+
+    def _space_mismatch(self, stored: str) -> str:
+        return (f"The memory store holds '{stored}' vectors, but the '{self.embedder.name}' embedding backend "
+                f"produces '{self.embedder.space}' vectors. Configure the matching backend "
+                f"(NEURA_EMBEDDING_BACKEND), or re-embed the store with `python memory_compact.py`.")
+
+
+    def _check_embedding_space(self):
+        """
+        Vectors from different backends are not comparable, so the store records
+        the space of its vectors and a core configured for another one refuses
+        to load (instead of silently mixing them).
+        """
+        stored = self._stored_space(self.store, self.index)
+        self.embedding_space = stored or self.embedder.space
+        if not self.read_only and self.store.get_info(EMBEDDING_SPACE_KEY) is None:
+            self.store.set_info(EMBEDDING_SPACE_KEY, self.embedding_space)
+        if self.check_embeddings and self.embedding_space != self.embedder.space:
+            raise RuntimeError(self._space_mismatch(self.embedding_space))
+
+
+    def _check_writable(self):
+        if self.read_only:
+            raise PermissionError("This MemoryCore is read-only (memory-mapped); write through the indexing process.")
+
+
+    def _reconcile_store(self):
+        """
+        Lines metadata up with the vectors once the log is replayed. Rows whose
+        vector never reached disk are dropped (so their file gets re-indexed),
+        and vectors without a row are counted as dead.
+        """
+        stored_ids = vector_ids(self.index)
+        orphans = np.setdiff1d(np.asarray(self.store.all_ids(), dtype='int64'), stored_ids)
+        if len(orphans):
+            self._write_metadata(deletes=orphans.tolist())
+            print(f"[MEMORY] Dropped {len(orphans)} metadata rows without a stored vector.")
+
+        # Ids only ever grow, so a removed document's id is never handed out again
+        self.next_id = max(self.next_id, int(stored_ids.max(initial=-1)) + 1, self.store.max_id() + 1)
+        # Stale vectors left behind by indexes that cannot delete in place (HNSW)
+        self.dead_vectors = max(0, self.index.ntotal - self.store.count())
+
+
+    def warm_up(self) -> threading.Thread:
+        """Opt-in: loads the store and the model on a background thread."""
+        def _warm():
+            try:
+                self._ensure_loaded()
+                self.embedder.load()
+                print(f"[MEMORY] Warm-up complete. {self.startup_report()}")
+            except Exception as e:
+                print(f"[MEMORY] Warm-up failed: {e}")
+
+        thread = threading.Thread(target=_warm, name="neura-memory-warmup", daemon=True)
+        thread.start()
+        return thread
+
+
+    def startup_report(self) -> str:
+        """One-line breakdown of where startup time went (phases not run yet are omitted)."""
+        order = ['import', 'model_import', 'model_load', 'index_load', 'metadata_load', 'wal_replay']
+        timings = dict(self.timings, **self.embedder.timings)
+        parts = [f"{name}={timings[name] * 1000:.0f}ms" for name in order if name in timings]
+        return "Startup: " + ", ".join(parts)
+    # --- End Lazy Loading ---
+
 
-    
     def _load_or_create_index(self):
         """Loads FAISS index from disk or creates a new one."""
         if os.path.exists(MEMORY_FILE):
             print(f"[MEMORY] Loading index from {MEMORY_FILE}...")
-            return faiss.read_index(MEMORY_FILE)
+            index = faiss.read_index(MEMORY_FILE)
+            if not is_id_mapped(index):
+                # Old stores used positional ids; keep them as explicit, stable ids
+                print("[MEMORY] Migrating index to stable vector ids...")
+                ids, vectors = export_vectors(index)
+                index = build_ann_index(index_kind(index), index.d, vectors, ids)
+                self._migrated.append("stable ids")
+            return index
         else:
             print("[MEMORY] Creating new FAISS index...")
-            return faiss.IndexFlatIP(self.dimension)
+            dimension = self.embedder.dimension
+            # Storage modes that need training start as float32 and convert in _maybe_upgrade_index
+            storage = VECTOR_STORAGE if not STORAGE_TRAIN_MIN.get(VECTOR_STORAGE) else "float32"
+            return build_ann_index("flat", dimension, np.empty((0, dimension), dtype='float32'),
+                                   storage=storage, rerank=RERANK_STORAGE)
 
     
     def _save_index(self):
-        """Saves the current FAISS index to disk."""
-        faiss.write_index(self.index, MEMORY_FILE)
-        self._save_metadata()
-
-    def _load_metadata(self):
-        """Loads path metadata from a text file."""
-        if os.path.exists(METADATA_FILE):
-            with open(METADATA_FILE, 'r') as f:
-                for line in f:
-                    try:
-                        idx_str, path, summary = line.strip().split('|', 2)
-                        self.metadata[int(idx_str)] = {'path': path, 'summary': summary}
-                    except ValueError:
-                        continue
-        print(f"[MEMORY] Loaded {len(self.metadata)} metadata entries.")
+        """Saves the current FAISS and lexical indexes to disk (metadata rows are already in SQLite)."""
+        with self._lock:
+            self._write_snapshot(faiss.serialize_index(self.index), self.lexical.snapshot())
+
+
+    def _write_snapshot(self, index_bytes: np.ndarray, lexical_terms: Dict[int, Dict[str, int]]):
+        """Atomically replaces the index and lexical files (write to temp, fsync, rename)."""
+        tmp_index = MEMORY_FILE + ".tmp"
+        with open(tmp_index, 'wb') as f:
+            f.write(index_bytes.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_index, MEMORY_FILE)
+
+        LexicalIndex.write(LEXICAL_FILE, lexical_terms)
+        fsync_dir(MEMORY_FILE)
+
+
+    # --- Write-Ahead Log (incremental persistence) ---
+    def _start_wal(self):
+        """Replays any logged writes on top of the snapshot and starts the checkpointer."""
+        replayed = 0
+        for log_path in (WAL_FILE + ".old", WAL_FILE):
+            for record, vectors in MemoryWAL.read_frames(log_path, self.dimension):
+                self._apply_record(record, vectors)
+                replayed += 1
+        if replayed:
+            print(f"[MEMORY] Replayed {replayed} write-ahead log records.")
+
+        self.wal = MemoryWAL(WAL_FILE)
+        self._checkpoint_wakeup = threading.Event()
+        self._checkpoint_stop = threading.Event()
+        self._checkpoint_thread = threading.Thread(
+            target=self._checkpoint_loop, name="neura-memory-checkpoint", daemon=True
+        )
+        self._checkpoint_thread.start()
+
+
+    def _apply_record(self, record: Dict[str, Any], vectors: Optional[np.ndarray]):
+        """
+        Re-applies one logged mutation. Adds are upserts and removes ignore
+        missing ids, so a record that already made it into the snapshot
+        (crash mid-checkpoint) is applied safely.
+        """
+        op = record.get('op')
+        if op == 'add':
+            self._upsert_vectors(record['ids'], vectors)
+            for vec_id, terms in zip(record['ids'], record.get('terms', [])):
+                self.lexical.add(vec_id, terms)
+            # Chunks left over from a longer previous version of the same files
+            removed = record.get('removed', [])
+            self._remove_vectors(removed)
+            self._write_metadata(zip(record['ids'], record['docs']), removed)
+        elif op == 'meta':
+            existing = self.store.get_many(record['ids'])
+            self._write_metadata((vec_id, doc) for vec_id, doc in zip(record['ids'], record['docs'])
+                                 if vec_id in existing)
+        elif op == 'remove':
+            self._remove_vectors(record['ids'])
+            self._write_metadata(deletes=record['ids'])
+        self.next_id = max([self.next_id] + [i + 1 for i in record.get('ids', [])])
+
+
+    def _checkpoint_loop(self):
+        while not self._checkpoint_stop.is_set():
+            self._checkpoint_wakeup.wait(CHECKPOINT_INTERVAL)
+            self._checkpoint_wakeup.clear()
+            if self._checkpoint_stop.is_set():
+                break
+            try:
+                if self.wal.records:
+                    self.checkpoint()
+            except Exception as e:
+                print(f"[MEMORY] Background checkpoint failed: {e}")
+
+
+    def checkpoint(self):
+        """Folds the write-ahead log into a fresh snapshot, then drops the folded log."""
+        self._check_writable()
+        self._ensure_loaded()
+        if self.wal is None:
+            self._save_index()
+            return
+
+        with self._checkpoint_lock:
+            # Capture a consistent view and switch to a fresh log under the lock;
+            # the slow disk writes happen outside it so adds are not blocked.
+            with self._lock:
+                index_bytes = faiss.serialize_index(self.index)
+                lexical_terms = self.lexical.snapshot()
+                rotated = self.wal.rotate()
 
+            self._write_snapshot(index_bytes, lexical_terms)
+            self.store.sync()  # Metadata rows covered by the rotated log must be on disk too
+            self.wal.discard(rotated)
+            self.embed_cache.save()
+        print(f"[MEMORY] Checkpoint written ({len(lexical_terms)} entries).")
 
-    def _save_metadata(self):
-        """Saves path metadata to a text file."""
-        with open(METADATA_FILE, 'w') as f:
-            for idx, data in self.metadata.items():
-                f.write(f"{idx}|{os.path.abspath(data['path'])}|{data['summary']}\n")
 
+    def close(self):
+        """
+        Stops the checkpointer and leaves a clean snapshot (and cache file)
+        behind, then releases the metadata database. The store reloads on next use.
+        """
+        if not self._store_loaded:
+            return
+        if not self.read_only:
+            if self.wal is not None:
+                self._checkpoint_stop.set()
+                self._checkpoint_wakeup.set()
+                self._checkpoint_thread.join(timeout=5)
+                if self.wal.records:
+                    self.checkpoint()
+                self.wal.close()
+                self.wal = None
+            self.store.sync()
+            self.embed_cache.save()
+        self.embedder.stop_pool()
+        self.store.close()
+        self._store_loaded = False
+    # --- End Write-Ahead Log ---
 
-    def add_document(self, file_path: str, content_summary: str):
-        """Encodes text, adds vector to index, and saves metadata."""
+
+    def _load_lexical(self):
+        """
+        Loads the BM25 index. Stores written before it existed get one built from
+        the metadata (path plus stored chunk preview); new writes index full chunks.
+        """
+        if os.path.exists(LEXICAL_FILE):
+            self.lexical = LexicalIndex.load(LEXICAL_FILE)
+            return
+        self.lexical = LexicalIndex()
+        for idx, data in self.store.iter_entries():
+            self.lexical.add(idx, term_counts(f"{data['path']} {data['summary']}"))
+        if len(self.lexical):
+            print(f"[MEMORY] Built lexical index from {len(self.lexical)} metadata entries.")
+            if not self.read_only:
+                self._migrated.append("lexical index")
+
+
+    @staticmethod
+    def content_hash(content_summary: str) -> str:
+        """Stable hash of the indexed content, used by the content reverse index."""
+        return hashlib.sha1(content_summary.encode('utf-8', 'replace')).hexdigest()
+
+
+    @staticmethod
+    def _as_chunks(content) -> List[Dict[str, Any]]:
+        """
+        Normalizes document content to chunks: a string is split with
+        chunk_text, a list of {'text', 'start', 'end'} dicts (see chunker.py) is
+        taken as is. Empty content still gets one (path-only) chunk.
+        """
+        chunks = chunk_text(content) if isinstance(content, str) else [dict(c) for c in content]
+        return chunks or [{'text': '', 'start': 0, 'end': 0}]
+
+
+    def is_indexed(self, file_path: str) -> bool:
+        """Indexed (path) lookup of whether a file already has vectors."""
+        self._ensure_loaded()
+        return bool(self.store.ids_for_path(os.path.abspath(file_path)))
+
+
+    def get_vector_id(self, file_path: str) -> Optional[int]:
+        """Returns the vector id of a path's first chunk, or None."""
+        self._ensure_loaded()
+        ids = self.store.ids_for_path(os.path.abspath(file_path))
+        return ids[0] if ids else None
+
+
+    def get_vector_ids(self, file_path: str) -> List[int]:
+        """Returns the vector ids of all of a path's chunks, in chunk order."""
+        self._ensure_loaded()
+        return self.store.ids_for_path(os.path.abspath(file_path))
+
+
+    def changed_files(self, entries: Iterable[Tuple[str, float, int]]) -> List[str]:
+        """
+        Given (path, mtime, size) for files on disk, returns the paths that are
+        new or whose stored mtime/size differ, i.e. the ones worth re-reading.
+        Files marked unreadable (mark_unreadable) count as unchanged while
+        their mtime and size stay the same.
+        """
+        self._ensure_loaded()
+        entries = list(entries)
+        stored = self.store.first_chunks({os.path.abspath(file_path) for file_path, _, _ in entries})
+        changed = []
+        for file_path, mtime, size in entries:
+            data = stored.get(os.path.abspath(file_path))
+            if data is None or data.get('mtime') != mtime or data.get('size') != size:
+                changed.append(file_path)
+        if changed:
+            skipped = self.store.skipped_files({os.path.abspath(file_path) for file_path in changed})
+            stats = {file_path: (mtime, size) for file_path, mtime, size in entries}
+            changed = [file_path for file_path in changed
+                       if skipped.get(os.path.abspath(file_path)) != stats[file_path]]
+        return changed
+
+
+    def mark_unreadable(self, entries: Iterable[Tuple[str, float, int]]):
+        """
+        Records (path, mtime, size) of files that could not be read as text, so
+        changed_files skips them until they change. Only a cache: losing a mark
+        costs one more read, so it bypasses the log.
+        """
+        self._check_writable()
+        self._ensure_loaded()
+        self.store.mark_skipped((os.path.abspath(file_path), mtime, size) for file_path, mtime, size in entries)
+
+
+    def find_by_content(self, content) -> Optional[int]:
+        """Returns the first-chunk vector id of a document with identical content, or None."""
+        self._ensure_loaded()
+        chunks = self._as_chunks(content)
+        return self.store.id_for_hash(self.content_hash('\0'.join(c['text'] for c in chunks)))
+
+
+    def add_document(self, file_path: str, content_summary):
+        """Encodes text (or chunks), adds the vectors to the index, and saves metadata."""
+        self.add_documents([(file_path, content_summary)])
+
+
+    def update_document(self, file_path: str, content_summary) -> bool:
+        """
+        Re-embeds a file whose content changed, keeping its chunks' vector ids;
+        adds it if it is not indexed yet. Unchanged content is a no-op. Returns
+        True if written.
+        """
+        return self.add_documents([(file_path, content_summary)], replace=True) > 0
+
+
+    def remove_document(self, file_path: str) -> bool:
+        """Deletes all of a file's chunk vectors and metadata. Returns False if it was not indexed."""
+        self._check_writable()
+        self._ensure_loaded()
         abs_path = os.path.abspath(file_path)
-        
-        # Check if file is already indexed by checking the metadata paths
-        for data in self.metadata.values():
-            if data['path'] == abs_path:
-                return
+        with self._lock:
+            self.store.clear_skipped([abs_path])
+            ids = self.store.ids_for_path(abs_path)
+            if not ids:
+                return False
 
-        text_to_embed = f"Path: {abs_path}. Content Summary: {content_summary}"
-        
-        vector = self.model.encode([text_to_embed]).astype('float32')
-        
-        new_id = self.index.ntotal 
-        self.index.add(vector)
+            with self._rw.write_locked():
+                self._remove_vectors(ids)
+            self._persist({'op': 'remove', 'ids': ids})
+            self._write_metadata(deletes=ids)
 
-        self.metadata[new_id] = {'path': abs_path, 'summary': content_summary}
-        
-        self._save_index()
-        print(f"[MEMORY] Added document for '{file_path}' (Vector ID: {new_id}).")
+        print(f"[MEMORY] Removed document for '{abs_path}' ({len(ids)} chunk vectors).")
+        self._maybe_compact_dead()
+        return True
+
+
+    def add_documents(self, documents: Iterable[Tuple], batch_size: int = INGEST_BATCH_SIZE,
+                      replace: bool = False) -> int:
+        """
+        Bulk version of add_document. Takes an iterable of (path, content) pairs,
+        optionally with a third {'mtime', 'size'} file-stats dict. Content is a
+        string or a list of chunks from chunker.py; every chunk gets its own
+        vector linked to the path. Chunks are encoded ~`batch_size` at a time
+        with one model pass and one index.add per batch, and persisted once per
+        batch (with ENCODE_WORKERS > 1, one batch per encoder process goes into
+        each write). Already-indexed paths are skipped, or with `replace=True`
+        re-embedded in place when their content changed.
+        Returns the number of documents written.
+        """
+        self._check_writable()
+        self._ensure_loaded()
+        seen_paths = set()
+        added = 0
+        start = time.perf_counter()
+
+        batch: List[Tuple[str, List[Dict[str, Any]], str, Dict[str, Any]]] = []
+        batch_chunks = 0
+        stat_updates: List[Tuple[int, Dict[str, Any]]] = []
+        for document in documents:
+            file_path, content = document[0], document[1]
+            file_stats = dict(document[2]) if len(document) > 2 and document[2] else {}
+            abs_path = os.path.abspath(file_path)
+
+            # Skip paths repeated within this call
+            if abs_path in seen_paths:
+                continue
+            seen_paths.add(abs_path)
+
+            chunks = self._as_chunks(content)
+            doc_hash = self.content_hash('\0'.join(c['text'] for c in chunks))
+
+            ids = self.store.ids_for_path(abs_path)
+            if ids:
+                if not replace:
+                    continue
+                first = self.store.get(ids[0])
+                if first['doc_hash'] == doc_hash:
+                    # Same content: no re-embed, but remember the new mtime/size
+                    if file_stats and any(first.get(k) != v for k, v in file_stats.items()):
+                        rows = self.store.get_many(ids)
+                        stat_updates.extend((i, dict(rows[i], **file_stats)) for i in ids if i in rows)
+                    continue
+
+            batch.append((abs_path, chunks, doc_hash, file_stats))
+            batch_chunks += len(chunks)
+            if batch_chunks >= batch_size * ENCODE_WORKERS:  # One batch per encoder process
+                added += self._add_batch(batch, batch_size)
+                batch, batch_chunks = [], 0
+
+        if batch:
+            added += self._add_batch(batch, batch_size)
+
+        if stat_updates:
+            with self._lock:
+                self._persist({'op': 'meta', 'ids': [i for i, _ in stat_updates],
+                               'docs': [data for _, data in stat_updates]})
+                self._write_metadata(stat_updates)
+
+        if added:
+            self._maybe_upgrade_index()
+            self._maybe_compact_dead()
+
+        if added > 1:
+            elapsed = time.perf_counter() - start
+            print(f"[MEMORY] Ingested {added} documents in {elapsed:.2f}s ({added / max(elapsed, 1e-9):.1f} docs/s).")
+        return added
+
+
+    def _add_batch(self, batch: List[Tuple[str, List[Dict[str, Any]], str, Dict[str, Any]]],
+                   batch_size: int) -> int:
+        """
+        Encodes the chunks of a batch of documents, writes all vectors with a
+        single index call and persists once. A re-indexed file keeps the ids of
+        its existing chunks (chunk n reuses the old chunk n's id); chunks beyond
+        its new length are removed in the same log record.
+        """
+        texts = [embedding_text(abs_path, chunk['text']) for abs_path, chunks, _, _ in batch for chunk in chunks]
+        terms = [term_counts(f"{abs_path} {chunk['text']}") for abs_path, chunks, _, _ in batch for chunk in chunks]
+
+        vectors = self._encode(texts, batch_size)
+
+        with self._lock:
+            ids, docs, removed = [], [], []
+            updated = 0
+            for abs_path, chunks, doc_hash, file_stats in batch:
+                old_ids = self.store.ids_for_path(abs_path)
+                updated += bool(old_ids)
+                for n, chunk in enumerate(chunks):
+                    if n < len(old_ids):
+                        vec_id = old_ids[n]
+                    else:
+                        vec_id = self.next_id
+                        self.next_id += 1
+                    ids.append(vec_id)
+                    docs.append(dict(file_stats, path=abs_path, summary=chunk['text'][:SPAN_PREVIEW_CHARS],
+                                     chunk=n, start=chunk['start'], end=chunk['end'], doc_hash=doc_hash))
+                removed.extend(old_ids[len(chunks):])
+
+            with self._rw.write_locked():
+                self._upsert_vectors(ids, vectors)
+                for vec_id, doc_terms in zip(ids, terms):
+                    self.lexical.add(vec_id, doc_terms)
+                self._remove_vectors(removed)
+
+            # Log first: a metadata row must never exist without its vector being recoverable.
+            # A new row whose frame is lost is dropped by _reconcile_store, but an updated row
+            # keeps its id and would outlive it next to the old vector (SQLite's commit can
+            # reach disk first), so updates are fsynced before their rows are committed.
+            self._persist({'op': 'add', 'ids': ids, 'docs': docs, 'terms': terms, 'removed': removed}, vectors,
+                          sync=bool(updated))
+            self._write_metadata(zip(ids, docs), removed)
+
+        if len(batch) == 1:
+            verb = "Updated" if updated else "Added"
+            print(f"[MEMORY] {verb} document for '{batch[0][0]}' ({len(ids)} chunks, Vector IDs: {min(ids)}-{max(ids)}).")
+        else:
+            print(f"[MEMORY] Wrote {len(batch)} documents as {len(ids)} chunks (Vector IDs: {min(ids)}-{max(ids)}).")
+        return len(batch)
+
+
+    def _encode(self, texts: List[str], batch_size: int = INGEST_BATCH_SIZE) -> np.ndarray:
+        """Embeds texts, running the model only for texts not already in the embedding cache."""
+        cached = self.embed_cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+
+        vectors = np.empty((len(texts), self.dimension), dtype='float32')
+        if missing:
+            if ENCODE_WORKERS > 1 and len(missing) > batch_size:
+                self.embedder.start_pool(ENCODE_WORKERS)
+            fresh = self.embedder.encode([texts[i] for i in missing], batch_size=batch_size)
+            self.embed_cache.put_many([texts[i] for i in missing], fresh)
+            vectors[missing] = fresh
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                vectors[i] = vector
+        return vectors
+
+
+    def _persist(self, record: Dict[str, Any], vectors: Optional[np.ndarray] = None, sync: bool = False):
+        """Logs one mutation to the WAL (durable before returning with `sync`), or rewrites the snapshot."""
+        if self.wal is not None:
+            # Constant-cost append instead of rewriting the whole store
+            self.wal.append(record, vectors, sync=sync)
+            if self.wal.records >= CHECKPOINT_MAX_RECORDS:
+                self._checkpoint_wakeup.set()
+        else:
+            self._save_index()
+
+
+    def _upsert_vectors(self, ids: List[int], vectors: np.ndarray):
+        """Writes vectors under the given ids, replacing any vectors already stored there."""
+        self._remove_vectors(ids)
+        self.index.add_with_ids(vectors, np.asarray(ids, dtype='int64'))
+
+
+    def _remove_vectors(self, ids: List[int]):
+        """Removes vectors by id. HNSW cannot delete, so there they are counted as dead instead."""
+        try:
+            self.index.remove_ids(np.asarray(ids, dtype='int64'))
+        except RuntimeError:
+            self.dead_vectors += len(self.store.existing(ids))
+
+
+    def _write_metadata(self, upserts: Iterable[Tuple[int, Dict[str, Any]]] = (), deletes: Iterable[int] = ()):
+        """Upserts/deletes metadata rows in one transaction; deleted ids also leave the lexical index."""
+        upserts = [(vec_id, data if 'doc_hash' in data else dict(data, doc_hash=self.content_hash(data['summary'])))
+                   for vec_id, data in upserts]
+        deletes = list(deletes)
+        self.store.apply(upserts, deletes)
+        if deletes:
+            with self._rw.write_locked():
+                for vec_id in deletes:
+                    self.lexical.remove(vec_id)
+
+
+    def _maybe_compact_dead(self):
+        """Rebuilds indexes that cannot delete in place once too many vectors are stale."""
+        if self.dead_vectors and self.dead_vectors > MAX_DEAD_FRACTION * max(self.index.ntotal, 1):
+            self.rebuild_index(index_kind(self.index), storage=index_storage(self.index),
+                               rerank=index_rerank(self.index))
+
+
+    def _maybe_upgrade_index(self):
+        """
+        Migrates the index once it is big enough: a flat index to INDEX_TYPE past
+        ANN_UPGRADE_THRESHOLD, and float32 codes to VECTOR_STORAGE once there are
+        STORAGE_TRAIN_MIN vectors to train the quantizer on.
+        """
+        kind, storage = index_kind(self.index), index_storage(self.index)
+        count = self.index.ntotal
+        target_kind, target_storage = kind, storage
+        if kind == "flat" and INDEX_TYPE != "flat" and count >= ANN_UPGRADE_THRESHOLD:
+            target_kind = INDEX_TYPE
+        if storage == "float32" and VECTOR_STORAGE != "float32" and count >= STORAGE_TRAIN_MIN.get(VECTOR_STORAGE, 0):
+            target_storage = VECTOR_STORAGE
+        if (target_kind, target_storage) != (kind, storage):
+            self.rebuild_index(target_kind, storage=target_storage, rerank=RERANK_STORAGE)
+
+
+    def rebuild_index(self, kind: str = INDEX_TYPE, storage: str = VECTOR_STORAGE,
+                      rerank: Optional[str] = RERANK_STORAGE, **build_kwargs):
+        """
+        Re-creates the index as `kind` with `storage` codes (and optional `rerank`
+        copy) from the stored vectors and persists a snapshot. Vectors come from
+        the re-rank copy when there is one; otherwise compressed codes are decoded,
+        so converting back to float32 does not restore lost precision.
+        """
+        self._check_writable()
+        self._ensure_loaded()
+        start = time.perf_counter()
+        with self._lock:
+            # Writers wait for the rebuild; searches keep using the old index until the swap
+            ids, vectors = export_vectors(self.index)
+            live = np.isin(ids, np.asarray(self.store.all_ids(), dtype='int64'))
+            ids, vectors = ids[live], vectors[live]
+            if len(vectors) < STORAGE_TRAIN_MIN.get(storage, 0):
+                storage = "float32"  # Too few vectors left to train the quantizer
+            index = build_ann_index(kind, self.dimension, vectors, ids,
+                                    storage=storage, rerank=rerank, **build_kwargs)
+            with self._rw.write_locked():
+                self.index = index
+            self.dead_vectors = 0
+        print(f"[MEMORY] Rebuilt index as '{kind}' ({index_storage(self.index)} storage) over {len(vectors)} vectors "
+              f"in {time.perf_counter() - start:.2f}s.")
+        self.checkpoint()
+
+
+    def index_layout(self) -> str:
+        """Short description of the live index, e.g. 'ivf_flat/sq8+fp16' (kind/storage+rerank)."""
+        self._ensure_loaded()
+        rerank = index_rerank(self.index)
+        return f"{index_kind(self.index)}/{index_storage(self.index)}" + (f"+{rerank}" if rerank else "")
 
 
     def pre_index_files(self):
         """Indexes known files if they are not already in memory."""
+        self._check_writable()
+        self._ensure_loaded()
         known_files = [
             'meeting_notes_2025.txt', 
             'neura_log.txt'
         ]
         
         print("[INIT] Checking files for pre-indexing...")
+        documents = []
         for file_path in known_files:
             if os.path.exists(file_path):
                 abs_path = os.path.abspath(file_path)
                 
                 # Check if file is already indexed
-                is_indexed = any(data['path'] == abs_path for data in self.metadata.values())
-                
-                if not is_indexed:
+                if not self.store.ids_for_path(abs_path):
                     try:
-                        with open(file_path, 'r') as f:
-                            content = f.read(250)
-                        
-                        summary = f"Content Snippet: '{content.strip()}...'"
-                        
-                        self.add_document(abs_path, summary)
-                        print(f"[MEMORY] Pre-indexed file: {file_path}")
+                        # Whole file, streamed in overlapping chunks
+                        documents.append((abs_path, read_file_chunks(file_path)))
                     except Exception as e:
                         print(f"[MEMORY] Error reading {file_path}: {e}")
+
+        # One encode + one save for everything that needs indexing
+        if documents:
+            self.add_documents(documents)
+            for abs_path, _ in documents:
+                print(f"[MEMORY] Pre-indexed file: {os.path.basename(abs_path)}")
             
     
-    def semantic_search(self, query: str, k: int = 3) -> List[dict]:
-        """Searches the index for the top 'k' most relevant vectors."""
-        
+    def semantic_search(self, query: str, k: int = 3, nprobe: Optional[int] = None,
+                        ef_search: Optional[int] = None, mode: str = SEARCH_MODE, **filters) -> List[dict]:
+        """
+        Searches the index for the top 'k' most relevant files. `nprobe` (IVF)
+        and `ef_search` (HNSW) trade latency for recall on ANN indexes. `mode`
+        is "vector", "lexical" (BM25 only, never runs the model) or "hybrid".
+        `filters` (path_prefix, extensions, modified_after, modified_before,
+        min_size, max_size; see MetadataStore.filter_ids) restrict the search.
+        """
+        return self.semantic_search_many([query], k, nprobe=nprobe, ef_search=ef_search, mode=mode, **filters)[0]
+
+
+    def semantic_search_many(self, queries: List[str], k: int = 3, nprobe: Optional[int] = None,
+                             ef_search: Optional[int] = None, mode: str = SEARCH_MODE,
+                             **filters) -> List[List[dict]]:
+        """
+        Runs several queries at once: one model pass for all uncached queries and
+        a single FAISS search over the whole query matrix. Chunk hits are folded
+        per file: each result is a file with its best-scoring chunk as 'summary'
+        and that chunk's character offsets as 'span'. In "hybrid" mode the vector
+        and BM25 rankings are merged by reciprocal-rank fusion and 'score' is the
+        fused score. Filters are resolved to vector ids through the metadata
+        indexes and applied inside the search (an id selector), so only matching
+        files are ever scored. Returns one result list per query, in order.
+        """
+        if mode not in ("vector", "lexical", "hybrid"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        self._ensure_loaded()
+        if self.read_only:
+            self._maybe_remap()
         if self.index.ntotal == 0:
-            return [{"warning": "No documents indexed in Neura's long-term memory."}]
-            
-        print(f"[MEMORY] Searching index for '{query}'...")
-        
-        query_vector = self.model.encode([query]).astype('float32')
-        
-        D, I = self.index.search(query_vector, k)
-        
+            return [[{"warning": "No documents indexed in Neura's long-term memory."}] for _ in queries]
+        if not queries:
+            return []
+
+        selection = self._select(filters)
+        scope = f" within {filters}" if selection is not None else ""
+        target = repr(queries[0]) if len(queries) == 1 else f"{len(queries)} queries (first: {queries[0]!r:.80})"
+        print(f"[MEMORY] Searching index ({mode}) for {target}{scope}...")
+        if selection is not None and not len(selection[0]):
+            return [[] for _ in queries]
+
+        if mode == "lexical":
+            return [self._lexical_search(query, k, selection) for query in queries]
+        if mode == "vector":
+            return self._vector_search(queries, k, nprobe, ef_search, selection)
+
+        depth = k * HYBRID_CANDIDATES
+        dense = self._vector_search(queries, depth, nprobe, ef_search, selection)
+        return [self._fuse([ranking, self._lexical_search(query, depth, selection)], k)
+                for query, ranking in zip(queries, dense)]
+
+
+    def _select(self, filters: Dict[str, Any]) -> Optional[Tuple[np.ndarray, Any]]:
+        """
+        Resolves search filters to (sorted matching ids, id selector), or None
+        when no filter is set. Cached until the metadata store changes.
+        """
+        filters = {name: value for name, value in filters.items() if value not in (None, "", [], ())}
+        if not filters:
+            return None
+        prefix = filters.get('path_prefix')
+        if prefix:
+            # Stored paths are absolute; a trailing separator keeps 'src/' from matching 'src2'
+            trailing = prefix.endswith(('/', os.sep))
+            prefix = os.path.abspath(os.path.expanduser(prefix))
+            filters['path_prefix'] = prefix + os.sep if trailing and not prefix.endswith(os.sep) else prefix
+        if isinstance(filters.get('extensions'), str):
+            filters['extensions'] = [filters['extensions']]
+        if 'extensions' in filters:
+            filters['extensions'] = tuple(sorted(filters['extensions']))
+
+        key = (tuple(sorted(filters.items())), self.store.data_version())
+        with self._query_lock:
+            cached = self._filter_cache.get(key)
+            if cached is not None:
+                self._filter_cache.move_to_end(key)
+                return cached
+        ids = self.store.filter_ids(**filters)
+        selection = (ids, id_selector(ids))
+        with self._query_lock:
+            self._filter_cache[key] = selection
+            while len(self._filter_cache) > FILTER_CACHE_SIZE:
+                self._filter_cache.popitem(last=False)
+        return selection
+
+
+    def _vector_search(self, queries: List[str], k: int, nprobe: Optional[int], ef_search: Optional[int],
+                       selection: Optional[Tuple[np.ndarray, Any]] = None) -> List[List[dict]]:
+        """Dense retrieval, folded to at most k files per query and limited to `selection` if given."""
+        query_vectors = self._encode_queries(queries)
+        index = self.index  # One index throughout, even if a read-only core re-maps meanwhile
+        allowed, selector = selection if selection is not None else (None, None)
+        limit = index.ntotal if allowed is None else len(allowed)
+        base = _base_index(index)
+        nlist = base.nlist if isinstance(base, faiss.IndexIVF) else 0
+        nprobe = nprobe or DEFAULT_NPROBE
+
+        # Several chunks of one file can rank high; fetch extra so k files remain,
+        # and widen the search if folding still leaves fewer than k
+        fetch = k * CHUNK_OVERFETCH
+        while True:
+            with self._rw.read_locked():
+                if allowed is not None and not supports_selector(index):
+                    D, I = subset_search(index, query_vectors, allowed, fetch)
+                else:
+                    D, I = index.search(query_vectors, fetch,
+                                        params=search_params(index, nprobe, ef_search, selector))
+            all_results = [self._fold_hits(D[row], I[row], k) for row in range(len(queries))]
+            # With a filter, the probed IVF cells may hold too few matches: probe more cells as well
+            probe_more = allowed is not None and nprobe < nlist
+            if all(len(results) >= k for results in all_results) or (fetch >= limit and not probe_more):
+                return all_results
+            fetch *= CHUNK_OVERFETCH
+            if probe_more:
+                nprobe = min(nlist, nprobe * CHUNK_OVERFETCH)
+
+
+    def _lexical_search(self, query: str, k: int,
+                        selection: Optional[Tuple[np.ndarray, Any]] = None) -> List[dict]:
+        """BM25 retrieval over chunks (within `selection` if given), folded to at most k files. No embedding."""
+        with self._rw.read_locked():
+            scores = self.lexical.scores(query)
+        if selection is not None:
+            doc_ids = np.fromiter(scores, dtype='int64', count=len(scores))
+            scores = {int(doc_id): scores[int(doc_id)] for doc_id in doc_ids[np.isin(doc_ids, selection[0])]}
+        fetch = k * CHUNK_OVERFETCH
+        while True:
+            top = heapq.nlargest(fetch, scores.items(), key=lambda item: item[1])
+            results = self._fold_hits([score for _, score in top], [doc_id for doc_id, _ in top], k)
+            if len(results) >= k or fetch >= len(scores):
+                return results
+            fetch *= CHUNK_OVERFETCH
+
+
+    @staticmethod
+    def _fuse(rankings: List[List[dict]], k: int) -> List[dict]:
+        """
+        Reciprocal-rank fusion of per-file rankings. Each file keeps the result
+        (and span) from the ranking that placed it highest.
+        """
+        fused: Dict[str, dict] = {}
+        best_rank: Dict[str, int] = {}
+        for ranking in rankings:
+            for result in ranking:
+                path = result['path']
+                bonus = 1.0 / (RRF_K + result['rank'])
+                if path not in fused:
+                    fused[path] = dict(result, score=bonus)
+                    best_rank[path] = result['rank']
+                    continue
+                score = fused[path]['score'] + bonus
+                if result['rank'] < best_rank[path]:
+                    fused[path] = dict(result)
+                    best_rank[path] = result['rank']
+                fused[path]['score'] = score
+
+        results = sorted(fused.values(), key=lambda r: r['score'], reverse=True)[:k]
+        for rank, result in enumerate(results, 1):
+            result['rank'] = rank
+        return results
+
+
+    def _fold_hits(self, scores: np.ndarray, ids: np.ndarray, k: int) -> List[dict]:
+        """Collapses chunk hits (best first) into at most k per-file results, fetching only their rows."""
+        rows = self.store.get_many(int(index_id) for index_id in ids if index_id >= 0)
         results = []
-        for rank, index_id in enumerate(I[0]):
-            if index_id >= 0 and index_id in self.metadata:
-                results.append({
-                    'rank': rank + 1,
-                    'path': self.metadata[index_id]['path'],
-                    'summary': self.metadata[index_id]['summary'],
-                    'score': float(D[0][rank])
-                })
-                
-        return results
\ No newline at end of file
+        seen = set()
+        for score, index_id in zip(scores, ids):
+            data = rows.get(int(index_id))
+            # The first chunk seen for a file is its best-matching span
+            if data is None or data['path'] in seen:
+                continue
+            seen.add(data['path'])
+            results.append({
+                'rank': len(results) + 1,
+                'path': data['path'],
+                'summary': data['summary'],
+                'span': [data.get('start', 0), data.get('end', len(data['summary']))],
+                'score': float(score)
+            })
+            if len(results) >= k:
+                break
+        return results
+
+
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Query vectors from the in-memory LRU; the rest are encoded together in one pass."""
+        vectors = np.empty((len(queries), self.dimension), dtype='float32')
+        missing = []
+        with self._query_lock:
+            for row, query in enumerate(queries):
+                vector = self.query_cache.get(query)
+                if vector is None:
+                    missing.append(row)
+                else:
+                    self.query_cache.move_to_end(query)
+                    vectors[row] = vector
+
+        if missing:
+            unique = list(dict.fromkeys(queries[row] for row in missing))
+            fresh = dict(zip(unique, self._encode(unique)))
+            with self._query_lock:
+                for query, vector in fresh.items():
+                    self.query_cache[query] = vector
+                    self.query_cache.move_to_end(query)
+                while len(self.query_cache) > QUERY_CACHE_SIZE:
+                    self.query_cache.popitem(last=False)
+            for row in missing:
+                vectors[row] = fresh[queries[row]]
+        return vectors
+
+
+_IMPORT_SECONDS = time.perf_counter() - _MODULE_START
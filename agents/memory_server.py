@@ -0,0 +1,161 @@
+#pipeline: one shared MemoryCore per machine, served to the agent and the file watcher over a local socket
+#usage: python memory_server.py   (clients in memory_client.py start it on demand)
+
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import threading
+import socketserver
+from typing import Any, Dict
+
+import event_bus
+
+# --- Configuration ---
+# Unix socket where available, localhost TCP otherwise (e.g. Windows)
+SOCKET_PATH = os.environ.get("NEURA_MEMORY_SOCKET", "neura_memory.sock")
+TCP_ADDRESS = ("127.0.0.1", int(os.environ.get("NEURA_MEMORY_PORT", "5002")))
+USE_UNIX_SOCKET = hasattr(socket, "AF_UNIX")
+
+# RPCs the server accepts; MemoryCore synchronizes them itself (see its readers-writer lock)
+READ_METHODS = {"semantic_search", "semantic_search_many", "is_indexed", "get_vector_id", "get_vector_ids",
+                "changed_files", "stats", "ping"}
+WRITE_METHODS = {"add_documents", "update_document", "remove_document", "mark_unreadable", "pre_index_files",
+                 "checkpoint"}
+STATS_EVENT_INTERVAL = 2.0  # Seconds between memory.stats events while writes keep coming (see event_bus.py)
+# --- End Configuration ---
+
+
+class MemoryService:
+    """Dispatches RPCs onto the single MemoryCore owned by this process."""
+
+    def __init__(self, memory):
+        self.memory = memory
+        self._changed = threading.Event()
+
+    def call(self, method: str, params: Dict[str, Any]) -> Any:
+        # No RPC-wide lock: a write only excludes searches while it touches the
+        # in-memory index, not while it embeds or persists
+        if method in READ_METHODS:
+            return self._dispatch(method, params)
+        if method in WRITE_METHODS:
+            try:
+                return self._dispatch(method, params)
+            finally:
+                self._changed.set()
+        raise ValueError(f"Unknown method: {method}")
+
+    def stats(self) -> Dict[str, Any]:
+        self.memory._ensure_loaded()
+        return {
+            "documents": self.memory.store.count_paths(),
+            "chunks": self.memory.store.count(),
+            "vectors": self.memory.index.ntotal,
+            "index": self.memory.index_layout(),
+            "embedding_cache": self.memory.embed_cache.stats(),
+            "embedding": {"backend": self.memory.embedder.name, "space": self.memory.embedding_space},
+            "startup": self.memory.startup_report(),
+        }
+
+    def publish_stats(self, interval: float = STATS_EVENT_INTERVAL):
+        """Publishes memory.stats once loaded, then at most every `interval` seconds after writes."""
+        while True:
+            try:
+                event_bus.publish("memory.stats", **self.stats())
+            except Exception as e:
+                print(f"[MEMORY SERVER] Stats event failed: {type(e).__name__}: {e}")
+            self._changed.wait()
+            time.sleep(interval)  # Coalesces the writes of a burst into one event
+            self._changed.clear()
+
+    def _dispatch(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "ping":
+            return {"pid": os.getpid()}
+        if method == "stats":
+            return self.stats()
+        if method == "add_documents":
+            params = dict(params, documents=[tuple(doc) for doc in params["documents"]])
+        return getattr(self.memory, method)(**params)
+
+
+class MemoryRequestHandler(socketserver.StreamRequestHandler):
+    """One connection = a stream of newline-delimited JSON requests and responses."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            request_id = None
+            try:
+                request = json.loads(line)
+                request_id = request.get("id")
+                result = self.server.service.call(request["method"], request.get("params") or {})
+                response = {"id": request_id, "result": result}
+            except Exception as e:
+                response = {"id": request_id, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+if USE_UNIX_SOCKET:
+    class MemoryServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    class MemoryServer(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+
+def server_address():
+    return SOCKET_PATH if USE_UNIX_SOCKET else TCP_ADDRESS
+
+
+def is_server_alive() -> bool:
+    family = socket.AF_UNIX if USE_UNIX_SOCKET else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as probe:
+        probe.settimeout(1.0)
+        try:
+            probe.connect(server_address())
+            return True
+        except OSError:
+            return False
+
+
+def serve():
+    if USE_UNIX_SOCKET and os.path.exists(SOCKET_PATH):
+        if is_server_alive():
+            print(f"[MEMORY SERVER] Already running on {SOCKET_PATH}.")
+            return
+        os.remove(SOCKET_PATH)  # Stale socket from a crashed server
+
+    # Imported here so clients can import this module without loading FAISS
+    from memory_core import MemoryCore
+    memory = MemoryCore(warm_up=True)
+    server = MemoryServer(server_address(), MemoryRequestHandler)
+    server.service = MemoryService(memory)
+
+    # Store size and layout for the frontend's event stream (via the API server, if it runs)
+    event_bus.forward_to_api("memory_server")
+    threading.Thread(target=server.service.publish_stats, name="neura-memory-stats", daemon=True).start()
+
+    def _shutdown(*_):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    print(f"[MEMORY SERVER] Serving Neura memory on {server_address()} (pid {os.getpid()}).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        memory.close()
+        if USE_UNIX_SOCKET and os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)
+        print("[MEMORY SERVER] Shut down.")
+
+
+if __name__ == "__main__":
+    sys.exit(serve())
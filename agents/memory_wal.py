@@ -0,0 +1,198 @@
+#pipeline: append-only write-ahead log that makes MemoryCore writes incremental and crash-safe
+
+import os
+import json
+import time
+import zlib
+import struct
+import threading
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# --- Configuration Constants ---
+WAL_FILE = "neura_memory.wal"
+FSYNC_BATCH = 8         # fsync after this many appended frames...
+FSYNC_INTERVAL = 1.0    # ...or once this many seconds have passed since the last fsync
+SWAP_FILE = "neura_memory.swap"  # Plan of a multi-file swap in progress (see swap_in)
+# -------------------------------
+
+# Frame layout: [payload length][crc32(payload)][payload]
+# Payload layout: [json length][json record][raw float32 vectors]
+_FRAME_HEADER = struct.Struct('<II')
+_JSON_HEADER = struct.Struct('<I')
+
+
+def fsync_dir(path: str):
+    """Flushes a directory entry so renames inside it survive a crash (no-op where unsupported)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def swap_in(renames: List[Tuple[str, str]], removes: List[str] = (), plan_path: str = SWAP_FILE):
+    """
+    Replaces several store files as one step. The plan (files to remove, then
+    staged files to rename into place) is made durable first, so a crash
+    half-way through is rolled forward by finish_swap on the next load.
+    """
+    tmp_path = plan_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'remove': list(removes), 'rename': [list(pair) for pair in renames]}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, plan_path)
+    fsync_dir(plan_path)
+    finish_swap(plan_path)
+
+
+def finish_swap(plan_path: str = SWAP_FILE) -> bool:
+    """Completes a pending swap_in plan (safe to repeat). Returns True if there was one."""
+    try:
+        with open(plan_path, 'r') as f:
+            plan = json.load(f)
+    except FileNotFoundError:
+        return False
+    for path in plan['remove']:
+        if os.path.exists(path):
+            os.remove(path)
+    for staged, target in plan['rename']:
+        if os.path.exists(staged):  # Already renamed if a previous attempt got this far
+            os.replace(staged, target)
+    fsync_dir(plan_path)
+    os.remove(plan_path)
+    fsync_dir(plan_path)
+    return True
+
+
+class MemoryWAL:
+    """
+    Append-only log of MemoryCore mutations. Each frame is checksummed, so a
+    torn write at the tail (crash mid-append) is detected and dropped on replay.
+    """
+
+    def __init__(self, path: str = WAL_FILE, fsync_batch: int = FSYNC_BATCH,
+                 fsync_interval: float = FSYNC_INTERVAL):
+        self.path = path
+        self.old_path = path + ".old"
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'ab')
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self.records = 0  # Frames appended since the last rotation
+
+
+    def append(self, record: Dict[str, Any], vectors: Optional[np.ndarray] = None, sync: bool = False):
+        """Appends one record (plus its vectors) and fsyncs in batches, or at once with `sync`."""
+        meta = json.dumps(record).encode('utf-8')
+        body = np.ascontiguousarray(vectors, dtype='float32').tobytes() if vectors is not None else b''
+        payload = _JSON_HEADER.pack(len(meta)) + meta + body
+        frame = _FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        with self._lock:
+            self._file.write(frame)
+            self._file.flush()
+            self._pending += 1
+            self.records += 1
+            if (sync or self._pending >= self.fsync_batch
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._fsync()
+
+
+    def sync(self):
+        """Forces any buffered frames to stable storage."""
+        with self._lock:
+            if self._pending:
+                self._fsync()
+
+
+    def _fsync(self):
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+
+    def rotate(self) -> str:
+        """
+        Moves the live log aside so a checkpoint can fold it into a snapshot
+        while new writes keep going to a fresh log. Returns the rotated path.
+        """
+        with self._lock:
+            self._file.flush()
+            self._fsync()
+            self._file.close()
+
+            if os.path.exists(self.old_path):
+                # A previous checkpoint did not finish: keep both segments, in order
+                with open(self.old_path, 'ab') as old, open(self.path, 'rb') as live:
+                    old.write(live.read())
+                    old.flush()
+                    os.fsync(old.fileno())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.old_path)
+            fsync_dir(self.path)
+
+            self._file = open(self.path, 'ab')
+            self.records = 0
+            return self.old_path
+
+
+    def discard(self, rotated_path: str):
+        """Deletes a rotated segment once the snapshot containing it is durable."""
+        if os.path.exists(rotated_path):
+            os.remove(rotated_path)
+            fsync_dir(rotated_path)
+
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._fsync()
+                self._file.close()
+
+
+    @staticmethod
+    def read_frames(path: str, dimension: int) -> Iterator[Tuple[Dict[str, Any], Optional[np.ndarray]]]:
+        """
+        Yields (record, vectors) from a log file in append order. Stops at the
+        first truncated or corrupt frame and cuts the file back to the last good one.
+        """
+        if not os.path.exists(path):
+            return
+
+        good_offset = 0
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(_FRAME_HEADER.size)
+                if len(header) < _FRAME_HEADER.size:
+                    break
+                length, crc = _FRAME_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+
+                (meta_len,) = _JSON_HEADER.unpack_from(payload)
+                meta_end = _JSON_HEADER.size + meta_len
+                record = json.loads(payload[_JSON_HEADER.size:meta_end].decode('utf-8'))
+                body = payload[meta_end:]
+                vectors = np.frombuffer(body, dtype='float32').reshape(-1, dimension) if body else None
+
+                good_offset = f.tell()
+                yield record, vectors
+
+        if good_offset < os.path.getsize(path):
+            print(f"[MEMORY] Dropping torn tail of {path} at byte {good_offset}.")
+            with open(path, 'r+b') as f:
+                f.truncate(good_offset)
+                os.fsync(f.fileno())
@@ -0,0 +1,339 @@
+#pipeline: SQLite-backed metadata for Neura's vectors (one row per chunk vector)
+
+import os
+import json
+import sqlite3
+import threading
+import urllib.request
+import numpy as np
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# --- Configuration ---
+METADATA_DB = "neura_metadata.db"
+LEGACY_METADATA_FILE = "neura_metadata.txt"  # Pre-SQLite text format, migrated once on first open
+LOOKUP_CHUNK = 500  # Ids/paths per IN (...) query (stays under SQLite's bound-parameter limit)
+# --------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id         INTEGER PRIMARY KEY,
+    path       TEXT    NOT NULL,
+    chunk      INTEGER NOT NULL DEFAULT 0,
+    span_start INTEGER NOT NULL DEFAULT 0,
+    span_end   INTEGER NOT NULL DEFAULT 0,
+    summary    TEXT    NOT NULL DEFAULT '',
+    doc_hash   TEXT    NOT NULL,
+    mtime      REAL,
+    size       INTEGER,
+    ext        TEXT    NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS documents_path ON documents (path, chunk);
+CREATE INDEX IF NOT EXISTS documents_hash ON documents (doc_hash);
+CREATE INDEX IF NOT EXISTS documents_mtime ON documents (mtime);
+CREATE TABLE IF NOT EXISTS store_info (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS skipped_files (
+    path  TEXT PRIMARY KEY,
+    mtime REAL    NOT NULL,
+    size  INTEGER NOT NULL
+);
+"""
+
+# Created after the ext column is known to exist (older databases gain it in _migrate_schema)
+_FILTER_INDEXES = """
+CREATE INDEX IF NOT EXISTS documents_ext ON documents (ext);
+CREATE INDEX IF NOT EXISTS documents_size ON documents (size);
+"""
+
+_COLUMNS = "id, path, chunk, span_start, span_end, summary, doc_hash, mtime, size"
+
+
+def _row_to_entry(row: Tuple) -> Tuple[int, Dict[str, Any]]:
+    vec_id, path, chunk, start, end, summary, doc_hash, mtime, size = row
+    data = {'path': path, 'summary': summary, 'chunk': chunk, 'start': start, 'end': end, 'doc_hash': doc_hash}
+    if mtime is not None:
+        data['mtime'] = mtime
+        data['size'] = size
+    return vec_id, data
+
+
+def file_extension(path: str) -> str:
+    """Lower-cased extension with its dot ('.py'), as stored in the ext column; '' if none."""
+    return os.path.splitext(path)[1].lower()
+
+
+def _entry_to_row(vec_id: int, data: Dict[str, Any]) -> Tuple:
+    return (vec_id, data['path'], data.get('chunk', 0), data.get('start', 0),
+            data.get('end', len(data['summary'])), data['summary'], data['doc_hash'],
+            data.get('mtime'), data.get('size'), file_extension(data['path']))
+
+
+def _chunks(items: List, size: int = LOOKUP_CHUNK) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def parse_legacy_metadata(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Reads the old pipe-delimited metadata file: `id|{json}`, `id|path|mtime|size|summary`
+    or `id|path|summary` lines. A line that does not start with an id continues
+    the previous entry's summary (older writers did not escape newlines).
+    """
+    pending: Optional[Tuple[int, Dict[str, Any]]] = None
+    continues = False  # JSON lines are complete; the older formats may wrap
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            idx_str, _, rest = line.partition('|')
+            if not idx_str.isdigit() or not rest:
+                if pending is not None and continues:
+                    pending[1]['summary'] += '\n' + line
+                continue
+
+            if pending is not None:
+                yield pending
+            pending, continues = None, True
+            if rest.startswith('{'):
+                try:
+                    pending, continues = (int(idx_str), json.loads(rest)), False
+                    continue
+                except ValueError:
+                    pass
+            parts = rest.split('|', 3)
+            if len(parts) == 4:
+                try:
+                    pending = (int(idx_str), {'path': parts[0], 'summary': parts[3],
+                                              'mtime': float(parts[1]), 'size': int(parts[2])})
+                    continue
+                except ValueError:
+                    pass
+            path_part, sep, summary = rest.partition('|')
+            if sep:
+                pending = (int(idx_str), {'path': path_part, 'summary': summary})
+    if pending is not None:
+        yield pending
+
+
+class MetadataStore:
+    """
+    Per-vector metadata in SQLite (WAL journal), indexed by id, path, content
+    hash, mtime, extension and size. Rows are upserted individually and fetched on demand, so
+    nothing has to be held in memory. One connection is shared behind a lock.
+    With `read_only=True` the database is opened for queries only (it must exist).
+    """
+
+    def __init__(self, path: str = METADATA_DB, read_only: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0  # Own commits; PRAGMA data_version only reflects other connections'
+        if read_only:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No metadata database at {path}")
+            uri = "file:" + urllib.request.pathname2url(os.path.abspath(path)) + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+            return
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; the vector WAL covers the rest
+        self._conn.executescript(_SCHEMA)
+        self._migrate_schema()
+        self._conn.executescript(_FILTER_INDEXES)
+
+    def _migrate_schema(self):
+        """Adds columns introduced after a database was created, back-filling them."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        if 'ext' not in columns:
+            self._conn.execute("ALTER TABLE documents ADD COLUMN ext TEXT NOT NULL DEFAULT ''")
+            rows = [(file_extension(path), vec_id)
+                    for vec_id, path in self._conn.execute("SELECT id, path FROM documents")]
+            self._conn.execute("BEGIN")
+            self._conn.executemany("UPDATE documents SET ext = ? WHERE id = ?", rows)
+            self._conn.execute("COMMIT")
+
+    # --- Writes ---
+    def apply(self, upserts: Iterable[Tuple[int, Dict[str, Any]]] = (), deletes: Iterable[int] = ()):
+        """Upserts and deletes rows in one transaction."""
+        rows = [_entry_to_row(vec_id, data) for vec_id, data in upserts]
+        deletes = [(int(vec_id),) for vec_id in deletes]
+        if not rows and not deletes:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if rows:
+                    self._conn.executemany(f"INSERT OR REPLACE INTO documents ({_COLUMNS}, ext) "
+                                           f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                if deletes:
+                    self._conn.executemany("DELETE FROM documents WHERE id = ?", deletes)
+                self._conn.execute("COMMIT")
+                self._writes += 1
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def set_info(self, key: str, value: str):
+        """Stores one store-wide setting (e.g. the embedding space of the vectors)."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO store_info (key, value) VALUES (?, ?)", (key, value))
+            self._writes += 1
+
+    def mark_skipped(self, entries: Iterable[Tuple[str, float, int]]):
+        """Records (path, mtime, size) of files that could not be indexed (e.g. binary), so crawls skip them."""
+        rows = [(path, float(mtime), int(size)) for path, mtime, size in entries]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO skipped_files (path, mtime, size) VALUES (?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+            self._writes += 1
+
+    def clear_skipped(self, paths: Iterable[str]):
+        paths = [(path,) for path in paths]
+        with self._lock:
+            self._conn.executemany("DELETE FROM skipped_files WHERE path = ?", paths)
+
+    def sync(self):
+        """Folds SQLite's own WAL into the database file (fsynced), e.g. before the vector log is discarded."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    # --- End Writes ---
+
+
+    # --- Reads ---
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get(self, vec_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._query(f"SELECT {_COLUMNS} FROM documents WHERE id = ?", (int(vec_id),))
+        return _row_to_entry(rows[0])[1] if rows else None
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Rows for the given ids (missing ids are left out)."""
+        found = {}
+        for part in _chunks([int(i) for i in ids]):
+            marks = ",".join("?" * len(part))
+            for row in self._query(f"SELECT {_COLUMNS} FROM documents WHERE id IN ({marks})", tuple(part)):
+                vec_id, data = _row_to_entry(row)
+                found[vec_id] = data
+        return found
+
+    def ids_for_path(self, path: str) -> List[int]:
+        """Vector ids of a path's chunks, in chunk order."""
+        return [row[0] for row in self._query("SELECT id FROM documents WHERE path = ? ORDER BY chunk, id", (path,))]
+
+    def first_chunks(self, paths: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """The first-chunk row of each indexed path (carries the file's stats and document hash)."""
+        found = {}
+        for part in _chunks(list(paths)):
+            marks = ",".join("?" * len(part))
+            rows = self._query(f"SELECT {_COLUMNS} FROM documents WHERE path IN ({marks}) AND chunk = 0",
+                               tuple(part))
+            for row in rows:
+                _, data = _row_to_entry(row)
+                found[data['path']] = data
+        return found
+
+    def skipped_files(self, paths: Iterable[str]) -> Dict[str, Tuple[float, int]]:
+        """path -> (mtime, size) for the given paths that were marked unreadable."""
+        found = {}
+        for part in _chunks(list(paths)):
+            marks = ",".join("?" * len(part))
+            try:
+                rows = self._query(f"SELECT path, mtime, size FROM skipped_files WHERE path IN ({marks})",
+                                   tuple(part))
+            except sqlite3.OperationalError:
+                return {}  # Read-only view of a database created before the table existed
+            found.update((path, (mtime, size)) for path, mtime, size in rows)
+        return found
+
+    def id_for_hash(self, doc_hash: str) -> Optional[int]:
+        rows = self._query("SELECT id FROM documents WHERE doc_hash = ? ORDER BY chunk, id LIMIT 1", (doc_hash,))
+        return rows[0][0] if rows else None
+
+    def existing(self, ids: Iterable[int]) -> List[int]:
+        return list(self.get_many(ids))
+
+    def all_ids(self) -> List[int]:
+        return [row[0] for row in self._query("SELECT id FROM documents")]
+
+    def iter_entries(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        for row in self._query(f"SELECT {_COLUMNS} FROM documents"):
+            yield _row_to_entry(row)
+
+    def count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM documents")[0][0]
+
+    def count_paths(self) -> int:
+        return self._query("SELECT COUNT(DISTINCT path) FROM documents")[0][0]
+
+    def max_id(self) -> int:
+        return self._query("SELECT COALESCE(MAX(id), -1) FROM documents")[0][0]
+
+    def get_info(self, key: str) -> Optional[str]:
+        try:
+            rows = self._query("SELECT value FROM store_info WHERE key = ?", (key,))
+        except sqlite3.OperationalError:
+            return None  # Read-only view of a database created before the table existed
+        return rows[0][0] if rows else None
+
+    def data_version(self) -> Tuple[int, int]:
+        """Changes whenever any connection (this one or another process's) commits."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0], self._writes
+
+    def filter_ids(self, path_prefix: Optional[str] = None, extensions: Optional[Iterable[str]] = None,
+                   modified_after: Optional[float] = None, modified_before: Optional[float] = None,
+                   min_size: Optional[int] = None, max_size: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        Sorted ids of the rows matching every given filter, or None if no filter
+        is set. `path_prefix` is a plain string prefix of the stored (absolute)
+        path, `extensions` match case-insensitively with or without the dot,
+        and the mtime (epoch seconds) and size (bytes) bounds are inclusive.
+        """
+        clauses, params = [], []
+        if path_prefix:
+            # Range scan on the path index ('\U0010ffff' sorts after any character)
+            clauses.append("path >= ? AND path < ?")
+            params += [path_prefix, path_prefix + '\U0010ffff']
+        if extensions:
+            exts = sorted({'.' * (not e.startswith('.')) + e.lower() for e in extensions})
+            clauses.append(f"ext IN ({','.join('?' * len(exts))})")
+            params += exts
+        for column, op, value in (("mtime", ">=", modified_after), ("mtime", "<=", modified_before),
+                                  ("size", ">=", min_size), ("size", "<=", max_size)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        if not clauses:
+            return None
+        rows = self._query(f"SELECT id FROM documents WHERE {' AND '.join(clauses)}", tuple(params))
+        return np.sort(np.fromiter((row[0] for row in rows), dtype='int64', count=len(rows)))
+    # --- End Reads ---
+
+
+    def migrate_legacy(self, legacy_path: str, content_hash) -> int:
+        """
+        One-time import of the old text metadata file. The file is renamed to
+        `<name>.migrated` afterwards so it is never imported twice.
+        Returns the number of rows imported.
+        """
+        if not os.path.exists(legacy_path):
+            return 0
+        imported = 0
+        if not self.count():
+            entries = []
+            for vec_id, data in parse_legacy_metadata(legacy_path):
+                data.setdefault('doc_hash', content_hash(data['summary']))
+                entries.append((vec_id, data))
+            self.apply(entries)
+            imported = len(entries)
+        os.replace(legacy_path, legacy_path + ".migrated")
+        return imported
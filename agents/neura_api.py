@@ -1,17 +1,26 @@
-import speech_recognition as sr
-import pyttsx3
-import requests
 import time
 import sys
 import json
 import os
 import io
+import queue
+import threading
 import contextlib # Used to capture print() statements from exec()
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import event_bus
+import llm_client
+from action_stream import ActionStreamParser, CodeChecker, SentenceSplitter
+# speech_recognition and pyttsx3 are imported where they are used, so the API
+# server (neura_server.py) can use the agent functions on machines without audio
 
 # --- Configuration ---
-FIREWORK_API_URL = "https://api.fireworks.ai/inference/v1/chat/completions"
+FIREWORK_API_URL = os.environ.get("NEURA_LLM_URL", "https://api.fireworks.ai/inference/v1/chat/completions")
 FIREWORK_API_KEY = os.environ.get("FIREWORKS_API_KEY") 
 FIREWORK_MODEL = "accounts/fireworks/sitee/sitee-0.0.7" # sitee LLM (private linkage might now work for you)
+# Stream the completion and act on the action while it arrives (see get_ai_action); "0" waits for all of it
+LLM_STREAM = os.environ.get("NEURA_LLM_STREAM", "1") == "1"
+LLM_DEADLINE = 60.0  # Seconds for a whole call, retries included (llm_client.py)
 
 # --- NEW: General-Purpose Agent System Prompt ---
 SYSTEM_PROMPT = """
@@ -68,9 +77,45 @@ Now, process the user's command.
 """
 
 # --- Text-to-Speech (TTS) Function ---
-def speak(text: str):
-    """Speaks the given text using pyttsx3."""
+class _Speaker:
+    """
+    Speaks queued text in order on one background thread, so the LLM stream
+    keeps being read while a sentence plays (see get_ai_action's on_sentence).
+    say() returns at once with an Event that is set once the text was spoken.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[Optional[str], Optional[str], threading.Event]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def say(self, text: Optional[str]) -> threading.Event:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="neura-tts", daemon=True)
+                self._thread.start()
+        done = threading.Event()
+        self._queue.put((text, event_bus.current_job(), done))
+        return done
+
+    def _run(self):
+        while True:
+            text, job_id, done = self._queue.get()
+            try:
+                if text:
+                    with event_bus.job_context(job_id):
+                        _say_now(text)
+            finally:
+                done.set()
+
+
+_SPEAKER = _Speaker()
+
+
+def _say_now(text: str):
+    event_bus.publish("tts.say", text=text)
     try:
+        import pyttsx3
         engine = pyttsx3.init() 
         engine.setProperty('rate', 210)
         engine.say(text)
@@ -78,76 +123,205 @@ def speak(text: str):
     except Exception as e:
         print(f"[TTS ERROR] {e}")
 
+
+def speak(text: str):
+    """Speaks the given text using pyttsx3 (after anything queued before it); returns when it was spoken."""
+    _SPEAKER.say(text).wait()
+
+
+def speak_later(text: str):
+    """Queues the text to be spoken and returns at once (for sentences arriving while the LLM streams)."""
+    _SPEAKER.say(text)
+
+
+def wait_for_speech():
+    """Returns once everything queued so far has been spoken."""
+    _SPEAKER.say(None).wait()
+
 # --- Speech-to-Text (STT) Function ---
 def take_command():
     """Listens for a command and converts it to text."""
+    import speech_recognition as sr
     r = sr.Recognizer()
     with sr.Microphone() as source:
         print("[STT] Calibrating...")
+        event_bus.publish("stt.calibrating")
         r.adjust_for_ambient_noise(source, duration=1.0) 
         speak("Listening...") 
         
         try:
             r.pause_threshold = 1.1  
             r.energy_threshold = 450 
+            event_bus.publish("stt.listening")
             audio = r.listen(source, timeout=5, phrase_time_limit=5) 
         except sr.WaitTimeoutError:
             print("[STT] Timeout.")
+            event_bus.publish("stt.timeout")
             return "" 
 
+    # The Google recognizer only answers for the whole phrase, so "recognizing" is the last step before the text
+    event_bus.publish("stt.recognizing",
+                      audio_seconds=len(audio.frame_data) / (audio.sample_rate * audio.sample_width))
     try:
         command = r.recognize_google(audio).lower()
         print(f"[STT] User said: {command}")
+        event_bus.publish("stt.final", text=command)
         return command
     except sr.UnknownValueError:
+        event_bus.publish("stt.final", text="")
         speak("Sorry, I didn't catch that.")
         return ""
     except Exception as e:
         print(f"[STT ERROR] {e}")
+        event_bus.publish("stt.error", error=str(e))
         return ""
 
 # --- NEW: Code Execution Function ---
-def execute_python_code(code_to_run: str):
+class _ThreadStdout:
     """
-    Executes the string of Python code.
-    Captures stdout and stderr and speaks them.
+    sys.stdout stand-in that sends each thread's output to its own buffer while
+    capture_output() is active in that thread, and to the real stdout otherwise.
+    (contextlib.redirect_stdout swaps stdout for every thread at once, so
+    concurrent API jobs would capture each other's prints.)
     """
-    print(f"[ACTION] Executing code:\n{code_to_run}")
-    
-    # Use io.StringIO to capture print() statements
-    code_output = io.StringIO()
-    
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, 'buffer', None) or self._stream
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _LineEvents(io.StringIO):
+    """StringIO that also publishes every complete line written to it as a code.output event."""
+
+    def __init__(self):
+        super().__init__()
+        self._partial = ""
+
+    def write(self, text):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            event_bus.publish("code.output", line=event_bus.clip(line))
+        return super().write(text)
+
+    def close_lines(self):
+        if self._partial:
+            event_bus.publish("code.output", line=event_bus.clip(self._partial))
+            self._partial = ""
+
+
+_capture_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def capture_output(buffer: Optional[io.StringIO] = None):
+    """Collects this thread's print() output into the yielded StringIO (`buffer`, or a new one)."""
+    with _capture_lock:
+        if not isinstance(sys.stdout, _ThreadStdout):
+            sys.stdout = _ThreadStdout(sys.stdout)
+    proxy = sys.stdout
+    buffer = buffer if buffer is not None else io.StringIO()
+    previous = getattr(proxy._local, 'buffer', None)
+    proxy._local.buffer = buffer
     try:
-        # Redirect stdout to our StringIO object
-        with contextlib.redirect_stdout(code_output):
-            # Execute the code
-            exec(code_to_run)
-        
-        # Get the captured output
-        output_str = code_output.getvalue()
-        if output_str:
-            print(f"[CODE OUTPUT] {output_str}")
-            speak(output_str) # Speak the success message
-        else:
-            # If the code ran but didn't print, give a generic success
-            print("[CODE OUTPUT] Executed successfully, no output.")
-            speak("Task completed.")
+        yield buffer
+    finally:
+        proxy._local.buffer = previous
 
+
+def run_python_code(code_to_run: str) -> Tuple[bool, str]:
+    """Executes the string of Python code; returns (success, printed output or error)."""
+    print(f"[ACTION] Executing code:\n{code_to_run}")
+    event_bus.publish("tool.start", tool="execute_python", lines=code_to_run.count("\n") + 1)
+    start = time.perf_counter()
+    code_output = _LineEvents()
+    try:
+        # Capture print() statements (only this thread's, see capture_output); lines also go out as events
+        with capture_output(code_output):
+            exec(code_to_run, {'__name__': '__neura_exec__'})
+        ok, output = True, code_output.getvalue()
     except Exception as e:
-        # If the code fails, speak the error
         print(f"[CODE ERROR] {e}")
-        speak(f"I ran into an error: {e}")
+        ok, output = False, str(e)
+    code_output.close_lines()
+    event_bus.publish("tool.finish", tool="execute_python", success=ok, seconds=time.perf_counter() - start,
+                      **({} if ok else {"error": output}))
+    return ok, output
+
+
+def execute_python_code(code_to_run: str):
+    """
+    Executes the string of Python code.
+    Captures stdout and stderr and speaks them.
+    """
+    speak(action_response({"action": "execute_python", "code_to_run": code_to_run})["response_text"])
+
+
+def action_response(action_data: dict, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Carries out one AI action and returns what to tell the user:
+    {"action", "success", "response_text"}. Code is not run once `cancel` is set.
+    """
+    action = (action_data or {}).get("action")
+    if not action:
+        return {"action": None, "success": False, "response_text": "I'm sorry, the AI returned a blank action."}
+
+    if action == "talk":
+        return {"action": action, "success": True,
+                "response_text": action_data.get("response_text", "I have nothing to say.")}
+
+    if action == "execute_python":
+        code = action_data.get("code_to_run")
+        if action_data.get("syntax_error"):
+            # Found while the code was streaming in; it was never complete, so it is not run
+            return {"action": action, "success": False,
+                    "response_text": f"I ran into an error: {action_data['syntax_error']}"}
+        if not code:
+            return {"action": action, "success": False,
+                    "response_text": "The AI wanted to run code but didn't provide any."}
+        if cancel is not None and cancel.is_set():
+            return {"action": action, "success": False, "response_text": "Cancelled before running the code."}
+        ok, output = run_python_code(code)
+        if not ok:
+            return {"action": action, "success": False, "response_text": f"I ran into an error: {output}"}
+        if output:
+            print(f"[CODE OUTPUT] {output}")
+            return {"action": action, "success": True, "response_text": output}
+        # If the code ran but didn't print, give a generic success
+        print("[CODE OUTPUT] Executed successfully, no output.")
+        return {"action": action, "success": True, "response_text": "Task completed."}
+
+    return {"action": action, "success": False, "response_text": f"The AI returned an unknown action: {action}."}
 
 # --- MODIFIED Firework AI API Function ---
-def get_ai_action(prompt: str) -> dict:
+def get_ai_action(prompt: str, on_sentence: Optional[Callable[[str], None]] = None,
+                  stream: Optional[bool] = None) -> dict:
     """
     Calls the Firework AI API.
     The AI is instructed to return a JSON object (action).
+    When streaming (LLM_STREAM), the action is parsed while it arrives: each
+    sentence of a "talk" reply goes to `on_sentence` as soon as it is complete
+    (the action then comes back with "spoken": True), and "execute_python"
+    code is syntax-checked as it streams, so broken code ends the call early
+    with a "syntax_error".
     """
     if not FIREWORK_API_KEY:
         print("[CLIENT (Firework)] FAILED. FIREWORKS_API_KEY not set.")
         return {"action": "talk", "response_text": "My Firework API key is not set."}
 
+    stream = LLM_STREAM if stream is None else stream
     headers = {
         "Authorization": f"Bearer {FIREWORK_API_KEY}",
         "Content-Type": "application/json"
@@ -161,31 +335,126 @@ def get_ai_action(prompt: str) -> dict:
         ],
         "max_tokens": 4096, # Increased for larger code blocks
     }
+    if stream:
+        payload["stream"] = True
 
+    event_bus.publish("llm.request", model=FIREWORK_MODEL, stream=stream)
+    start = time.perf_counter()
+    parsed = None
     try:
-        response = requests.post(
-            FIREWORK_API_URL, 
-            headers=headers, 
-            json=payload,
-            timeout=30.0 # Increased timeout for model
-        )
-        response.raise_for_status() 
-        
-        response_text = response.json()['choices'][0]['message']['content']
+        # Shared pooled session: keep-alive, retries on 429/5xx, LLM_DEADLINE for the whole call
+        with llm_client.FIREWORKS.post(FIREWORK_API_URL, payload, headers=headers,
+                                       deadline=LLM_DEADLINE) as response:
+            if stream and response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                streamed = _StreamedAction(on_sentence, start)
+                early_action = streamed.read(response)
+                if early_action is not None:
+                    return early_action
+                response_text, parsed = streamed.text(), streamed
+            else:
+                response_text = response.json()['choices'][0]['message']['content']
         print(f"[AI RAW RESPONSE] {response_text}")
 
         # The AI *must* return a valid JSON string.
-        action_json = json.loads(response_text)
+        try:
+            action_json = json.loads(response_text)
+        except json.JSONDecodeError:
+            if parsed is None or not parsed.parser.done or parsed.parser.error:
+                raise
+            action_json = parsed.parser.fields  # One complete object inside a ```json fence or similar
+        if parsed is not None and parsed.spoken_all(action_json):
+            action_json["spoken"] = True
+        event_bus.publish("llm.response", action=action_json.get("action") if isinstance(action_json, dict) else None,
+                          seconds=time.perf_counter() - start)
         return action_json
 
     except json.JSONDecodeError:
         print("[AI ERROR] AI did not return valid JSON.")
+        event_bus.publish("llm.error", error="invalid JSON", seconds=time.perf_counter() - start)
         return {"action": "talk", "response_text": "I had a system error. The AI did not return a valid command."}
     except Exception as e:
         print(f"[AI ERROR] {e}")
+        event_bus.publish("llm.error", error=str(e), seconds=time.perf_counter() - start)
         return {"action": "talk", "response_text": f"I ran into an API error: {e}"}
 
 
+class _StreamedAction:
+    """
+    One streamed completion (OpenAI-style server-sent events). Feeds the text
+    to ActionStreamParser and acts on the fields while they arrive: "talk"
+    sentences go to `on_sentence`, "execute_python" code goes to CodeChecker.
+    """
+
+    def __init__(self, on_sentence: Optional[Callable[[str], None]], start: float):
+        self.on_sentence = on_sentence
+        self.start = start
+        self.pieces: List[str] = []
+        self.parser = ActionStreamParser(on_text=self._on_text, on_value=self._on_value)
+        self.sentences = SentenceSplitter()
+        self.held: List[str] = []  # Sentences that arrived before "action" said it is a talk reply
+        self.checker = CodeChecker()
+
+    def read(self, response) -> Optional[dict]:
+        """Consumes the stream; returns an action early if the code is already broken."""
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if not delta:
+                continue
+            if not self.pieces:
+                event_bus.publish("llm.first_token", seconds=time.perf_counter() - self.start)
+            self.pieces.append(delta)
+            self.parser.feed(delta)
+            if self.checker.error is not None:
+                error = self.checker.error
+                print(f"[AI ERROR] Code has a syntax error; stopped the stream: {error}")
+                event_bus.publish("code.invalid", error=str(error), line=error.lineno,
+                                  seconds=time.perf_counter() - self.start)
+                return {"action": "execute_python", "code_to_run": self.parser.partial("code_to_run"),
+                        "syntax_error": str(error)}
+        return None
+
+    def text(self) -> str:
+        return "".join(self.pieces)
+
+    def spoken_all(self, action_json) -> bool:
+        """True if the whole response_text of this talk action went to on_sentence."""
+        return (self.on_sentence is not None and not self.held and "response_text" in self.parser.fields
+                and isinstance(action_json, dict) and action_json.get("action") == "talk"
+                and action_json.get("response_text") == self.parser.fields["response_text"])
+
+    def _on_text(self, key: str, text: str):
+        if key == "response_text" and self.on_sentence is not None:
+            for sentence in self.sentences.feed(text):
+                self._say(sentence)
+        elif key == "code_to_run":
+            self.checker.feed(text)
+
+    def _on_value(self, key: str, value: Any):
+        if key == "action" and value == "talk":
+            held, self.held = self.held, []
+            for sentence in held:
+                self._say(sentence)
+        elif key == "response_text" and self.on_sentence is not None:
+            rest = self.sentences.rest()
+            if rest:
+                self._say(rest)
+        elif key == "code_to_run" and isinstance(value, str):
+            self.checker.finish(value)
+
+    def _say(self, sentence: str):
+        if self.parser.fields.get("action") != "talk":
+            self.held.append(sentence)
+            return
+        event_bus.publish("llm.sentence", text=sentence, seconds=time.perf_counter() - self.start)
+        self.on_sentence(sentence)
+
+
 # --- NEW: Main Agent Loop ---
 def run_voice_assistant():
     """
@@ -215,29 +484,16 @@ def run_voice_assistant():
                 print("[CLIENT] Exiting loop.")
                 break
 
-            # 3. Get Action from AI
+            # 3. Get Action from AI (a "talk" reply is spoken sentence by sentence as it streams in)
             print(f"[CLIENT] Getting AI action for: '{command}'")
-            action_data = get_ai_action(command)
-            
-            if not action_data or not action_data.get("action"):
-                speak("I'm sorry, the AI returned a blank action.")
-                continue
-
-            # 4. Execute the Action
-            action = action_data.get("action")
+            # Sentences are queued, so speaking them does not hold up (or time out) the stream
+            action_data = get_ai_action(command, on_sentence=speak_later)
 
-            if action == "talk":
-                speak(action_data.get("response_text", "I have nothing to say."))
-            
-            elif action == "execute_python":
-                code = action_data.get("code_to_run")
-                if code:
-                    execute_python_code(code)
-                else:
-                    speak("The AI wanted to run code but didn't provide any.")
-            
-            else:
-                speak(f"The AI returned an unknown action: {action}.")
+            # 4. Execute the Action and speak the outcome (unless it was already spoken)
+            result = action_response(action_data)
+            if not action_data.get("spoken"):
+                speak(result["response_text"])
+            wait_for_speech()
             
             time.sleep(0.5) 
 
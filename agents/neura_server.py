@@ -0,0 +1,505 @@
+#pipeline: asyncio HTTP API on localhost:5001 for the Electron frontend (POST /api/prompt, /api/activate, GET /api/events) over the agent functions
+#usage: python neura_server.py   (then start the frontend; `python api_bench.py` load-tests it against a fake LLM)
+
+import os
+import hmac
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import event_bus
+import llm_client
+
+# --- Configuration ---
+HOST = os.environ.get("NEURA_API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("NEURA_API_PORT", "5001"))
+JOB_WORKERS = 4  # Jobs (LLM call + action) running at once, each on its own thread
+MAX_QUEUED_JOBS = 32  # Jobs waiting for a worker; beyond this new jobs get 503
+JOB_TIMEOUT = 120.0  # Seconds a waiting request holds on before it gets 504 (the job keeps running)
+JOB_HISTORY = 256  # Finished jobs kept for GET /api/jobs/<id>
+MAX_BODY_BYTES = 1 << 20
+MAX_HEADER_BYTES = 16 << 10
+DISCONNECT_POLL = 0.25  # Seconds between checks that a waiting client is still connected
+EVENT_HEARTBEAT = 10.0  # Seconds of silence after which an event stream gets a keep-alive comment
+EVENT_STREAM_QUEUE = 1024  # Events buffered per stream; a stream that falls this far behind is closed
+EVENT_RETRY_MS = 2000  # Reconnect delay the browser's EventSource is told to use
+# Browser origins allowed to call the API. The Electron window loads index.html from file://,
+# which Chromium sends as "null" (older Electron: "file://"). Requests without an Origin
+# header (local scripts, the event forwarder) are not browser requests and are allowed.
+ALLOWED_ORIGINS = set(filter(None, os.environ.get("NEURA_API_ORIGINS", "null,file://").split(",")))
+# Optional shared secret: when set, every request must send it (X-Neura-Token header, or
+# ?token= for EventSource). Sandboxed iframes on any web page also have the "null" origin,
+# so set this when the browser used for the web is not the Electron window.
+API_TOKEN = os.environ.get("NEURA_API_TOKEN", "")
+# --- End Configuration ---
+
+REASONS = {200: "OK", 202: "Accepted", 204: "No Content", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 411: "Length Required", 413: "Payload Too Large",
+           415: "Unsupported Media Type", 429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+# Sent, with the caller's origin, to allowed origins only (see check_access)
+CORS_HEADERS = {"Access-Control-Allow-Methods": "GET, POST, DELETE, OPTIONS",
+                "Access-Control-Allow-Headers": "Content-Type, X-Neura-Token",
+                "Vary": "Origin"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# --- HTTP/1.1 plumbing (also used by the fake LLM in api_bench.py) ---
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """Reads one request as (method, path, lower-cased headers, body); None once the client is gone."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(400, "Request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411, "Chunked request bodies are not supported; send Content-Length")
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def encode_response(status: int, payload: Any = None, headers: Optional[Dict[str, str]] = None,
+                    keep_alive: bool = True) -> bytes:
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+             f"Content-Length: {len(body)}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if payload is not None:
+        lines.append("Content-Type: application/json")
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def parse_json(body: bytes) -> Dict[str, Any]:
+    if not body.strip():
+        return {}
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise HTTPError(400, "Body is not valid JSON")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Body must be a JSON object")
+    return data
+
+
+def check_access(method: str, headers: Dict[str, str], query: Dict[str, List[str]]) -> Dict[str, str]:
+    """
+    Refuses requests a web page could forge, and returns the CORS headers for
+    the caller. A page can send a "simple" cross-origin POST (text/plain, no
+    preflight) without being allowed to, so POSTs must be application/json,
+    and browser requests must come from ALLOWED_ORIGINS.
+    """
+    origin = headers.get("origin")
+    if origin is not None and origin not in ALLOWED_ORIGINS:
+        raise HTTPError(403, f"Origin {origin} is not allowed")
+    cors = dict(CORS_HEADERS, **{"Access-Control-Allow-Origin": origin}) if origin else {}
+    if method == "OPTIONS":
+        return cors  # The preflight itself carries no token
+    if API_TOKEN:
+        token = headers.get("x-neura-token") or (query.get("token") or [""])[0]
+        if not hmac.compare_digest(token.encode(), API_TOKEN.encode()):
+            raise HTTPError(403, "Missing or wrong X-Neura-Token")
+    if method == "POST" and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+        raise HTTPError(415, "POST bodies must be application/json")
+    return cors
+# --- End HTTP/1.1 plumbing ---
+
+
+# --- Agent jobs (run on worker threads) ---
+def prompt_job(prompt: str, agent: str) -> Callable[[threading.Event], Dict[str, Any]]:
+    """A text prompt for the Fireworks JSON-action agent ("neura") or the Gemini tool loop ("orchestrator")."""
+    def run(cancel: threading.Event) -> Dict[str, Any]:
+        if agent == "orchestrator":
+            from main_orchestrator import run_neura_agent
+            return {"action": "talk", "success": True, "response_text": run_neura_agent(prompt, cancel=cancel)}
+        import neura_api
+        action_data = neura_api.get_ai_action(prompt)
+        return neura_api.action_response(action_data, cancel=cancel)
+    return run
+
+
+_voice_lock = threading.Lock()  # One microphone
+
+
+def activate_job(cancel: threading.Event) -> Dict[str, Any]:
+    """One voice cycle: listen, ask the AI, act, and speak the outcome (like a turn of run_voice_assistant)."""
+    import neura_api
+    if not _voice_lock.acquire(blocking=False):
+        return {"action": None, "success": False, "response_text": "Already listening."}
+    try:
+        command = neura_api.take_command()
+        if not command or cancel.is_set():
+            return {"action": None, "success": False, "command": command, "response_text": ""}
+        # Sentences are queued for the TTS thread, so speaking does not stall reading the stream
+        action_data = neura_api.get_ai_action(command, on_sentence=neura_api.speak_later)
+        result = neura_api.action_response(action_data, cancel=cancel)
+        if not action_data.get("spoken"):
+            neura_api.speak(result["response_text"])
+        neura_api.wait_for_speech()  # The job (and the orb) ends once Neura has finished talking
+        return dict(result, command=command)
+    finally:
+        _voice_lock.release()
+# --- End Agent jobs ---
+
+
+class Job:
+    def __init__(self, kind: str, run: Callable[[threading.Event], Dict[str, Any]]):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.run = run
+        self.status = "queued"  # -> running -> done | failed | cancelled
+        self.cancel_event = threading.Event()
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def info(self) -> Dict[str, Any]:
+        info = {"job_id": self.id, "kind": self.kind, "status": self.status, "created": self.created,
+                "started": self.started, "finished": self.finished}
+        if self.result is not None:
+            info.update(self.result)
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+    def settle(self, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        if self.done.done():
+            return
+        self.status, self.result, self.error = status, result, error
+        self.finished = time.time()
+        self.done.set_result(self)
+        event_bus.publish("job.finished", **{k: v for k, v in self.info().items() if k != "created"})
+
+
+class JobQueue:
+    """
+    Bounded FIFO of agent jobs drained by JOB_WORKERS coroutines. The agent
+    code is blocking, so each job runs on a thread of a matching pool and the
+    event loop stays free to accept requests. Cancelling a queued job drops
+    it; a running job is told through its cancel event (checked between the
+    LLM call and the action) and answered as cancelled right away.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = MAX_QUEUED_JOBS):
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="neura-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks = []
+        self.running = 0
+        self.completed = 0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for job in self._jobs.values():
+            job.cancel_event.set()
+            job.settle("cancelled", error="Server shutting down")
+        self._executor.shutdown(wait=False)
+
+    def submit(self, kind: str, run: Callable[[threading.Event], Dict[str, Any]]) -> Job:
+        job = Job(kind, run)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HTTPError(503, f"Busy: {self._queue.qsize()} jobs already queued")
+        self._jobs[job.id] = job
+        self._forget_old()
+        event_bus.publish("job.queued", job_id=job.id, kind=job.kind, queued=self._queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"No job {job_id}")
+        return job
+
+    def cancel(self, job: Job):
+        job.cancel_event.set()
+        job.settle("cancelled", error="Cancelled")
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self._queue.qsize(), "running": self.running, "completed": self.completed,
+                "workers": self.workers}
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            if job.done.done():
+                continue  # Cancelled while queued
+            job.status, job.started = "running", time.time()
+            self.running += 1
+            event_bus.publish("job.started", job_id=job.id, kind=job.kind)
+            try:
+                result = await loop.run_in_executor(self._executor, self._run, job)
+                job.settle("done", result=result)
+            except Exception as e:
+                print(f"[API] Job {job.id} ({job.kind}) failed: {type(e).__name__}: {e}")
+                job.settle("failed", error=f"{type(e).__name__}: {e}")
+            finally:
+                self.running -= 1
+                self.completed += 1
+
+    @staticmethod
+    def _run(job: Job) -> Dict[str, Any]:
+        # Events the job publishes on this thread (and on tool threads it starts) carry its id
+        with event_bus.job_context(job.id):
+            return job.run(job.cancel_event)
+
+    def _forget_old(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.done()]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+
+class NeuraAPIServer:
+    """
+    Routes HTTP requests onto the job queue. One connection may carry many
+    requests (keep-alive). GET /api/events is a Server-Sent Events stream of
+    everything published on event_bus in this process, including what the
+    file watcher and memory server forward with POST /api/events.
+    """
+
+    def __init__(self, host: str = HOST, port: int = PORT, workers: int = JOB_WORKERS,
+                 max_queued: int = MAX_QUEUED_JOBS):
+        self.host, self.port = host, port
+        self.workers, self.max_queued = workers, max_queued
+        self.jobs: Optional[JobQueue] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._streams: Set[asyncio.Queue] = set()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        event_bus.BUS.subscribe(self._on_event)
+        self.jobs = JobQueue(self.workers, self.max_queued)
+        self.jobs.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]  # Resolves port 0
+        print(f"[API] Neura API listening on http://{self.host}:{self.port} ({self.workers} job workers).")
+
+    async def stop(self):
+        event_bus.BUS.unsubscribe(self._on_event)
+        for stream in list(self._streams):
+            self._close_stream(stream)
+        self._server.close()
+        await self._server.wait_closed()
+        await self.jobs.stop()
+
+    # --- Event stream (Server-Sent Events) ---
+    def _on_event(self, event: Dict[str, Any]):
+        # Called on whichever thread published; the streams live on the event loop
+        self._loop.call_soon_threadsafe(self._fan_out, event)
+
+    def _fan_out(self, event: Dict[str, Any]):
+        for stream in list(self._streams):
+            try:
+                stream.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too slow to keep up: end its response. EventSource reconnects with
+                # Last-Event-ID and gets what it missed from the bus history.
+                self._close_stream(stream)
+
+    def _close_stream(self, stream: asyncio.Queue):
+        self._streams.discard(stream)
+        while not stream.empty():
+            stream.get_nowait()
+        stream.put_nowait(None)
+
+    async def _stream_events(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                             headers: Dict[str, str], query: Dict[str, List[str]], cors: Dict[str, str]):
+        """
+        Streams events until the client hangs up. A reconnecting client (Last-Event-ID
+        header or ?since=<id>) first gets the events it missed; a new one gets the
+        latest memory and indexing state. ?types=job,tool limits the stream to those prefixes.
+        """
+        last_id = headers.get("last-event-id") or (query.get("since") or [""])[0]
+        prefixes = tuple(p + "." for p in ",".join(query.get("types", [])).split(",") if p)
+        stream: asyncio.Queue = asyncio.Queue(maxsize=EVENT_STREAM_QUEUE)
+        self._streams.add(stream)  # Before reading the backlog, so nothing falls in between
+        backlog, sent = event_bus.BUS.replay(int(last_id) if last_id.isdigit() else None)
+
+        head = [f"HTTP/1.1 200 {REASONS[200]}", "Content-Type: text/event-stream", "Cache-Control: no-cache",
+                "Connection: close"] + [f"{name}: {value}" for name, value in cors.items()]
+        writer.write(("\r\n".join(head) + f"\r\n\r\nretry: {EVENT_RETRY_MS}\n\n").encode("latin-1"))
+        # The client sends nothing more on this connection, so a read only returns once it hangs up
+        hang_up = asyncio.ensure_future(reader.read(1))
+        try:
+            for event in backlog:
+                self._write_event(writer, event, prefixes)
+            while True:
+                await writer.drain()
+                next_event = asyncio.ensure_future(stream.get())
+                await asyncio.wait({next_event, hang_up}, timeout=EVENT_HEARTBEAT,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if hang_up.done():
+                    next_event.cancel()
+                    break
+                if not next_event.done():
+                    next_event.cancel()
+                    writer.write(b": keep-alive\n\n")
+                    continue
+                event = next_event.result()
+                if event is None:
+                    break
+                if event["id"] > sent:  # Older ones were published before the backlog was taken
+                    self._write_event(writer, event, prefixes)
+        finally:
+            hang_up.cancel()
+            self._streams.discard(stream)
+
+    @staticmethod
+    def _write_event(writer: asyncio.StreamWriter, event: Dict[str, Any], prefixes: Tuple[str, ...]):
+        if not prefixes or event["type"].startswith(prefixes):
+            writer.write(f"id: {event['id']}\ndata: {json.dumps(event, default=str)}\n\n".encode())
+    # --- End Event stream ---
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                cors: Dict[str, str] = {}
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    path, _, query_string = path.partition("?")
+                    query = parse_qs(query_string)
+                    cors = check_access(method, headers, query)
+                    if method == "GET" and path == "/api/events":
+                        await self._stream_events(reader, writer, headers, query, cors)
+                        break
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload = await self._route(method, path, body, reader)
+                except HTTPError as e:
+                    status, payload, keep_alive = e.status, {"error": str(e)}, False
+                except ConnectionError:
+                    raise
+                except Exception as e:
+                    print(f"[API] Error handling request: {type(e).__name__}: {e}")
+                    status, payload, keep_alive = 500, {"error": f"{type(e).__name__}: {e}"}, False
+                writer.write(encode_response(status, payload, headers=cors, keep_alive=keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes,
+                     reader: asyncio.StreamReader) -> Tuple[int, Optional[Dict[str, Any]]]:
+        if method == "OPTIONS":
+            return 204, None  # CORS preflight (check_access has vetted the origin)
+
+        if path == "/api/prompt":
+            self._allow(method, "POST")
+            data = parse_json(body)
+            prompt = str(data.get("prompt") or "").strip()
+            if not prompt:
+                raise HTTPError(400, "Missing 'prompt'")
+            agent = data.get("agent", "neura")
+            if agent not in ("neura", "orchestrator"):
+                raise HTTPError(400, f"Unknown agent: {agent}")
+            job = self.jobs.submit("prompt", prompt_job(prompt, agent))
+            return await self._respond(job, data.get("wait", True), reader)
+
+        if path == "/api/activate":
+            self._allow(method, "POST")
+            data = parse_json(body)
+            return await self._respond(self.jobs.submit("activate", activate_job), data.get("wait", True), reader)
+
+        if path.startswith("/api/jobs/"):
+            job = self.jobs.get(path[len("/api/jobs/"):].strip("/"))
+            if method == "DELETE":
+                self.jobs.cancel(job)
+                return 200, job.info()
+            self._allow(method, "GET")
+            return 200, job.info()
+
+        if path == "/api/events":
+            self._allow(method, "POST")  # GET (the stream) is handled in _handle
+            data = parse_json(body)
+            events = data.get("events", [data])
+            for event in events:
+                if not isinstance(event, dict) or not event.get("type"):
+                    raise HTTPError(400, "Each event needs a 'type'")
+                fields = {k: v for k, v in event.items() if k not in ("type", "id", "time")}
+                event_bus.publish(event["type"], **dict(fields, source=data.get("source", "remote")))
+            return 202, {"accepted": len(events)}
+
+        if path == "/api/health":
+            self._allow(method, "GET")
+            return 200, dict(status="ok", streams=len(self._streams), llm=llm_client.stats(), **self.jobs.stats())
+
+        raise HTTPError(404, f"No route for {path}")
+
+    @staticmethod
+    def _allow(method: str, expected: str):
+        if method != expected:
+            raise HTTPError(405, f"Use {expected}")
+
+    async def _respond(self, job: Job, wait: bool, reader: asyncio.StreamReader):
+        """Waits for the job (or answers 202 at once); a client that hangs up cancels its job."""
+        if not wait:
+            return 202, job.info()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + JOB_TIMEOUT
+        while not job.done.done():
+            # The stream sees EOF once the client hangs up (nothing is read, so no request is consumed)
+            if reader.at_eof():
+                self.jobs.cancel(job)
+                raise ConnectionError("Client disconnected")
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return 504, dict(job.info(), error=f"Still running after {JOB_TIMEOUT:.0f}s; "
+                                                   f"poll /api/jobs/{job.id}")
+            await asyncio.wait({job.done}, timeout=min(DISCONNECT_POLL, remaining))
+        return (200 if job.status == "done" else 500 if job.status == "failed" else 409), job.info()
+
+
+async def serve(host: str = HOST, port: int = PORT):
+    server = NeuraAPIServer(host, port)
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("[API] Shut down.")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agents are flat modules imported by name (run from the agents/ folder)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+import json
+import queue
+import pathlib
+import threading
+import http.server
+
+import numpy as np
+
+import event_bus
+
+
+def test_forwarder_survives_payloads_that_are_not_json():
+    received: "queue.Queue[dict]" = queue.Queue()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.put(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(202)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    forwarder = event_bus.EventForwarder("test", url=f"http://127.0.0.1:{server.server_address[1]}/api/events")
+    forwarder.start()
+    try:
+        event_bus.publish("test.odd", path=pathlib.Path("/tmp/x"), score=np.float32(0.5),
+                          error=ValueError("boom"), raw=b"\x00")
+        events = received.get(timeout=10)["events"]
+        assert events[0]["type"] == "test.odd"
+        assert events[0]["path"] == "/tmp/x" and events[0]["raw"] == "b'\\x00'"
+
+        circular = {}
+        circular["self"] = circular
+        event_bus.publish("test.circular", data=circular)
+        # Only that batch is dropped (with whatever shared it); the thread keeps forwarding
+        forwarded = []
+        for _ in range(20):
+            event_bus.publish("test.after")
+            try:
+                forwarded += [event["type"] for event in received.get(timeout=0.5)["events"]]
+            except queue.Empty:
+                continue
+            if "test.after" in forwarded:
+                break
+        assert "test.after" in forwarded and "test.circular" not in forwarded
+        assert forwarder._thread.is_alive()
+        assert forwarder.dropped >= 1
+    finally:
+        event_bus.BUS.unsubscribe(forwarder._enqueue)
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Dict, List
+
+import pytest
+
+from indexing_queue import DELETE, UPSERT, IndexingQueue, IndexingWorkerPool
+
+DEBOUNCE = 0.05
+
+
+class SlowMemory:
+    """
+    Records what a MemoryCore would hold. The first add_documents call blocks
+    until `release` is set, as a slow read and embed of a big file would.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, str] = {}
+        self.calls: List[tuple] = []
+        self.first_add = threading.Event()
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_documents(self, documents, replace=False):
+        documents = list(documents)
+        if not self.first_add.is_set():
+            self.first_add.set()
+            assert self.release.wait(10)
+        with self._lock:
+            for path, chunks, _ in documents:
+                self.calls.append(("add", path, chunks[0]["text"]))
+                self.files[path] = chunks[0]["text"]
+        return len(documents)
+
+    def remove_document(self, path):
+        with self._lock:
+            self.calls.append(("remove", path))
+            return self.files.pop(path, None) is not None
+
+
+@pytest.mark.parametrize("second", ["newer content", "deleted"])
+def test_latest_event_wins_with_two_workers(tmp_path, second):
+    path = str(tmp_path / "notes.txt")
+    with open(path, "w") as f:
+        f.write("old content")
+    memory = SlowMemory()
+    queue = IndexingQueue(debounce=DEBOUNCE)
+    workers = IndexingWorkerPool(memory, queue, workers=2)
+    workers.start()
+    try:
+        queue.put(path, UPSERT)
+        assert memory.first_add.wait(10)  # A worker is indexing the old content
+
+        # The file changes again while the first worker is still busy with it
+        if second == "deleted":
+            (tmp_path / "notes.txt").unlink()
+            queue.put(path, DELETE)
+        else:
+            with open(path, "w") as f:
+                f.write("newer content")
+            queue.put(path, UPSERT)
+        time.sleep(DEBOUNCE * 6)  # Long past the debounce: the idle worker could take it
+        assert memory.calls == []  # ...but the path is still in flight
+
+        memory.release.set()
+    finally:
+        memory.release.set()
+        workers.stop(10)
+
+    assert memory.files == ({} if second == "deleted" else {path: "newer content"})
+    assert memory.calls[0] == ("add", path, "old content")
+    assert len(memory.calls) == 2
+    assert workers.metrics()["processed"] == 2
+
+
+def test_paths_not_in_flight_are_not_held_back(tmp_path):
+    slow, fast = str(tmp_path / "slow.txt"), str(tmp_path / "fast.txt")
+    for path in (slow, fast):
+        with open(path, "w") as f:
+            f.write(path)
+    memory = SlowMemory()
+    queue = IndexingQueue(debounce=DEBOUNCE)
+    workers = IndexingWorkerPool(memory, queue, workers=2)
+    workers.start()
+    try:
+        queue.put(slow, UPSERT)
+        assert memory.first_add.wait(10)
+        queue.put(slow, UPSERT)  # Waits for the first worker
+        queue.put(fast, UPSERT)  # Goes to the idle one
+        deadline = time.monotonic() + 10
+        while fast not in memory.files and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert list(memory.files) == [fast]
+    finally:
+        memory.release.set()
+        workers.stop(10)
+    assert set(memory.files) == {slow, fast}
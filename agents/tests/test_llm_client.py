@@ -0,0 +1,190 @@
+import json
+import time
+import threading
+import http.server
+from typing import List, Optional, Tuple
+
+import pytest
+import requests
+
+import llm_client
+
+
+class StubLLM:
+    """
+    Local HTTP server that answers POSTs from a script of (status, headers,
+    delay) replies, then 200 with a chat completion once the script runs out.
+    Counts requests and the TCP connections they came in on.
+    """
+
+    def __init__(self, script: Optional[List[Tuple[int, dict, float]]] = None):
+        self.script = list(script or [])
+        self.requests = 0
+        self.connections = 0
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                stub.requests += 1
+                status, headers, delay = stub.script.pop(0) if stub.script else (200, {}, 0.0)
+                time.sleep(delay)
+                body = json.dumps({"choices": [{"message": {"content": "ok"}}]} if status == 200
+                                  else {"error": "stub"}).encode()
+                self.send_response(status)
+                for name, value in dict(headers, **{"Content-Length": str(len(body))}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_llm():
+    """Starts StubLLM servers for a test and shuts them down after it."""
+    stubs: List[StubLLM] = []
+
+    def start(script: Optional[List[Tuple[int, dict, float]]] = None) -> StubLLM:
+        stubs.append(StubLLM(script))
+        return stubs[-1]
+    yield start
+    for stub in stubs:
+        stub.close()
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: 0.0)
+
+
+def post(client: llm_client.HTTPLLMClient, stub: StubLLM, deadline: Optional[float] = 10.0):
+    with client.post(stub.url, {"messages": []}, deadline=deadline) as response:
+        return response.json()
+
+
+def test_retries_429_and_5xx_until_success(stub_llm, no_jitter):
+    stub = stub_llm([(503, {}, 0.0), (429, {}, 0.0)])
+    client = llm_client.HTTPLLMClient("test")
+    assert post(client, stub)["choices"][0]["message"]["content"] == "ok"
+    assert stub.requests == 3
+    assert client.counters["attempts"] == 3
+    assert client.counters["retries"] == 2
+    assert client.counters["failures"] == 0
+
+
+def test_gives_up_after_max_attempts(stub_llm, no_jitter):
+    stub = stub_llm([(503, {}, 0.0)] * 5)
+    client = llm_client.HTTPLLMClient("test", max_attempts=3)
+    with pytest.raises(llm_client.LLMError):
+        post(client, stub)
+    assert stub.requests == 3
+    assert client.counters["retries"] == 2
+    assert client.counters["failures"] == 1
+
+
+def test_client_errors_are_not_retried(stub_llm, no_jitter):
+    stub = stub_llm([(400, {}, 0.0)])
+    client = llm_client.HTTPLLMClient("test")
+    with pytest.raises(requests.HTTPError):
+        post(client, stub)
+    assert stub.requests == 1
+    assert client.counters["retries"] == 0
+
+
+def test_waits_for_retry_after(stub_llm, no_jitter):
+    stub = stub_llm([(429, {"Retry-After": "0.5"}, 0.0)])
+    client = llm_client.HTTPLLMClient("test")
+    start = time.monotonic()
+    post(client, stub)
+    assert time.monotonic() - start >= 0.5
+    assert stub.requests == 2
+
+
+def test_retry_after_beyond_the_deadline_fails_at_once(stub_llm):
+    stub = stub_llm([(503, {"Retry-After": "5"}, 0.0)])
+    client = llm_client.HTTPLLMClient("test")
+    start = time.monotonic()
+    with pytest.raises(llm_client.LLMDeadlineExceeded):
+        post(client, stub, deadline=1.0)
+    assert time.monotonic() - start < 0.5  # No point sleeping past the deadline
+    assert stub.requests == 1
+
+
+def test_deadline_cuts_off_a_slow_response(stub_llm):
+    stub = stub_llm([(200, {}, 2.0)])
+    client = llm_client.HTTPLLMClient("test")
+    start = time.monotonic()
+    with pytest.raises(llm_client.LLMDeadlineExceeded):
+        post(client, stub, deadline=0.3)
+    assert time.monotonic() - start < 1.0
+    assert client.counters["deadline_exceeded"] == 1
+
+
+def test_reuses_keep_alive_connections(stub_llm, no_jitter):
+    stub = stub_llm([(503, {}, 0.0)])
+    client = llm_client.HTTPLLMClient("test")
+    for _ in range(5):
+        post(client, stub)
+    assert stub.requests == 6  # Including the retried 503, whose body was read so the connection stays usable
+    assert stub.connections == 1
+
+
+def test_concurrency_limit():
+    client = llm_client.LLMClient("test", max_concurrent=2)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    threads = [threading.Thread(target=client.call, args=(work,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    assert client.counters["calls"] == 8
+
+
+def test_backoff_does_not_hold_a_slot(monkeypatch):
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: 0.5)
+    client = llm_client.LLMClient("test", max_concurrent=1)
+    failed = threading.Event()
+
+    class Busy(Exception):
+        code = 503
+
+    def flaky():
+        if not failed.is_set():
+            failed.set()
+            raise Busy("busy")
+        return "retried"
+
+    retrying = threading.Thread(target=client.call, args=(flaky,))
+    retrying.start()
+    failed.wait()
+    # The only slot must be free while the first call backs off
+    assert client.call(lambda: "new", deadline=0.3) == "new"
+    retrying.join()
@@ -0,0 +1,166 @@
+import json
+import threading
+import http.server
+from typing import Any, Dict, List
+
+import pytest
+
+pytest.importorskip("google.genai")
+from google.genai import _extra_utils, types
+
+import llm_client
+import main_orchestrator
+
+
+class FakeModels:
+    """Stands in for client.models: replays a script of responses (or exceptions to raise)."""
+
+    def __init__(self, script: List[Any]):
+        self.script = list(script)
+        self.requests: List[Dict[str, Any]] = []
+
+    def generate_content(self, model, contents, config):
+        self.requests.append({"contents": list(contents), "config": config})
+        reply = self.script.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+class FakeClient:
+    def __init__(self, script: List[Any]):
+        self.models = FakeModels(script)
+
+
+def model_turn(*parts: types.Part) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[types.Candidate(
+        content=types.Content(role="model", parts=list(parts)))])
+
+
+def call(call_id: str, name: str, **args) -> types.Part:
+    return types.Part(function_call=types.FunctionCall(id=call_id, name=name, args=args))
+
+
+@pytest.fixture
+def fake_tools(monkeypatch):
+    """Replaces the agent's tools with recorders; returns the (name, args, thread) of every run."""
+    runs: List[tuple] = []
+
+    def recorder(name):
+        def tool(**args):
+            runs.append((name, args, threading.current_thread().name))
+            return {"success": True, "output": f"{name} ran"}
+        tool.__name__ = name
+        return tool
+
+    monkeypatch.setattr(main_orchestrator, "TOOLS", {name: recorder(name) for name in main_orchestrator.TOOLS})
+    return runs
+
+
+def run_agent(monkeypatch, script: List[Any]) -> FakeClient:
+    client = FakeClient(script)
+    monkeypatch.setattr(llm_client, "gemini_client", lambda: client)
+    client.answer = main_orchestrator.run_neura_agent("find the notes and list the folder")
+    return client
+
+
+def test_tool_calls_run_through_run_tool_calls(monkeypatch, fake_tools):
+    batches = []
+    run_tool_calls = main_orchestrator.run_tool_calls
+    monkeypatch.setattr(main_orchestrator, "run_tool_calls",
+                        lambda calls: (batches.append([c.name for c in calls]), run_tool_calls(calls))[1])
+
+    client = run_agent(monkeypatch, [
+        model_turn(call("1", "semantic_file_search", query="notes"),
+                   call("2", "execute_shell_command", command="ls")),
+        model_turn(types.Part(text="Found them.")),
+    ])
+
+    assert client.answer == "Found them."
+    # The SDK must not run the tools itself inside generate_content
+    assert all(_extra_utils.should_disable_afc(request["config"]) for request in client.models.requests)
+    assert batches == [["semantic_file_search", "execute_shell_command"]]
+    assert sorted(name for name, _, _ in fake_tools) == ["execute_shell_command", "semantic_file_search"]
+    assert all(thread.startswith("neura-tool") for _, _, thread in fake_tools)
+
+    # Both responses go back in one turn, matched to their calls by id
+    responses = client.models.requests[1]["contents"][-1]
+    assert responses.role == "user"
+    assert [(part.function_response.id, part.function_response.name) for part in responses.parts] == [
+        ("1", "semantic_file_search"), ("2", "execute_shell_command")]
+
+
+class StubGemini:
+    """
+    Local server speaking the Gemini REST API to a real google-genai client.
+    Acts like a model that asks for one shell command and answers once it has
+    the command's result; request number `fail_at` (0-based) gets a 503.
+    """
+
+    def __init__(self, fail_at: int):
+        self.fail_at = fail_at
+        self.bodies: List[dict] = []
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+                stub.bodies.append(request)
+                status, reply = stub.reply(request, len(stub.bodies) - 1)
+                body = json.dumps(reply).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def reply(self, request: dict, n: int) -> tuple:
+        if n == self.fail_at:
+            return 503, {"error": {"code": 503, "message": "overloaded", "status": "UNAVAILABLE"}}
+        answered = any("functionResponse" in part for content in request["contents"] for part in content["parts"])
+        part = ({"text": "Appended."} if answered else
+                {"functionCall": {"id": "1", "name": "execute_shell_command", "args": {"command": "echo x >> log.txt"}}})
+        return 200, {"candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP"}]}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.mark.parametrize("failing", ["first request", "request after the tools ran"])
+def test_retried_model_call_does_not_rerun_tools(monkeypatch, failing):
+    from google import genai
+
+    appended: List[str] = []
+
+    def execute_shell_command(command: str) -> dict:
+        """Runs a shell command."""
+        appended.append(command)  # Stands in for `>> file`: running it twice would show
+        return {"success": True, "output": ""}
+
+    monkeypatch.setitem(main_orchestrator.TOOLS, "execute_shell_command", execute_shell_command)
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: 0.0)
+    stub = StubGemini(fail_at=0 if failing == "first request" else 1)
+    client = genai.Client(api_key="test", http_options=types.HttpOptions(base_url=stub.url))
+    monkeypatch.setattr(llm_client, "gemini_client", lambda: client)
+    try:
+        assert main_orchestrator.run_neura_agent("append x to log.txt") == "Appended."
+    finally:
+        stub.close()
+
+    # The side effect happened exactly once, and its result went back once
+    assert appended == ["echo x >> log.txt"]
+    assert len(stub.bodies) == 3  # One request was retried
+    responses = [part for content in stub.bodies[-1]["contents"] for part in content["parts"]
+                 if "functionResponse" in part]
+    assert len(responses) == 1
@@ -0,0 +1,78 @@
+import threading
+from typing import List
+
+import pytest
+
+import memory_core
+from memory_bench import synthetic_documents
+
+K = 5
+SEARCHERS = 4
+
+
+@pytest.mark.parametrize("mode", ["vector", "lexical", "hybrid"])
+def test_search_stays_consistent_while_ingesting(tmp_path, monkeypatch, mode):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(memory_core, "CHECKPOINT_MAX_RECORDS", 50)  # Background checkpoints mid-run too
+    memory = memory_core.MemoryCore(backend="hash")
+    seed = synthetic_documents(300)
+    incoming = synthetic_documents(300, first=len(seed), seed=1)
+    memory.add_documents(seed)
+    memory.checkpoint()
+
+    known = {path for path, _, _ in seed + incoming}
+    queries = [" ".join(text.split()[:6]) for _, text, _ in seed[:50]]
+    errors: List[str] = []
+    searches = [0] * SEARCHERS
+    done = threading.Event()
+
+    def search(slot: int):
+        n = slot
+        while not done.is_set() or searches[slot] == 0:
+            query = queries[n % len(queries)]
+            n += SEARCHERS
+            try:
+                results = memory.semantic_search(query, k=K, mode=mode)
+                paths = [result["path"] for result in results]
+                # Query words come from seeded documents, so there are always K files to return
+                assert len(results) == K, f"{len(results)} results"
+                assert [result["rank"] for result in results] == list(range(1, K + 1))
+                assert len(set(paths)) == K, f"duplicate paths {paths}"
+                assert set(paths) <= known, f"unknown paths {set(paths) - known}"
+            except Exception as e:
+                errors.append(f"{query!r}: {type(e).__name__}: {e}")
+            searches[slot] += 1
+
+    def ingest():
+        try:
+            for n in range(0, len(incoming), 32):
+                memory.add_documents(incoming[n:n + 32])
+                if n // 32 % 3 == 2:
+                    memory.checkpoint()
+        except Exception as e:
+            errors.append(f"ingest: {type(e).__name__}: {e}")
+        finally:
+            done.set()
+
+    threads = [threading.Thread(target=search, args=(slot,)) for slot in range(SEARCHERS)]
+    threads.append(threading.Thread(target=ingest))
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(120)
+        assert not any(thread.is_alive() for thread in threads)
+        assert errors == []
+        assert all(searches)
+
+        # Every document made it in, with one vector per row and no strays
+        rows = memory.store.all_ids()
+        assert {data["path"] for _, data in memory.store.iter_entries()} == known
+        assert sorted(memory_core.vector_ids(memory.index).tolist()) == sorted(rows)
+        assert memory.index.ntotal - memory.dead_vectors == len(rows)
+        # And a document ingested under load is found by its own words
+        path, text, _ = incoming[-1]
+        assert memory.semantic_search(" ".join(text.split()[:6]), k=K, mode="lexical")[0]["path"] == path
+    finally:
+        done.set()
+        memory.close()
@@ -0,0 +1,35 @@
+import os
+
+import faiss
+import numpy as np
+
+import memory_core
+from lexical_index import LEXICAL_FILE
+
+
+def test_migrations_are_saved_without_a_write(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    memory = memory_core.MemoryCore(backend="hash")
+    memory.add_documents([("a.txt", "alpha beta"), ("b.txt", "gamma delta")])
+    memory.close()
+
+    # An older store: positional vector ids and no lexical index
+    index = faiss.read_index(memory_core.MEMORY_FILE)
+    ids, vectors = memory_core.export_vectors(index)
+    legacy = faiss.IndexFlatIP(index.d)
+    legacy.add(vectors[np.argsort(ids)])
+    faiss.write_index(legacy, memory_core.MEMORY_FILE)
+    os.remove(LEXICAL_FILE)
+
+    memory = memory_core.MemoryCore(backend="hash")
+    assert memory.semantic_search("gamma", mode="lexical")[0]["path"].endswith("b.txt")
+    memory.close()  # No write happened, so there is no log to checkpoint
+    assert memory_core.is_id_mapped(faiss.read_index(memory_core.MEMORY_FILE))
+    assert os.path.exists(LEXICAL_FILE)
+
+    capsys.readouterr()
+    memory = memory_core.MemoryCore(backend="hash")
+    assert memory.semantic_search("gamma", mode="lexical")[0]["path"].endswith("b.txt")
+    memory.close()
+    out = capsys.readouterr().out
+    assert "Migrating index" not in out and "Built lexical index" not in out
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import signal
+import random
+import threading
+import subprocess
+from typing import List
+
+import pytest
+
+from memory_wal import WAL_FILE
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Writes documents start, start+1, ... one add_documents call each, acknowledging each
+# number on stderr once the call returned (stdout has the [MEMORY] logs of several
+# threads). Checkpoints run often, so kills land in them too.
+WRITER = """
+import sys
+import memory_core
+memory_core.CHECKPOINT_MAX_RECORDS = 20
+memory = memory_core.MemoryCore(backend="hash")
+n = int(sys.argv[1])
+while True:
+    memory.add_documents([(f"doc_{n}.txt", f"document {n} about topic {n % 7} " * (1 + n % 5))], replace=True)
+    sys.stderr.write(f"ack {n}\\n")
+    sys.stderr.flush()
+    n += 1
+"""
+
+# Opens the store like the next start would and reports what it holds
+CHECKER = """
+import json
+import numpy as np
+import memory_core
+memory = memory_core.MemoryCore(backend="hash")
+memory._ensure_loaded()
+stored = set(memory_core.vector_ids(memory.index).tolist())
+rows = memory.store.all_ids()
+print(json.dumps({
+    "paths": sorted({data["path"] for _, data in memory.store.iter_entries()}),
+    "rows_without_vector": [i for i in rows if i not in stored],
+    "vectors": memory.index.ntotal - memory.dead_vectors,
+    "rows": len(rows),
+}))
+memory.close()
+"""
+
+
+def run_python(code: str, cwd: str, *args: str, **popen) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=AGENTS_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    return subprocess.Popen([sys.executable, "-c", code, *args], cwd=cwd, env=env, text=True, **popen)
+
+
+def kill_mid_write(cwd: str, start: int, delay: float) -> int:
+    """Runs the writer from document `start`, SIGKILLs it after `delay` seconds; returns the last acknowledged one."""
+    writer = run_python(WRITER, cwd, str(start), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    acked: List[int] = []
+    first = threading.Event()
+
+    def read_acks():
+        for line in writer.stderr:
+            if line.startswith("ack ") and line.endswith("\n"):  # Not cut off by the kill
+                acked.append(int(line.split()[1]))
+                first.set()
+        first.set()
+
+    reader = threading.Thread(target=read_acks, daemon=True)
+    reader.start()
+    first.wait(120)  # Past the slow imports, writing
+    assert acked, "writer exited before its first write"
+    time.sleep(delay)
+    writer.send_signal(signal.SIGKILL)
+    writer.wait()
+    reader.join()
+    writer.stderr.close()
+    return acked[-1]
+
+
+def tear_tail(cwd: str, how: str) -> bool:
+    """Damages the end of the live log as a crash mid-append would; returns True if an acknowledged frame was cut."""
+    path = os.path.join(cwd, WAL_FILE)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if how == "partial frame":
+        with open(path, "ab") as f:
+            f.write(b"\xff\x00\x00\x00\x12\x34")  # A header promising 255 bytes that never came
+        return False
+    if how == "cut last frame" and size:
+        with open(path, "r+b") as f:
+            f.truncate(max(0, size - 7))
+        return True
+    return False
+
+
+def check_store(cwd: str) -> dict:
+    checker = run_python(CHECKER, cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = checker.communicate(timeout=120)
+    assert checker.returncode == 0, err
+    return json.loads(out.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("how", ["kill only", "partial frame", "cut last frame"])
+def test_recovers_after_sigkill_and_torn_tail(tmp_path, how):
+    rng = random.Random(how)
+    cwd = str(tmp_path)
+    next_doc, written, in_flight = 0, -1, set()
+    for _ in range(3):
+        acked = kill_mid_write(cwd, next_doc, rng.uniform(0.2, 1.0))
+        assert acked >= next_doc
+        written = max(written, acked)
+        in_flight.add(os.path.join(os.path.realpath(cwd), f"doc_{acked + 1}.txt"))
+        may_lose = {f"doc_{acked}.txt"} if tear_tail(cwd, how) else set()
+
+        state = check_store(cwd)
+        assert state["rows_without_vector"] == []
+        assert state["vectors"] == state["rows"]
+        # Every acknowledged document must be back (a torn one is re-written by the next round)
+        expected = {os.path.join(os.path.realpath(cwd), f"doc_{n}.txt") for n in range(written + 1)}
+        lost = expected - set(state["paths"])
+        assert {os.path.basename(path) for path in lost} <= may_lose
+        # Anything beyond the acknowledged writes was in flight at a kill
+        assert set(state["paths"]) - expected <= in_flight
+        next_doc = max(0, acked - 3)  # Overlap, so the next round also updates documents in place
+
+
+def test_update_is_fsynced_before_its_rows_commit(tmp_path, monkeypatch):
+    import memory_core
+    from memory_wal import MemoryWAL
+    from metadata_store import MetadataStore
+
+    monkeypatch.chdir(tmp_path)
+    memory = memory_core.MemoryCore(backend="hash")
+    memory.add_document("a.txt", "first version of the file")
+
+    steps: List[str] = []
+    fsync, apply = MemoryWAL._fsync, MetadataStore.apply
+    monkeypatch.setattr(MemoryWAL, "_fsync", lambda self: (steps.append("fsync"), fsync(self))[1])
+    monkeypatch.setattr(MetadataStore, "apply", lambda self, *args: (steps.append("commit"), apply(self, *args))[1])
+    try:
+        assert memory.update_document("a.txt", "second version, other words")
+        # The row keeps its id, so its new doc_hash must not reach disk before the new vector can
+        assert steps[:2] == ["fsync", "commit"]
+    finally:
+        memory.close()
@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("google.genai")
+from google import genai
+from google.genai import types
+
+import tools
+
+
+@pytest.mark.parametrize("tool, required", [(tools.semantic_file_search, ["query"]),
+                                            (tools.semantic_file_search_many, ["queries"])])
+def test_search_declarations_require_only_the_query(tool, required):
+    client = genai.Client(api_key="test")
+    declaration = types.FunctionDeclaration.from_callable(client=client, callable=tool)
+    # Every filter is optional, so the model never has to invent one
+    assert declaration.parameters.required == required
+    assert declaration.parameters.properties["extensions"].nullable
+
+
+def test_unset_filters_do_not_narrow_the_search():
+    filters = tools._search_filters("", None, "", "", 0, 0)
+    assert all(value is None for value in filters.values())
+    assert tools._search_filters("", [], "", "", 0, 0)["extensions"] is None
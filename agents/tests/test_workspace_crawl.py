@@ -0,0 +1,36 @@
+import os
+
+import memory_core
+from workspace_crawl import initial_crawl, make_ignore_matcher
+
+
+def test_unreadable_files_are_not_reread_until_they_change(tmp_path, monkeypatch):
+    root = tmp_path / "workspace"
+    root.mkdir()
+    (root / "notes.txt").write_text("meeting notes about the index")
+    (root / "image.bin").write_bytes(b"\xff\xfe\x00\x80\x81" * 200)
+    monkeypatch.chdir(tmp_path)
+    is_ignored = make_ignore_matcher([])
+
+    memory = memory_core.MemoryCore(backend="hash")
+    first = initial_crawl(memory, [str(root)], is_ignored)
+    assert (first['changed'], first['indexed'], first['unreadable']) == (2, 1, 1)
+    memory.close()
+
+    # The next start finds nothing to read, the binary file included
+    memory = memory_core.MemoryCore(backend="hash")
+    again = initial_crawl(memory, [str(root)], is_ignored)
+    assert (again['scanned'], again['changed'], again['read'], again['unreadable']) == (2, 0, 0, 0)
+
+    # Once it changes it is read again (and marked again while still binary)
+    (root / "image.bin").write_bytes(b"\xff\xfe\x00\x80\x81" * 300)
+    changed = initial_crawl(memory, [str(root)], is_ignored)
+    assert (changed['changed'], changed['unreadable']) == (1, 1)
+
+    # A file that turns into text is indexed
+    (root / "image.bin").write_text("now a caption for the image")
+    os.utime(root / "image.bin", (1.7e9, 1.7e9))
+    text = initial_crawl(memory, [str(root)], is_ignored)
+    assert (text['changed'], text['indexed'], text['unreadable']) == (1, 1, 0)
+    assert memory.is_indexed(str(root / "image.bin"))
+    memory.close()
@@ -1,31 +1,72 @@
 # /Users/astrodingra/Downloads/neura-os/agents/tools.py
 
 import subprocess
-from typing import Dict, Any, List # <-- FIXED: Explicitly imported List
+from typing import Dict, Any, List, Optional # <-- FIXED: Explicitly imported List
 import os
-from memory_core import MemoryCore 
 import time
+import threading
+from datetime import datetime
+import event_bus
+from chunker import read_file_chunks
 
-# --- Initialize Memory Core Globally ---
-# This instance is imported and used by the orchestrator AND the file watcher
-NEURA_MEMORY = MemoryCore() 
+# --- Initialize Memory Globally ---
+# By default this is a client of the shared memory server (memory_server.py),
+# which owns the only copy of the model and index and is started on demand.
+# NEURA_MEMORY_MODE=local keeps an in-process MemoryCore instead; it is cheap to
+# construct (model and index load on first use), and NEURA_MEMORY_WARM_UP=1
+# loads them on a background thread right away.
+if os.environ.get("NEURA_MEMORY_MODE", "server") == "local":
+    from memory_core import MemoryCore
+    NEURA_MEMORY = MemoryCore(warm_up=os.environ.get("NEURA_MEMORY_WARM_UP") == "1")
+else:
+    from memory_client import MemoryClient
+    NEURA_MEMORY = MemoryClient()
 # --- End Initialize ---
 
 
+def _run_streaming(command: str, timeout: float) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(command, shell=True, check=True, capture_output=True, text=True, timeout=timeout),
+    except that each output line is also published as a shell.output event as soon as it is printed.
+    """
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, bufsize=1)
+    output = {"stdout": [], "stderr": []}
+    job_id = event_bus.current_job()
+
+    def pump(stream, name):
+        with event_bus.job_context(job_id):
+            for line in stream:
+                output[name].append(line)
+                event_bus.publish("shell.output", command=command, stream=name,
+                                  line=event_bus.clip(line.rstrip("\n")))
+
+    pumps = [threading.Thread(target=pump, args=(process.stdout, "stdout"), daemon=True),
+             threading.Thread(target=pump, args=(process.stderr, "stderr"), daemon=True)]
+    for thread in pumps:
+        thread.start()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        for thread in pumps:
+            thread.join(1.0)  # Background children of the shell may keep the pipes open
+    stdout, stderr = "".join(output["stdout"]), "".join(output["stderr"])
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+
 def execute_shell_command(command: str) -> Dict[str, Any]:
     """
     Executes a macOS/Linux shell command and returns the output.
     Use this tool ONLY to execute necessary commands like 'ls', 'pwd', 'cat', 'date', or 'echo'.
     """
     try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
+        result = _run_streaming(command, timeout=10)
 
         # --- Memory Hook: Index new/modified files ---
         # This is a PROTOTYPE hook; the daemon handles real-time watching
@@ -33,12 +74,11 @@ def execute_shell_command(command: str) -> Dict[str, Any]:
             # Assume file is created/modified in current directory for simplicity
             file_name = command.split('>')[-1].strip().split()[0]
             if os.path.exists(file_name):
-                with open(file_name, 'r') as f:
-                    content = f.read(250)
-                summary = f"Content Snippet: '{content.strip()}...'"
+                # Whole file in overlapping chunks, streamed so large outputs stay cheap
+                chunks = read_file_chunks(file_name)
                 
-                # Add/update the document in memory
-                NEURA_MEMORY.add_document(os.path.abspath(file_name), summary)
+                # Add/update the document in memory (re-embeds if the content changed)
+                NEURA_MEMORY.update_document(os.path.abspath(file_name), chunks)
         # --- End Memory Hook ---
 
         return {
@@ -57,9 +97,50 @@ def execute_shell_command(command: str) -> Dict[str, Any]:
         return {"success": False, "command": command, "error": str(e)}
 
 
-def semantic_file_search(query: str) -> List[dict]:
+def _search_filters(path_prefix: str, extensions: Optional[List[str]], modified_after: str, modified_before: str,
+                    min_size: int, max_size: int) -> Dict[str, Any]:
+    """Turns the tools' LLM-friendly filter arguments into MemoryCore search filters."""
+    def _timestamp(value: str):
+        return datetime.fromisoformat(value.strip()).timestamp() if value and value.strip() else None
+
+    return {
+        "path_prefix": path_prefix or None,
+        "extensions": list(extensions) if extensions else None,
+        "modified_after": _timestamp(modified_after),
+        "modified_before": _timestamp(modified_before),
+        "min_size": min_size or None,
+        "max_size": max_size or None,
+    }
+
+
+def semantic_file_search(query: str, mode: str = "hybrid", path_prefix: str = "",
+                         extensions: Optional[List[str]] = None,
+                         modified_after: str = "", modified_before: str = "",
+                         min_size: int = 0, max_size: int = 0) -> List[dict]:
     """
     Searches the Neura memory (Vector Database) for file information semantically related to the query.
-    Returns a list of relevant file paths and their summaries. 
+    mode: "hybrid" (default) combines meaning and exact words; "lexical" matches exact tokens only
+    (filenames, identifiers, error codes) and is fastest; "vector" matches meaning only.
+    Optional filters narrow the search instead of searching again: path_prefix (a directory such as
+    "/home/me/project/", trailing slash for that directory only), extensions (e.g. ["py", "md"]),
+    modified_after / modified_before (ISO dates like "2025-01-31" or "2025-01-31T14:00"),
+    min_size / max_size (bytes).
+    Returns a list of relevant file paths, each with its best-matching passage ('summary') and its 'span'. 
+    """
+    filters = _search_filters(path_prefix, extensions, modified_after, modified_before, min_size, max_size)
+    return NEURA_MEMORY.semantic_search(query, mode=mode, **filters)
+
+
+def semantic_file_search_many(queries: List[str], mode: str = "hybrid", path_prefix: str = "",
+                              extensions: Optional[List[str]] = None,
+                              modified_after: str = "", modified_before: str = "",
+                              min_size: int = 0, max_size: int = 0) -> Dict[str, Any]:
+    """
+    Runs several related memory searches in one call (one embedding pass, one index search).
+    Use this instead of repeated semantic_file_search calls when you need multiple lookups.
+    mode and the filters are the same as for semantic_file_search and apply to every query.
+    Returns a mapping from each query to its list of relevant files and summaries.
     """
-    return NEURA_MEMORY.semantic_search(query)
\ No newline at end of file
+    filters = _search_filters(path_prefix, extensions, modified_after, modified_before, min_size, max_size)
+    results = NEURA_MEMORY.semantic_search_many(queries, mode=mode, **filters)
+    return {"success": True, "results": dict(zip(queries, results))}
\ No newline at end of file
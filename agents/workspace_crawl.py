@@ -0,0 +1,113 @@
+#pipeline: initial crawl of the watched roots, so files that existed before the daemon started get indexed
+
+import os
+import time
+import fnmatch
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+import event_bus
+from indexing_queue import read_document
+
+# --- Configuration ---
+READ_WORKERS = 16  # Threads reading changed files in parallel (I/O bound)
+CRAWL_BATCH_SIZE = 256  # Documents per add_documents call during the crawl
+COMPARE_CHUNK = 5000  # (path, mtime, size) entries per changed_files lookup
+PROGRESS_INTERVAL = 5.0  # Seconds between progress lines
+# --- End Configuration ---
+
+
+def make_ignore_matcher(patterns: Sequence[str]) -> Callable[[str], bool]:
+    """
+    Returns is_ignored(path). A pattern matches either the basename
+    (e.g. '*.pyc', 'node_modules') or the whole absolute path (e.g. '*/.git/*').
+    """
+    def is_ignored(path: str) -> bool:
+        name = os.path.basename(path)
+        return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(path, p) for p in patterns)
+    return is_ignored
+
+
+def walk_files(roots: Sequence[str], is_ignored: Callable[[str], bool]) -> Iterator[Tuple[str, float, int]]:
+    """Yields (path, mtime, size) for every non-ignored regular file under the roots."""
+    stack = [os.path.abspath(root) for root in roots]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError as e:
+            logging.warning(f"Cannot scan {directory}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                if is_ignored(entry.path):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        yield entry.path, st.st_mtime, st.st_size
+                except OSError:
+                    continue
+
+
+def _chunks(items: Iterator, size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def initial_crawl(memory, roots: Sequence[str], is_ignored: Callable[[str], bool],
+                  read_workers: int = READ_WORKERS, batch_size: int = CRAWL_BATCH_SIZE) -> dict:
+    """
+    Indexes everything under `roots` that is new or changed since it was last
+    stored (by mtime and size). Changed files are read on a thread pool and fed
+    to add_documents in batches. Files that are not text are marked unreadable
+    with their mtime and size, so later crawls skip them until they change.
+    Logs progress and returns the final counters.
+    """
+    start = time.monotonic()
+    last_report = start
+    stats = {'scanned': 0, 'changed': 0, 'read': 0, 'indexed': 0, 'unreadable': 0}
+
+    def report(final=False):
+        elapsed = max(time.monotonic() - start, 1e-9)
+        label = "Crawl finished" if final else "Crawl progress"
+        logging.info(f"{label}: scanned {stats['scanned']}, changed {stats['changed']}, "
+                     f"read {stats['read']}, indexed {stats['indexed']}, unreadable {stats['unreadable']} "
+                     f"in {elapsed:.1f}s ({stats['read'] / elapsed:.1f} files/s)")
+        event_bus.publish("index.crawl", final=final, seconds=elapsed, files_per_s=stats['read'] / elapsed,
+                          **stats)
+
+    with ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="neura-crawl") as pool:
+        for entries in _chunks(walk_files(roots, is_ignored), COMPARE_CHUNK):
+            stats['scanned'] += len(entries)
+            changed = memory.changed_files(entries)
+            stats['changed'] += len(changed)
+
+            # pool.map keeps reads in flight on all workers while batches are embedded
+            binary: List[str] = []
+            documents = (doc for doc in pool.map(lambda path: read_document(path, binary), changed)
+                         if doc is not None)
+            for batch in _chunks(documents, batch_size):
+                stats['read'] += len(batch)
+                stats['indexed'] += memory.add_documents(batch, replace=True)
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    report()
+
+            # Stats from the walk: a file changed since then no longer matches its mark
+            if binary:
+                scanned = {path: (mtime, size) for path, mtime, size in entries}
+                memory.mark_unreadable([(path, *scanned[path]) for path in binary])
+                stats['unreadable'] += len(binary)
+
+    report(final=True)
+    return stats
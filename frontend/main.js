@@ -67,7 +67,8 @@ async function createWindow() {
   // --- END DOWNLOAD HANDLER ---
 
 
-  win.loadFile('index.html');
+  // The API token (if any) reaches the page in its URL; see NEURA_API_TOKEN in agents/neura_server.py
+  win.loadFile('index.html', { query: { token: process.env.NEURA_API_TOKEN || '' } });
   win.webContents.openDevTools(); 
   
   // --- WAKE WORD SHORTCUT ---